@@ -0,0 +1,5 @@
+"""Coffee shop management system
+
+coffeeshop.core holds the database layer and business logic; the tkinter
+app (project.py) is one client of it.
+"""
@@ -0,0 +1,5 @@
+"""Benchmarks of the coffee shop core, run through manage.py
+
+They build their own throwaway databases, so they never touch the shop's
+real data.
+"""
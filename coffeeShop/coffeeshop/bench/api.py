@@ -0,0 +1,209 @@
+"""HTTP API load test
+
+Fills a fresh on-disk database with synthetic data, starts the HTTP API
+on it in a separate process, then has 1, 8, 32 ... concurrent clients,
+each on one keep-alive connection, send a mix of kiosk requests as fast as
+they are answered. Reports requests per second and latency percentiles
+for every kind of request at each level.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from coffeeshop.core import ConnectionFactory, open_shop
+from coffeeshop.server.api import serve_api
+
+from . import generate
+
+DEFAULT_CLIENTS = (1, 8, 32)
+# Requests per client at each level
+DEFAULT_REQUESTS = 200
+DATA_ORDERS = 20000
+START_TIMEOUT = 60
+
+# Kind of request -> weight in the mix
+MIX = {
+    "menu": 50,
+    "customers": 15,
+    "order": 15,
+    "submit": 10,
+    "sales": 5,
+    "popular": 5,
+}
+
+
+def _run_api(path, address, ready):
+    serve_api(ConnectionFactory(path, instrument_queries=False), address, ready=ready.set)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _Client:
+    """One keep-alive HTTP connection"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def request(self, method, target, payload=None):
+        """Send a request; returns (status, body bytes)"""
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(
+            f"{method} {target} HTTP/1.1\r\nHost: bench\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, await self.reader.readexactly(length)
+
+
+def _requests(rng, sample):
+    """Yield (kind, method, target, payload) forever"""
+    kinds = list(MIX)
+    weights = [MIX[kind] for kind in kinds]
+    while True:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "menu":
+            category = rng.choice([None, *sample["categories"]])
+            query = f"?{urlencode({'category': category})}" if category else ""
+            yield kind, "GET", "/menu" + query, None
+        elif kind == "customers":
+            query = urlencode({"q": rng.choice(sample["prefixes"])})
+            yield kind, "GET", f"/customers?{query}", None
+        elif kind == "order":
+            yield kind, "GET", f"/orders/{rng.choice(sample['order_ids'])}", None
+        elif kind == "submit":
+            items = [
+                {"id": product_id, "quantity": rng.randint(1, 3)}
+                for product_id in rng.sample(sample["product_ids"], rng.randint(1, 4))
+            ]
+            customer_id = rng.choice([None, *sample["customer_ids"][:50]])
+            yield kind, "POST", "/orders", {"customer_id": customer_id, "items": items}
+        elif kind == "sales":
+            query = urlencode({"from": sample["first_day"], "to": sample["last_day"]})
+            yield kind, "GET", f"/reports/sales?{query}", None
+        else:
+            yield kind, "GET", "/reports/popular?limit=10", None
+
+
+async def _level(host, port, clients, requests, sample, seed):
+    """Run one load level; returns kind -> [latency], errors, seconds"""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    connections = [_Client(*await asyncio.open_connection(host, port)) for _ in range(clients)]
+
+    async def client(connection, number):
+        stream = _requests(random.Random(seed * 1000 + number), sample)
+        for _ in range(requests):
+            kind, method, target, payload = next(stream)
+            started = time.perf_counter()
+            status, _ = await connection.request(method, target, payload)
+            latencies[kind].append(time.perf_counter() - started)
+            if status >= 400:
+                errors[kind] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(connection, n) for n, connection in enumerate(connections)))
+    elapsed = time.perf_counter() - started
+    for connection in connections:
+        connection.writer.close()
+    return latencies, errors, elapsed
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+def _sample(path):
+    """Pick the ids and search terms the clients ask for"""
+    shop = open_shop(path, "reporting")
+    conn = shop.conn
+    first_day, last_day = shop.reports.order_date_range()
+    sample = {
+        "categories": shop.products.categories(),
+        "product_ids": [row[0] for row in shop.products.in_stock()],
+        "customer_ids": [row[0] for row in conn.execute("SELECT id FROM customers LIMIT 500")],
+        "prefixes": sorted({
+            row[0][:2] for row in conn.execute("SELECT name FROM customers LIMIT 500")
+        }),
+        "order_ids": [row[0] for row in conn.execute("SELECT id FROM orders LIMIT 5000")],
+        "first_day": max(first_day, last_day[:8] + "01"),
+        "last_day": last_day,
+    }
+    shop.close()
+    return sample
+
+
+def bench_api(clients=DEFAULT_CLIENTS, requests=DEFAULT_REQUESTS, orders=DATA_ORDERS, seed=0):
+    """Load test the HTTP API; returns one dict per (clients, kind of request)"""
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        shop = open_shop(path, "bulk")
+        shop.migrate()
+        generate.generate(shop, orders, seed=seed)
+        shop.close()
+        sample = _sample(path)
+
+        port = _free_port()
+        ready = multiprocessing.Event()
+        api = multiprocessing.Process(
+            target=_run_api, args=(path, f"127.0.0.1:{port}", ready)
+        )
+        api.start()
+        try:
+            if not ready.wait(START_TIMEOUT):
+                raise RuntimeError("The API did not start")
+            for count in clients:
+                latencies, errors, elapsed = asyncio.run(
+                    _level("127.0.0.1", port, count, requests, sample, seed)
+                )
+                everything = [value for values in latencies.values() for value in values]
+                for kind, values in [*sorted(latencies.items()), ("all", everything)]:
+                    values.sort()
+                    results.append({
+                        "clients": count,
+                        "kind": kind,
+                        "requests": len(values),
+                        "requests_per_second": len(values) / elapsed,
+                        "p50_ms": _percentile(values, 0.50),
+                        "p95_ms": _percentile(values, 0.95),
+                        "p99_ms": _percentile(values, 0.99),
+                        "errors": sum(errors.values()) if kind == "all" else errors[kind],
+                    })
+        finally:
+            api.terminate()
+            api.join()
+
+    return results
+
+
+def format_results(results):
+    """Return the load test results as a text table"""
+    lines = [
+        "clients  request    count     req/s   p50 ms   p95 ms   p99 ms  errors",
+    ]
+    for result in results:
+        lines.append(
+            "{clients:7d}  {kind:9s}  {requests:5d}  {requests_per_second:8.1f}"
+            "  {p50_ms:7.2f}  {p95_ms:7.2f}  {p99_ms:7.2f}  {errors:6d}".format(**result)
+        )
+    return "\n".join(lines)
@@ -0,0 +1,225 @@
+"""Seeded synthetic data for the coffee shop database
+
+Fills products, customers, orders and order_items with data shaped like a
+real shop's: a few products sell far more than the rest, orders cluster in
+the morning and lunch peaks, weekends are busier, and most orders come
+from a small set of regulars. The same seed always gives the same data.
+"""
+import bisect
+import itertools
+import random
+from datetime import date, timedelta
+
+# name, category, base price; drinks also come in three sizes
+MENU = [
+    ("Espresso", "Coffee", 2.5),
+    ("Americano", "Coffee", 3.0),
+    ("Latte", "Coffee", 3.8),
+    ("Cappuccino", "Coffee", 3.8),
+    ("Flat White", "Coffee", 3.6),
+    ("Mocha", "Coffee", 4.2),
+    ("Macchiato", "Coffee", 3.2),
+    ("Cold Brew", "Cold Drinks", 4.0),
+    ("Iced Latte", "Cold Drinks", 4.2),
+    ("Frappe", "Cold Drinks", 4.8),
+    ("Lemonade", "Cold Drinks", 3.0),
+    ("Green Tea", "Tea", 2.8),
+    ("Earl Grey", "Tea", 2.8),
+    ("Chai Latte", "Tea", 3.9),
+    ("Hot Chocolate", "Tea", 3.5),
+]
+SIZES = [("Small", 0.0), ("Medium", 0.6), ("Large", 1.1)]
+FOOD = [
+    ("Croissant", "Bakery", 2.6),
+    ("Pain au Chocolat", "Bakery", 2.9),
+    ("Blueberry Muffin", "Bakery", 3.0),
+    ("Cinnamon Roll", "Bakery", 3.4),
+    ("Banana Bread", "Bakery", 3.1),
+    ("Bagel", "Bakery", 2.4),
+    ("Ham and Cheese Toastie", "Sandwiches", 5.5),
+    ("Chicken Wrap", "Sandwiches", 6.2),
+    ("Veggie Panini", "Sandwiches", 5.9),
+    ("BLT", "Sandwiches", 5.8),
+    ("House Blend Beans 250g", "Merchandise", 9.5),
+    ("Travel Mug", "Merchandise", 12.0),
+]
+
+FIRST_NAMES = [
+    "Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie",
+    "Avery", "Quinn", "Mafuz", "Aisha", "Chen", "Priya", "Diego", "Fatima",
+    "Lukas", "Yuki", "Omar", "Elena", "Kwame", "Sofia", "Ivan", "Amara",
+]
+LAST_NAMES = [
+    "Smith", "Alam", "Garcia", "Nguyen", "Khan", "Okafor", "Rossi", "Novak",
+    "Kim", "Silva", "Brown", "Patel", "Müller", "Haddad", "Tanaka", "Jones",
+    "Lopez", "Ivanova", "Mensah", "Cohen",
+]
+
+# Relative number of orders in each opening hour
+HOUR_WEIGHTS = {
+    6: 3, 7: 9, 8: 12, 9: 8, 10: 5, 11: 6, 12: 10,
+    13: 8, 14: 4, 15: 6, 16: 5, 17: 4, 18: 3, 19: 2,
+}
+# Monday .. Sunday
+WEEKDAY_WEIGHTS = [1.0, 0.95, 0.95, 1.0, 1.15, 1.35, 1.2]
+
+ITEM_COUNTS = [1, 2, 3, 4, 5]
+ITEM_COUNT_WEIGHTS = [45, 30, 15, 7, 3]
+QUANTITIES = [1, 2, 3]
+QUANTITY_WEIGHTS = [85, 12, 3]
+
+# Share of orders placed without a customer account
+WALK_IN_SHARE = 0.35
+# Settled orders that were cancelled; half of the last day's are still open
+CANCELLED_SHARE = 0.04
+
+BATCH_ORDERS = 10000
+
+
+def zipf_cum_weights(count, exponent):
+    """Return cumulative weights of a Zipf distribution over count ranks"""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def product_rows():
+    """Return (name, category, price, cost) of every menu product"""
+    rows = []
+    for name, category, price in MENU:
+        for size, extra in SIZES:
+            rows.append((f"{name} ({size})", category, round(price + extra, 2)))
+    rows.extend(FOOD)
+    return [(name, category, price, round(price * 0.35, 2)) for name, category, price in rows]
+
+
+def customer_row(rng, customer_id):
+    """Return an (id, name, phone, email) customer row"""
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    phone = f"555-{rng.randrange(1000):03d}-{rng.randrange(10000):04d}"
+    email = f"{first.lower()}.{last.lower()}{customer_id}@example.com"
+    return (customer_id, f"{first} {last}", phone, email)
+
+
+def daily_order_counts(orders, first_day, days):
+    """Split a number of orders over days, weighted by weekday"""
+    weights = [WEEKDAY_WEIGHTS[(first_day + timedelta(days=n)).weekday()] for n in range(days)]
+    total = sum(weights)
+    counts = [int(orders * weight / total) for weight in weights]
+
+    # Hand the rounding remainder to the busiest days
+    for n in sorted(range(days), key=lambda n: -weights[n])[: orders - sum(counts)]:
+        counts[n] += 1
+    return counts
+
+
+def generate(shop, orders, customers=None, days=365, seed=0, end=None, progress=None):
+    """Add synthetic products, customers and orders to a migrated database
+
+    customers defaults to one per 20 orders. Orders span days days up to
+    end (default: yesterday). New rows get ids after any existing ones.
+    progress, if given, is called with the number of orders written so far.
+    Returns a dict with the number of rows added to each table.
+    """
+    rng = random.Random(seed)
+    customers = customers if customers is not None else max(10, orders // 20)
+    end = end or date.today() - timedelta(days=1)
+    first_day = end - timedelta(days=days - 1)
+    hours = list(HOUR_WEIGHTS)
+    hour_cum_weights = list(itertools.accumulate(HOUR_WEIGHTS.values()))
+
+    # Products, with popularity ranks in random order
+    with shop.conn:
+        products = [
+            (shop.products.add(name, category, price, cost, 10 ** 6), price)
+            for name, category, price, cost in product_rows()
+        ]
+    rng.shuffle(products)
+    product_cum_weights = zipf_cum_weights(len(products), 1.1)
+
+    # Customers; a few regulars place most of the orders
+    first_customer = shop.customers.max_id() + 1
+    customer_ids = list(range(first_customer, first_customer + customers))
+    with shop.conn:
+        for start in range(0, customers, BATCH_ORDERS):
+            shop.customers.import_rows(
+                customer_row(rng, customer_id)
+                for customer_id in customer_ids[start:start + BATCH_ORDERS]
+            )
+    rng.shuffle(customer_ids)
+    customer_cum_weights = zipf_cum_weights(customers, 0.8)
+
+    order_id = shop.orders.max_id()
+    order_rows = []
+    item_rows = []
+    points = []
+    written = 0
+    items_added = 0
+
+    def flush():
+        # One transaction per batch keeps memory flat at any size
+        nonlocal written
+        with shop.conn:
+            shop.orders.import_rows(order_rows)
+            shop.orders.import_items(item_rows)
+            shop.points.add_many(points)
+        written += len(order_rows)
+        order_rows.clear()
+        item_rows.clear()
+        points.clear()
+        if progress:
+            progress(written)
+
+    for day_number, count in enumerate(daily_order_counts(orders, first_day, days)):
+        day = first_day + timedelta(days=day_number)
+        last_day = day == end
+        times = sorted(
+            (
+                rng.choices(hours, cum_weights=hour_cum_weights)[0],
+                rng.randrange(60),
+                rng.randrange(60),
+            )
+            for _ in range(count)
+        )
+
+        for hour, minute, second in times:
+            order_id += 1
+            order_date = f"{day.isoformat()} {hour:02d}:{minute:02d}:{second:02d}"
+
+            lines = {}
+            for _ in range(rng.choices(ITEM_COUNTS, ITEM_COUNT_WEIGHTS)[0]):
+                rank = bisect.bisect(product_cum_weights, rng.random() * product_cum_weights[-1])
+                product = products[rank]
+                lines[product] = lines.get(product, 0) + rng.choices(QUANTITIES, QUANTITY_WEIGHTS)[0]
+
+            total = round(sum(price * quantity for (_, price), quantity in lines.items()), 2)
+            for (product_id, price), quantity in lines.items():
+                item_rows.append((order_id, product_id, quantity, price))
+            items_added += len(lines)
+
+            if rng.random() < WALK_IN_SHARE:
+                customer_id = None
+            else:
+                rank = bisect.bisect(customer_cum_weights, rng.random() * customer_cum_weights[-1])
+                customer_id = customer_ids[rank]
+                if int(total):
+                    points.append((customer_id, int(total), "earn", order_id, order_date))
+
+            if last_day and rng.random() < 0.5:
+                status = "Pending"
+            elif rng.random() < CANCELLED_SHARE:
+                status = "Cancelled"
+            else:
+                status = "Completed"
+
+            order_rows.append((order_id, customer_id, order_date, total, status))
+
+            if len(order_rows) >= BATCH_ORDERS:
+                flush()
+
+    flush()
+    return {
+        "products": len(products),
+        "customers": customers,
+        "orders": written,
+        "order_items": items_added,
+    }
@@ -0,0 +1,159 @@
+"""Order service load test
+
+Starts an order service in a separate process on a fresh on-disk
+database, then has 1, 2, 4 ... simulated tills submit orders through it
+as fast as it answers, each waiting for its reply before the next order.
+For comparison the same tills also write to the database directly, each
+on its own connection, as separate tkinter instances would.
+"""
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from functools import partial
+
+from coffeeshop.core import open_shop
+from coffeeshop.server import AsyncOrderClient, serve
+
+from .orders import create_bench_shop
+
+DEFAULT_CLIENTS = (1, 2, 4, 8, 16, 32)
+# Orders per run, shared between the clients of the run
+DEFAULT_ORDERS = 2000
+LINE_ITEMS = 3
+# Seconds to wait for the service to start listening
+START_TIMEOUT = 30
+
+
+def _run_service(path, address, ready):
+    serve(partial(open_shop, path), address, ready=ready.set)
+
+
+def _summary(mode, clients, latencies, elapsed, failed=0, **extra):
+    latencies = sorted(latencies)
+    return dict({
+        "mode": mode,
+        "clients": clients,
+        "orders": len(latencies),
+        "failed": failed,
+        "seconds": elapsed,
+        "orders_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "mean_batch": None,
+    }, **extra)
+
+
+async def _service_run(address, clients, orders, customer_id, items):
+    """Run one load level against the service"""
+    connections = [await AsyncOrderClient.connect(address) for _ in range(clients)]
+    latencies = []
+    failed = 0
+
+    async def till(client):
+        nonlocal failed
+        for _ in range(orders // clients):
+            started = time.perf_counter()
+            try:
+                await client.submit_order(customer_id, items)
+            except Exception:
+                failed += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    before = await connections[0].stats()
+    started = time.perf_counter()
+    await asyncio.gather(*(till(client) for client in connections))
+    elapsed = time.perf_counter() - started
+    after = await connections[0].stats()
+    for client in connections:
+        await client.close()
+
+    batches = after["batches"] - before["batches"]
+    return _summary(
+        "service", clients, latencies, elapsed, failed,
+        mean_batch=(after["orders"] - before["orders"]) / batches if batches else None,
+    )
+
+
+def _direct_run(path, clients, orders, customer_id, items):
+    """Run one load level with a connection per till"""
+    latencies = []
+    failures = []
+
+    def till():
+        shop = open_shop(path)
+        try:
+            for _ in range(orders // clients):
+                started = time.perf_counter()
+                try:
+                    shop.order_service.submit_order(customer_id, items)
+                except sqlite3.OperationalError as error:
+                    failures.append(error)
+                else:
+                    latencies.append(time.perf_counter() - started)
+        finally:
+            shop.close()
+
+    threads = [threading.Thread(target=till) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _summary("direct", clients, latencies, time.perf_counter() - started, len(failures))
+
+
+def bench_order_service(clients=DEFAULT_CLIENTS, orders=DEFAULT_ORDERS, direct=True):
+    """Measure orders per second for each number of clients; returns one dict per run"""
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        shop, customer_id = create_bench_shop(path, LINE_ITEMS)
+        items = [
+            {"id": product_id, "quantity": 1, "price": price}
+            for product_id, name, price in shop.products.in_stock()
+        ]
+        shop.close()
+
+        address = "unix:" + os.path.join(directory, "orders.sock")
+        ready = multiprocessing.Event()
+        service = multiprocessing.Process(target=_run_service, args=(path, address, ready))
+        service.start()
+        try:
+            if not ready.wait(START_TIMEOUT):
+                raise RuntimeError("The order service did not start")
+            for count in clients:
+                results.append(asyncio.run(
+                    _service_run(address, count, orders, customer_id, items)
+                ))
+        finally:
+            service.terminate()
+            service.join()
+
+        if direct:
+            for count in clients:
+                results.append(_direct_run(path, count, orders, customer_id, items))
+
+    return results
+
+
+def format_results(results):
+    """Return the load test results as a text table"""
+    lines = [
+        "mode     clients  orders/s   p50 ms   p95 ms  batch  failed",
+    ]
+    for result in results:
+        batch = result["mean_batch"]
+        lines.append(
+            "{mode:7s}  {clients:7d}  {orders_per_second:8.1f}  {p50_ms:7.2f}  {p95_ms:7.2f}"
+            "  {batch}  {failed:6d}".format(
+                **result, batch=f"{batch:5.1f}" if batch is not None else "    -",
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,77 @@
+"""Order submission micro-benchmark
+
+Submits orders of a fixed number of line items to a fresh on-disk
+database and reports the throughput for each order size.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+from coffeeshop.core import open_shop
+
+DEFAULT_LINE_ITEMS = (1, 10, 100)
+DEFAULT_ORDERS = 200
+
+
+def create_bench_shop(path, products):
+    """Create a migrated database with products and one customer"""
+    shop = open_shop(path)
+    shop.migrate()
+    with shop.conn:
+        for number in range(products):
+            # Enough stock that no benchmark run can sell out
+            shop.products.add(f"Bench product {number}", "Bench", 2.5, 1.0, 10 ** 9)
+        customer_id = shop.customers.add("Bench customer", "", "")
+    return shop, customer_id
+
+
+def bench_submit_order(line_items=DEFAULT_LINE_ITEMS, orders=DEFAULT_ORDERS):
+    """Time submit_order for each order size; returns one dict per size"""
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        shop, customer_id = create_bench_shop(
+            os.path.join(directory, "bench.db"), max(line_items)
+        )
+        products = [
+            {"id": product_id, "quantity": 1, "price": price}
+            for product_id, name, price in shop.products.in_stock()
+        ]
+
+        for size in line_items:
+            items = products[:size]
+            timings = []
+
+            started = time.perf_counter()
+            for _ in range(orders):
+                timings.append(shop.order_service.submit_order(customer_id, items).timing)
+            elapsed = time.perf_counter() - started
+
+            results.append({
+                "line_items": size,
+                "orders": orders,
+                "seconds": elapsed,
+                "orders_per_second": orders / elapsed,
+                "line_items_per_second": orders * size / elapsed,
+                "mean_write_ms": statistics.mean(t.write for t in timings) * 1000,
+                "max_total_ms": max(t.total for t in timings) * 1000,
+                "retries": sum(t.attempts - 1 for t in timings),
+            })
+
+        shop.close()
+
+    return results
+
+
+def format_results(results):
+    """Return the benchmark results as a text table"""
+    lines = [
+        "items  orders/s  items/s   write ms  max ms  retries",
+    ]
+    for result in results:
+        lines.append(
+            "{line_items:5d}  {orders_per_second:8.1f}  {line_items_per_second:8.0f}"
+            "  {mean_write_ms:8.2f}  {max_total_ms:6.1f}  {retries:7d}".format(**result)
+        )
+    return "\n".join(lines)
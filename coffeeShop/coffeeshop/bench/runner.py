@@ -0,0 +1,208 @@
+"""Time every database path the app uses and save the results as JSON
+
+Each benchmark is one screen action of the tkinter app expressed through
+coffeeshop.core, run a number of times against an existing database
+(usually one filled by generate.py). Results from two runs, e.g. before
+and after a change, can be compared key by key.
+"""
+import json
+import platform
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from coffeeshop.core import CustomerRepository, OrderRepository, ProductRepository
+
+DEFAULT_REPEAT = 5
+
+
+def sample_terms(shop):
+    """Pick search terms, ids and dates that exist in the database"""
+    products = shop.products.in_stock()
+    last_customer = shop.customers.max_id()
+    customer_name = shop.customers.name(last_customer // 2 or 1) or "Alex"
+    last_day = shop.reports.order_date_range()[1] or datetime.now().date().isoformat()
+    last_date = datetime.fromisoformat(last_day).date()
+    order_items = [{"id": row[0], "quantity": 1, "price": row[2]} for row in products]
+
+    return {
+        "product_name": products[0][1].split()[0] if products else "Latte",
+        "category": shop.products.categories()[0] if products else "Coffee",
+        "customer_name": customer_name.split()[-1],
+        # The picker matches from the start of the full name
+        "customer_prefix": customer_name[:2],
+        "order_id": shop.orders.max_id() // 2 or 1,
+        "month": ((last_date - timedelta(days=30)).isoformat(), last_day),
+        "year": ((last_date - timedelta(days=365)).isoformat(), last_day),
+        "items": order_items[:1],
+        "items_10": order_items[:10],
+    }
+
+
+def rolled_back(shop, fn, *args):
+    """Run a write, then roll it back, to time it without changing the database"""
+    try:
+        return fn(*args)
+    finally:
+        shop.conn.rollback()
+
+
+def expect_rows(rows, name):
+    """Return rows, or raise RuntimeError if there are none
+
+    For lookups whose sample term comes from a real row, so that they can
+    never quietly time an empty result.
+    """
+    if not rows:
+        raise RuntimeError(f"Benchmark {name} found no rows")
+    return rows
+
+
+def read_benchmarks(terms):
+    """Return (name, fn(shop)) for every read path of the app"""
+    month = terms["month"]
+    year = terms["year"]
+    return [
+        ("dashboard_stats", lambda shop: shop.reports.dashboard_stats()),
+        ("recent_orders", lambda shop: shop.orders.recent()),
+        ("products_first_page", lambda shop: ProductRepository.pager().first_page(shop.conn)),
+        ("search_products", lambda shop: shop.products.search(terms["product_name"])),
+        ("search_products_short", lambda shop: shop.products.search("la")),
+        ("customers_first_page", lambda shop: CustomerRepository.pager().first_page(shop.conn)),
+        ("search_customers", lambda shop: shop.customers.search(terms["customer_name"])),
+        ("orders_first_page", lambda shop: OrderRepository.pager().first_page(shop.conn)),
+        (
+            "orders_filter_pending",
+            lambda shop: OrderRepository.pager(status="Pending").first_page(shop.conn),
+        ),
+        (
+            "orders_filter_cancelled",
+            lambda shop: OrderRepository.pager(status="Cancelled").first_page(shop.conn),
+        ),
+        (
+            "search_orders",
+            lambda shop: OrderRepository.pager(
+                search_term=terms["customer_name"]
+            ).first_page(shop.conn),
+        ),
+        ("order_details", lambda shop: shop.order_service.details(terms["order_id"])),
+        (
+            "customer_picker",
+            lambda shop: expect_rows(
+                shop.customers.prefix_search(terms["customer_prefix"]), "customer_picker"
+            ),
+        ),
+        ("product_categories", lambda shop: shop.products.categories()),
+        ("products_in_stock", lambda shop: shop.products.in_stock()),
+        ("products_in_category", lambda shop: shop.products.in_stock(terms["category"])),
+        ("sales_report_recent", lambda shop: shop.report_service.sales_report()),
+        ("sales_report_month", lambda shop: shop.report_service.sales_report(*month)),
+        ("sales_report_year", lambda shop: shop.report_service.sales_report(*year)),
+        ("sales_report_hourly", lambda shop: shop.report_service.sales_report(*month, hourly=True)),
+        ("popular_products", lambda shop: shop.report_service.popular_products()),
+        ("popular_products_month", lambda shop: shop.report_service.popular_products(*month)),
+        ("popular_products_year", lambda shop: shop.report_service.popular_products(*year)),
+        ("order_date_range", lambda shop: shop.reports.order_date_range()),
+        ("receipt_rows_month", lambda shop: shop.orders.receipt_rows(*month).fetchall()),
+        (
+            "backfill_daily_sales_month",
+            lambda shop: rolled_back(shop, shop.reports.backfill_daily_sales, *month),
+        ),
+        (
+            "backfill_daily_sales_year",
+            lambda shop: rolled_back(shop, shop.reports.backfill_daily_sales, *year),
+        ),
+    ]
+
+
+def write_benchmarks(terms):
+    """Return (name, fn(shop)) for the write paths; these add real orders"""
+    return [
+        ("submit_order", lambda shop: shop.order_service.submit_order(None, terms["items"])),
+        (
+            "submit_order_10_items",
+            lambda shop: shop.order_service.submit_order(None, terms["items_10"]),
+        ),
+    ]
+
+
+def time_calls(fn, shop, repeat):
+    """Run fn(shop) repeat times; return the timings in ms and the row count"""
+    timings = []
+    rows = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(shop)
+        timings.append((time.perf_counter() - started) * 1000)
+        if isinstance(result, list):
+            rows = len(result)
+    return timings, rows
+
+
+def summarize(timings, rows):
+    """Reduce a list of timings to the figures kept in the results"""
+    ordered = sorted(timings)
+    return {
+        "runs": len(timings),
+        "first_ms": timings[0],
+        "min_ms": ordered[0],
+        "median_ms": statistics.median(ordered),
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max_ms": ordered[-1],
+        "rows": rows,
+    }
+
+
+def run_benchmarks(shop, repeat=DEFAULT_REPEAT, writes=True, only=None):
+    """Run the benchmarks and return a results dict ready for JSON
+
+    writes=False skips the benchmarks that add orders. only limits the run
+    to the named benchmarks.
+    """
+    terms = sample_terms(shop)
+    benchmarks = read_benchmarks(terms)
+    if writes:
+        benchmarks += write_benchmarks(terms)
+
+    stats = shop.reports.dashboard_stats()
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "database": {
+            "products": stats[0],
+            "customers": stats[1],
+            "orders": stats[2],
+        },
+        "benchmarks": {},
+    }
+
+    for name, fn in benchmarks:
+        if only and name not in only:
+            continue
+        timings, rows = time_calls(fn, shop, repeat)
+        results["benchmarks"][name] = summarize(timings, rows)
+
+    return results
+
+
+def format_results(results):
+    """Return the benchmark results as a text table"""
+    lines = ["benchmark                   median ms    p95 ms   first ms      rows"]
+    for name, result in results["benchmarks"].items():
+        rows = "" if result["rows"] is None else result["rows"]
+        lines.append(
+            f"{name:26s} {result['median_ms']:10.2f} {result['p95_ms']:9.2f}"
+            f" {result['first_ms']:10.2f} {rows:>9}"
+        )
+    return "\n".join(lines)
+
+
+def save_results(results, path):
+    """Write the results to a JSON file"""
+    with open(path, "w") as output:
+        json.dump(results, output, indent=2)
+        output.write("\n")
@@ -0,0 +1,117 @@
+"""Stock reservation under contention
+
+Writer threads, each on its own connection like a separate till, sell a
+few products with limited stock as fast as they can until it runs out.
+Afterwards no product may have negative stock, and every product's stock
+plus the quantity of it in order items must equal what it started with.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from coffeeshop.core import OutOfStockError, open_shop
+
+DEFAULT_THREADS = (1, 4, 16, 32)
+DEFAULT_PRODUCTS = 5
+# Units of each product at the start of a run
+DEFAULT_STOCK = 1000
+# A thread stops after this many refused orders in a row
+STOP_AFTER_REFUSALS = 20
+
+
+def _till(path, products, seed, counts, lock):
+    """Sell until the stock is gone; adds to the shared counts"""
+    rng = random.Random(seed)
+    shop = open_shop(path)
+    accepted = refused = failed = in_a_row = 0
+    try:
+        while in_a_row < STOP_AFTER_REFUSALS:
+            items = [
+                {"id": product_id, "quantity": rng.randint(1, 3), "price": 1.0}
+                for product_id in rng.sample(products, rng.randint(1, min(3, len(products))))
+            ]
+            try:
+                shop.order_service.submit_order(None, items)
+            except OutOfStockError:
+                refused += 1
+                in_a_row += 1
+            except sqlite3.OperationalError:
+                failed += 1  # still locked after every retry
+            else:
+                accepted += 1
+                in_a_row = 0
+    finally:
+        shop.close()
+    with lock:
+        counts["orders"] += accepted
+        counts["refused"] += refused
+        counts["failed"] += failed
+
+
+def bench_stock_contention(threads=DEFAULT_THREADS, products=DEFAULT_PRODUCTS,
+                           stock=DEFAULT_STOCK, seed=0):
+    """Sell out a fresh database once per thread count; returns one dict per run"""
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for count in threads:
+            path = os.path.join(directory, f"stock-{count}.db")
+            shop = open_shop(path)
+            shop.migrate()
+            with shop.conn:
+                product_ids = [
+                    shop.products.add(f"Scarce product {number}", "Bench", 1.0, 0.5, stock)
+                    for number in range(products)
+                ]
+
+            counts = {"orders": 0, "refused": 0, "failed": 0}
+            lock = threading.Lock()
+            workers = [
+                threading.Thread(target=_till, args=(path, product_ids, seed * 1000 + n, counts, lock))
+                for n in range(count)
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+            rows = shop.conn.execute('''
+                SELECT p.stock, COALESCE(SUM(oi.quantity), 0)
+                FROM products p
+                LEFT JOIN order_items oi ON oi.product_id = p.id
+                GROUP BY p.id
+            ''').fetchall()
+            shop.close()
+
+            results.append(dict(
+                counts,
+                threads=count,
+                seconds=elapsed,
+                orders_per_second=counts["orders"] / elapsed,
+                units_sold=sum(sold for _, sold in rows),
+                units_left=sum(left for left, _ in rows),
+                negative_stock=sum(1 for left, _ in rows if left < 0),
+                mismatched=sum(1 for left, sold in rows if left + sold != stock),
+            ))
+
+    return results
+
+
+def format_results(results):
+    """Return the contention results as a text table"""
+    lines = [
+        "threads  orders  refused  failed  orders/s  sold  left  negative  mismatched",
+    ]
+    for result in results:
+        lines.append(
+            "{threads:7d}  {orders:6d}  {refused:7d}  {failed:6d}  {orders_per_second:8.1f}"
+            "  {units_sold:4d}  {units_left:4d}  {negative_stock:8d}  {mismatched:10d}".format(
+                **result
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,65 @@
+"""Coffee shop data access and business logic, with no UI dependency
+
+Everything here can run headless: the tkinter app, the maintenance CLI
+and worker processes all go through the same repositories and services.
+
+    shop = open_shop("coffee_shop.db")
+    shop.migrate()
+    order = shop.order_service.submit_order(None, [{"id": 1, "quantity": 2, "price": 3.5}])
+"""
+from .catalogue import CatalogueCache, Product
+from .connection import PROFILES, ConnectionFactory, connect, load_config
+from .repositories import (
+    ArchiveRepository,
+    CustomerRepository,
+    OrderRepository,
+    PointsRepository,
+    ProductRepository,
+    ReportRepository,
+)
+from .services import (
+    ArchiveResult,
+    ArchiveService,
+    CatalogueService,
+    OrderService,
+    OrderTiming,
+    OutOfStockError,
+    PointsCompaction,
+    PointsReplay,
+    PointsService,
+    ReportService,
+    SalesReport,
+    Shortfall,
+    SubmittedOrder,
+)
+from .shop import CoffeeShop, open_shop
+
+__all__ = [
+    "ArchiveRepository",
+    "ArchiveResult",
+    "ArchiveService",
+    "CatalogueCache",
+    "CatalogueService",
+    "CoffeeShop",
+    "ConnectionFactory",
+    "CustomerRepository",
+    "OrderRepository",
+    "OrderService",
+    "OrderTiming",
+    "OutOfStockError",
+    "PROFILES",
+    "PointsCompaction",
+    "PointsRepository",
+    "PointsReplay",
+    "PointsService",
+    "Product",
+    "ProductRepository",
+    "ReportRepository",
+    "ReportService",
+    "SalesReport",
+    "Shortfall",
+    "SubmittedOrder",
+    "connect",
+    "load_config",
+    "open_shop",
+]
@@ -0,0 +1,159 @@
+"""Per-year archive files for old orders
+
+The tills, the order list and the dashboard only ever look at recent
+orders, and the sales reports read rollups that keep counting archived
+ones. So completed orders older than a cutoff can move, with their items,
+out of the hot database into one SQLite file per year next to it:
+
+    coffee_shop.db
+    coffee_shop-archive-2023.db
+    coffee_shop-archive-2024.db
+
+Archive files hold orders and order_items with the hot database's columns
+and ids; products and customers stay in the hot database. Reads that need
+old orders (receipts, rebuilding the rollups) attach one file at a time
+as "archive", and only when their date range starts before the cutoff.
+"""
+import os
+import re
+from contextlib import contextmanager
+
+from . import queries
+from .connection import connect
+
+ALIAS = "archive"
+# An order leaves the hot database only after its archive copy is on disk,
+# so archive files are written with a rollback journal and a full fsync
+ARCHIVE_PRAGMAS = {"journal_mode": "delete", "synchronous": "full"}
+
+# {db} is the schema name: main in an archive file's own connection, or
+# the alias it is attached under
+ARCHIVE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS {db}.orders (
+        id INTEGER PRIMARY KEY,
+        customer_id INTEGER,
+        order_date TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        status TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS {db}.order_items (
+        id INTEGER PRIMARY KEY,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        price REAL NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS {db}.idx_orders_order_date ON orders(order_date)",
+    "CREATE INDEX IF NOT EXISTS {db}.idx_order_items_order_id ON order_items(order_id)",
+]
+
+
+def database_path(conn):
+    """Return the file of a connection's main database, or None if it is in memory"""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path or None
+    return None
+
+
+def create_schema(conn, db="main"):
+    """Create the archive tables in a database of a connection"""
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement.format(db=db))
+
+
+def attach_empty(conn):
+    """Attach an empty in-memory archive, e.g. to explain the archive statements"""
+    query_only = conn.execute("PRAGMA query_only").fetchone()[0]
+    conn.execute(f"ATTACH DATABASE ':memory:' AS {ALIAS}")
+    conn.execute("PRAGMA query_only = off")
+    try:
+        create_schema(conn, ALIAS)
+    finally:
+        conn.execute(f"PRAGMA query_only = {query_only:d}")
+
+
+class ArchiveFile:
+    """An archive file open for writing"""
+
+    def __init__(self, path):
+        self.conn = connect(path, "pos", ARCHIVE_PRAGMAS)
+        try:
+            create_schema(self.conn)
+            self.conn.commit()
+        except BaseException:
+            self.conn.close()
+            raise
+
+    def add(self, orders, items):
+        """Store orders and their items and commit
+
+        orders are (id, customer_id, order_date, total, status) and items
+        (id, order_id, product_id, quantity, price) rows. Rows already in
+        the file are replaced, so copying a batch twice is harmless.
+        """
+        with self.conn:
+            self.conn.executemany(queries.ARCHIVE_ORDER, orders)
+            self.conn.executemany(queries.ARCHIVE_ORDER_ITEM, items)
+
+    def close(self):
+        self.conn.close()
+
+
+class ArchiveFiles:
+    """The per-year archive files of one hot database
+
+    db_path is None for an in-memory database, which has no archive.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        if db_path:
+            self.directory = os.path.dirname(os.path.abspath(db_path))
+            self.stem = os.path.splitext(os.path.basename(db_path))[0]
+            self._name = re.compile(rf"^{re.escape(self.stem)}-archive-(\d{{4}})\.db$")
+
+    @classmethod
+    def for_connection(cls, conn):
+        """Return the archive files of the database a connection is open on"""
+        return cls(database_path(conn))
+
+    def path(self, year):
+        """Return the archive file of a year"""
+        if not self.db_path:
+            raise ValueError("An in-memory database has no archive files")
+        return os.path.join(self.directory, f"{self.stem}-archive-{year:04d}.db")
+
+    def years(self, first_year=None, last_year=None):
+        """Return the years that have an archive file, oldest first"""
+        if not self.db_path:
+            return []
+        years = []
+        for name in os.listdir(self.directory):
+            match = self._name.match(name)
+            if match:
+                year = int(match.group(1))
+                if (first_year or year) <= year <= (last_year or year):
+                    years.append(year)
+        return sorted(years)
+
+    def open(self, year):
+        """Open a year's archive file for writing, creating it if needed"""
+        return ArchiveFile(self.path(year))
+
+    @contextmanager
+    def attached(self, conn, year):
+        """Attach a year's archive file to conn as "archive" for a with block
+
+        The file must exist; every cursor reading from it must be closed or
+        exhausted by the end of the block.
+        """
+        conn.execute(f"ATTACH DATABASE ? AS {ALIAS}", (self.path(year),))
+        try:
+            yield
+        finally:
+            conn.execute(f"DETACH DATABASE {ALIAS}")
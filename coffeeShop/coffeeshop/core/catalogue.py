@@ -0,0 +1,111 @@
+"""In-memory product catalogue for the order screen
+
+The whole catalogue is read with one query and kept by id and by
+category, with stock, so switching categories at the counter needs no
+database round trip. Services write through to it after each commit:
+new and edited products are put in and stock is taken out as orders are
+submitted. Changes made by other processes (another till, an import) are
+picked up when the cache is older than max_age and is loaded again.
+"""
+import threading
+import time
+from collections import namedtuple
+
+# Seconds before the order screen reloads the catalogue
+DEFAULT_MAX_AGE = 300
+
+Product = namedtuple("Product", "id name category price stock")
+
+
+class CatalogueCache:
+    """Products by id and by category
+
+    It is filled and updated on the database thread and read on the UI
+    thread, so every access holds a lock.
+    """
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._products = {}
+        self._by_category = {}
+        self._loaded_at = None
+
+    @property
+    def fresh(self):
+        """True if the cache is loaded and younger than max_age"""
+        with self._lock:
+            loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self.max_age
+
+    def load(self, products):
+        """Replace the contents with products, a ProductRepository"""
+        rows = products.catalogue()
+        with self._lock:
+            self._products = {}
+            self._by_category = {}
+            for row in rows:
+                self._add(Product(*row))
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Forget everything, so the next user loads the catalogue again"""
+        with self._lock:
+            self._products = {}
+            self._by_category = {}
+            self._loaded_at = None
+
+    def get(self, product_id):
+        """Return the Product with an id, or None"""
+        with self._lock:
+            return self._products.get(product_id)
+
+    def categories(self):
+        """Return the product categories, sorted"""
+        with self._lock:
+            return sorted(self._by_category)
+
+    def in_stock(self, category=None):
+        """Return (id, name, price) of the products that can be ordered, by name
+
+        The same rows as ProductRepository.in_stock(), without a query.
+        """
+        with self._lock:
+            if category is None:
+                products = self._products.values()
+            else:
+                products = self._by_category.get(category, {}).values()
+            rows = [(p.id, p.name, p.price) for p in products if p.stock > 0]
+        rows.sort(key=lambda row: (row[1], row[0]))
+        return rows
+
+    def put(self, product):
+        """Add or replace a product after it was written to the database"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._remove(product.id)
+            self._add(product)
+
+    def take_stock(self, quantities):
+        """Take stock out for (product_id, quantity) pairs after an order"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for product_id, quantity in quantities:
+                product = self._products.get(product_id)
+                if product is not None:
+                    self._add(product._replace(stock=product.stock - quantity))
+
+    def _add(self, product):
+        self._products[product.id] = product
+        self._by_category.setdefault(product.category, {})[product.id] = product
+
+    def _remove(self, product_id):
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        in_category = self._by_category[product.category]
+        del in_category[product.id]
+        if not in_category:
+            del self._by_category[product.category]
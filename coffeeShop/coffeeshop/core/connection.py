@@ -0,0 +1,178 @@
+"""SQLite connections tuned for the way they are used
+
+Every connection goes through connect(), which applies one of the named
+PROFILES as PRAGMAs:
+
+    pos        the tills: WAL, so report readers never block order writers,
+               and synchronous=NORMAL, so a commit costs one fsync at most
+    reporting  read-only, with a large page cache and memory-mapped reads
+    bulk       imports and rebuilds: no fsync, big cache, temp data in memory
+
+The database path, the profile and per-profile PRAGMA overrides can be set
+in an ini file (coffeeshop.ini by default) and on the command line:
+
+    [database]
+    path = coffee_shop.db
+    profile = pos
+
+    [profile reporting]
+    cache_size = -262144
+
+    [instrumentation]
+    enabled = yes
+    slow_ms = 50
+    slow_log = slow_queries.log
+
+Instrumented connections (see instrument.py) time every statement; they
+are on unless the config file turns them off.
+"""
+import configparser
+import os
+import re
+import sqlite3
+from urllib.parse import quote
+
+from . import instrument
+
+DEFAULT_DB_PATH = "coffee_shop.db"
+DEFAULT_PROFILE = "pos"
+CONFIG_FILE = "coffeeshop.ini"
+
+# PRAGMAs of each profile, applied in this order. busy_timeout comes first
+# so that switching the journal mode waits for other connections.
+PROFILES = {
+    "pos": {
+        "busy_timeout": 5000,
+        "journal_mode": "wal",
+        "synchronous": "normal",
+    },
+    "reporting": {
+        "busy_timeout": 5000,
+        "query_only": "on",
+        "cache_size": -65536,  # KiB, so 64 MiB
+        "mmap_size": 268435456,
+        "temp_store": "memory",
+    },
+    "bulk": {
+        "busy_timeout": 30000,
+        "journal_mode": "wal",
+        "synchronous": "off",
+        "cache_size": -262144,
+        "temp_store": "memory",
+    },
+}
+
+# Profiles whose connections are opened read-only
+READ_ONLY_PROFILES = {"reporting"}
+
+_PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+_PRAGMA_VALUE = re.compile(r"^-?\w+$")
+
+
+def check_profile(profile):
+    """Raise ValueError unless profile names one of PROFILES"""
+    if profile not in PROFILES:
+        raise ValueError(
+            f"Unknown connection profile {profile!r}, expected one of {', '.join(PROFILES)}"
+        )
+
+
+def apply_pragmas(conn, pragmas):
+    """Run PRAGMA name = value for each item of a dict"""
+    for name, value in pragmas.items():
+        # PRAGMA values cannot be bound as parameters, so check them instead
+        if not _PRAGMA_NAME.match(name) or not _PRAGMA_VALUE.match(str(value)):
+            raise ValueError(f"Invalid PRAGMA setting {name} = {value!r}")
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+
+def connect(path, profile=DEFAULT_PROFILE, overrides=None, instrument_queries=False):
+    """Open a connection to the database at path with a named profile
+
+    overrides maps PRAGMA names to values that replace or extend the
+    profile's own. instrument_queries opens an InstrumentedConnection.
+    """
+    check_profile(profile)
+    pragmas = dict(PROFILES[profile])
+    pragmas.update(overrides or {})
+
+    factory = instrument.InstrumentedConnection if instrument_queries else sqlite3.Connection
+    if profile in READ_ONLY_PROFILES and path != ":memory:":
+        uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, factory=factory)
+    else:
+        conn = sqlite3.connect(path, factory=factory)
+
+    try:
+        apply_pragmas(conn, pragmas)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+class ConnectionFactory:
+    """Open connections to one database, with a default profile
+
+    overrides maps a profile name to the PRAGMA overrides for that profile.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, profile=DEFAULT_PROFILE, overrides=None,
+                 instrument_queries=True):
+        check_profile(profile)
+        self.path = path
+        self.profile = profile
+        self.overrides = overrides or {}
+        self.instrument_queries = instrument_queries
+
+    def connect(self, profile=None):
+        """Open a connection with the given profile, or the default one"""
+        profile = profile or self.profile
+        return connect(self.path, profile, self.overrides.get(profile), self.instrument_queries)
+
+
+def load_config(config_path=None, path=None, profile=None):
+    """Return a ConnectionFactory set up from a config file
+
+    config_path defaults to coffeeshop.ini in the working directory, which
+    may be missing. path and profile, usually from the command line, take
+    precedence over the file.
+    """
+    parser = configparser.ConfigParser()
+    if config_path is not None:
+        with open(config_path) as config_file:
+            parser.read_file(config_file)
+    else:
+        parser.read(CONFIG_FILE)
+
+    database = parser["database"] if parser.has_section("database") else {}
+    overrides = {}
+    for section in parser.sections():
+        if section.startswith("profile "):
+            overrides[section[len("profile "):].strip()] = dict(parser[section])
+
+    enabled = True
+    if parser.has_section("instrumentation"):
+        settings = parser["instrumentation"]
+        enabled = settings.getboolean("enabled", True)
+        instrument.STATS.slow_ms = settings.getfloat("slow_ms", instrument.DEFAULT_SLOW_MS)
+        if settings.get("slow_log"):
+            instrument.configure_slow_log(settings["slow_log"])
+
+    return ConnectionFactory(
+        path=path or database.get("path", DEFAULT_DB_PATH),
+        profile=profile or database.get("profile", DEFAULT_PROFILE),
+        overrides=overrides,
+        instrument_queries=enabled,
+    )
+
+
+def add_arguments(parser):
+    """Add the --config and --profile options to an argparse parser"""
+    parser.add_argument(
+        "--config", help=f"database settings file (default: {CONFIG_FILE} if present)"
+    )
+    parser.add_argument(
+        "--profile", choices=list(PROFILES),
+        help="connection profile (default: from the config file, else pos)",
+    )
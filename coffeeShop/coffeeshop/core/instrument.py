@@ -0,0 +1,286 @@
+"""Per-statement timing for SQLite connections
+
+connection.connect(..., instrument_queries=True) opens an
+InstrumentedConnection. Every statement run through it is timed from
+execute until its last row has been fetched, and recorded in the
+process-wide QueryStats collector STATS: call count, rows, total time and
+p50/p95/p99 latency over the most recent calls. Statements slower than the
+collector's threshold are logged to the "coffeeshop.slow_queries" logger
+together with their EXPLAIN QUERY PLAN, captured on the spot.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from . import queries
+
+DEFAULT_SLOW_MS = 50.0
+# Latency samples kept per statement for the percentiles
+SAMPLE_SIZE = 1024
+# Slow statements kept for the admin screen
+SLOW_LOG_SIZE = 100
+
+slow_log = logging.getLogger("coffeeshop.slow_queries")
+# Silent until configure_slow_log() or the application's logging config
+# gives it somewhere to go
+slow_log.addHandler(logging.NullHandler())
+
+
+def normalize(sql):
+    """Collapse whitespace so the same statement always has the same key"""
+    return " ".join(sql.split())
+
+
+def percentile(ordered, fraction):
+    """Return the nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, round(fraction * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class QueryStats:
+    """Thread-safe counters for every statement seen"""
+
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._plans = {}
+        self._slow = deque(maxlen=SLOW_LOG_SIZE)
+        self._names = None
+
+    def statement_name(self, key):
+        """Return the queries.py name of a normalized statement, if it has one"""
+        if self._names is None:
+            self._names = {normalize(sql): name for name, sql in queries.all_queries().items()}
+        return self._names.get(key)
+
+    def record(self, sql, elapsed_ms, rows, conn=None, params=()):
+        """Count one execution of sql; capture its plan if it was slow"""
+        key = normalize(sql)
+
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                entry = self._statements[key] = {
+                    "count": 0,
+                    "rows": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "slow": 0,
+                    "samples": deque(maxlen=SAMPLE_SIZE),
+                }
+            entry["count"] += 1
+            entry["rows"] += max(rows, 0)
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["samples"].append(elapsed_ms)
+
+            slow = elapsed_ms >= self.slow_ms
+            if slow:
+                entry["slow"] += 1
+            need_plan = slow and conn is not None and key not in self._plans
+
+        if not slow:
+            return
+
+        # EXPLAIN runs outside the lock, on the connection that was slow
+        if need_plan:
+            plan = explain(conn, sql, params)
+            with self._lock:
+                self._plans[key] = plan
+        with self._lock:
+            plan = self._plans.get(key, [])
+            self._slow.append({
+                "at": datetime.now().isoformat(timespec="seconds"),
+                "name": self.statement_name(key),
+                "sql": key,
+                "ms": elapsed_ms,
+                "rows": rows,
+                "plan": plan,
+            })
+
+        slow_log.warning(
+            "slow query %.1f ms, %d rows: %s\n    plan: %s",
+            elapsed_ms, rows, self.statement_name(key) or key, " | ".join(plan),
+        )
+
+    def snapshot(self):
+        """Return the stats of every statement as a list of dicts, slowest total first"""
+        with self._lock:
+            items = [(key, dict(entry, samples=sorted(entry["samples"])))
+                     for key, entry in self._statements.items()]
+            plans = dict(self._plans)
+
+        result = []
+        for key, entry in items:
+            samples = entry.pop("samples")
+            result.append(dict(
+                entry,
+                name=self.statement_name(key),
+                sql=key,
+                mean_ms=entry["total_ms"] / entry["count"],
+                p50_ms=percentile(samples, 0.50),
+                p95_ms=percentile(samples, 0.95),
+                p99_ms=percentile(samples, 0.99),
+                plan=plans.get(key),
+            ))
+        result.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return result
+
+    def slow_queries(self):
+        """Return the most recent slow statements, newest last"""
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self._statements.clear()
+            self._plans.clear()
+            self._slow.clear()
+
+    def dump(self, path):
+        """Write the stats and the slow log to a JSON file"""
+        data = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "slow_ms": self.slow_ms,
+            "statements": self.snapshot(),
+            "slow_queries": self.slow_queries(),
+        }
+        with open(path, "w") as output:
+            json.dump(data, output, indent=2)
+            output.write("\n")
+
+
+STATS = QueryStats()
+
+
+def explain(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN lines of a statement, or [] if it has none"""
+    try:
+        cursor = sqlite3.Cursor(conn)  # a plain cursor, so this is not timed
+        rows = cursor.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error:
+        return []
+    return [row[3] for row in rows]
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that reports each statement to its connection's stats
+
+    A statement is finished when its rows run out, or when the cursor is
+    executed again, closed or garbage collected.
+    """
+
+    _sql = None
+
+    def execute(self, sql, parameters=(), /):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._elapsed = time.perf_counter() - started
+        self._sql = sql
+        self._params = parameters
+        self._rows = 0
+        if self.description is None:
+            self._rows = self.rowcount
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters, /):
+        self._finish()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.connection.stats.record(sql, elapsed, self.rowcount)
+        return self
+
+    def _fetched(self, started, rows, done):
+        if self._sql is None:
+            return
+        self._elapsed += time.perf_counter() - started
+        self._rows += rows
+        if done:
+            self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        size = self.arraysize if size is None else size
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass  # e.g. at interpreter shutdown
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        try:
+            self.connection.stats.record(
+                sql, self._elapsed * 1000, self._rows, self.connection, self._params
+            )
+        except sqlite3.ProgrammingError:
+            pass  # the connection was closed first
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A connection whose cursors record their statements in self.stats"""
+
+    stats = STATS
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The C implementations of these shortcuts bypass self.cursor()
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def configure_slow_log(path):
+    """Append slow query log entries to a file"""
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.WARNING)
@@ -0,0 +1,748 @@
+"""Versioned schema migrations for the coffee shop database
+
+The schema version lives in ``PRAGMA user_version``. Each migration is
+applied once, in order, inside its own transaction, so databases created
+by older releases are upgraded in place.
+"""
+
+
+# Version 1: the original tables. IF NOT EXISTS lets databases created
+# before versioning (user_version 0) adopt the schema unchanged.
+BASE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        price REAL NOT NULL,
+        cost REAL NOT NULL,
+        stock INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS customers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT,
+        email TEXT,
+        points INTEGER DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER,
+        order_date TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        status TEXT DEFAULT 'Pending',
+        FOREIGN KEY (customer_id) REFERENCES customers(id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        price REAL NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders(id),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    )
+    ''',
+]
+
+# Version 2: indexes for the order lists, joins and reports
+INDEXES = [
+    # Recent orders, order list and sales report date ranges
+    "CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders(order_date)",
+    # Status filter on the orders screen, newest first
+    "CREATE INDEX IF NOT EXISTS idx_orders_status_date ON orders(status, order_date)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders(customer_id)",
+    # Revenue and popular products only ever look at completed orders;
+    # the partial index covers both without touching the table
+    '''
+    CREATE INDEX IF NOT EXISTS idx_orders_completed
+    ON orders(status, total_amount)
+    WHERE status = 'Completed'
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)",
+    "CREATE INDEX IF NOT EXISTS idx_order_items_product_id ON order_items(product_id)",
+    # Category filter on the new order screen, sorted by name
+    "CREATE INDEX IF NOT EXISTS idx_products_category ON products(category, name)",
+    "CREATE INDEX IF NOT EXISTS idx_products_name ON products(name)",
+    "CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(name)",
+]
+
+# Version 3: single-row summary of the dashboard numbers, kept current by
+# triggers so the dashboard never has to count or sum whole tables
+STATS = [
+    '''
+    CREATE TABLE IF NOT EXISTS stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_products INTEGER NOT NULL DEFAULT 0,
+        total_customers INTEGER NOT NULL DEFAULT 0,
+        total_orders INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    INSERT OR REPLACE INTO stats (id, total_products, total_customers, total_orders, revenue)
+    SELECT
+        1,
+        (SELECT COUNT(*) FROM products),
+        (SELECT COUNT(*) FROM customers),
+        (SELECT COUNT(*) FROM orders),
+        (SELECT COALESCE(SUM(total_amount), 0) FROM orders WHERE status = 'Completed')
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_products_insert
+    AFTER INSERT ON products
+    BEGIN
+        UPDATE stats SET total_products = total_products + 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_products_delete
+    AFTER DELETE ON products
+    BEGIN
+        UPDATE stats SET total_products = total_products - 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_customers_insert
+    AFTER INSERT ON customers
+    BEGIN
+        UPDATE stats SET total_customers = total_customers + 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_customers_delete
+    AFTER DELETE ON customers
+    BEGIN
+        UPDATE stats SET total_customers = total_customers - 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_orders_insert
+    AFTER INSERT ON orders
+    BEGIN
+        UPDATE stats SET
+            total_orders = total_orders + 1,
+            revenue = revenue
+                + CASE WHEN NEW.status = 'Completed' THEN NEW.total_amount ELSE 0 END
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_orders_delete
+    AFTER DELETE ON orders
+    BEGIN
+        UPDATE stats SET
+            total_orders = total_orders - 1,
+            revenue = revenue
+                - CASE WHEN OLD.status = 'Completed' THEN OLD.total_amount ELSE 0 END
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_orders_update
+    AFTER UPDATE OF status, total_amount ON orders
+    WHEN OLD.status IS NOT NEW.status OR OLD.total_amount IS NOT NEW.total_amount
+    BEGIN
+        UPDATE stats SET
+            revenue = revenue
+                - CASE WHEN OLD.status = 'Completed' THEN OLD.total_amount ELSE 0 END
+                + CASE WHEN NEW.status = 'Completed' THEN NEW.total_amount ELSE 0 END
+        WHERE id = 1;
+    END
+    ''',
+]
+
+# Version 4: sales rollup in hourly buckets per status, kept current by
+# triggers on order inserts, deletes and status changes. The sales report
+# reads the rollup instead of grouping the orders table by date(order_date).
+DAILY_SALES = [
+    '''
+    CREATE TABLE IF NOT EXISTS daily_sales (
+        day TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        total_orders INTEGER NOT NULL DEFAULT 0,
+        total_sales REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, hour, status)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    INSERT INTO daily_sales (day, hour, status, total_orders, total_sales)
+    SELECT
+        COALESCE(date(order_date), ''),
+        COALESCE(CAST(strftime('%H', order_date) AS INTEGER), 0),
+        COALESCE(status, ''),
+        COUNT(*),
+        SUM(total_amount)
+    FROM orders
+    GROUP BY 1, 2, 3
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_sales_orders_insert
+    AFTER INSERT ON orders
+    BEGIN
+        INSERT INTO daily_sales (day, hour, status, total_orders, total_sales)
+        VALUES (
+            COALESCE(date(NEW.order_date), ''),
+            COALESCE(CAST(strftime('%H', NEW.order_date) AS INTEGER), 0),
+            COALESCE(NEW.status, ''),
+            1,
+            NEW.total_amount
+        )
+        ON CONFLICT (day, hour, status) DO UPDATE SET
+            total_orders = total_orders + 1,
+            total_sales = total_sales + excluded.total_sales;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_sales_orders_delete
+    AFTER DELETE ON orders
+    BEGIN
+        UPDATE daily_sales SET
+            total_orders = total_orders - 1,
+            total_sales = total_sales - OLD.total_amount
+        WHERE day = COALESCE(date(OLD.order_date), '')
+            AND hour = COALESCE(CAST(strftime('%H', OLD.order_date) AS INTEGER), 0)
+            AND status = COALESCE(OLD.status, '');
+        DELETE FROM daily_sales WHERE total_orders <= 0
+            AND day = COALESCE(date(OLD.order_date), '');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_sales_orders_update
+    AFTER UPDATE OF order_date, total_amount, status ON orders
+    WHEN OLD.order_date IS NOT NEW.order_date
+        OR OLD.total_amount IS NOT NEW.total_amount
+        OR OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE daily_sales SET
+            total_orders = total_orders - 1,
+            total_sales = total_sales - OLD.total_amount
+        WHERE day = COALESCE(date(OLD.order_date), '')
+            AND hour = COALESCE(CAST(strftime('%H', OLD.order_date) AS INTEGER), 0)
+            AND status = COALESCE(OLD.status, '');
+        DELETE FROM daily_sales WHERE total_orders <= 0
+            AND day = COALESCE(date(OLD.order_date), '');
+        INSERT INTO daily_sales (day, hour, status, total_orders, total_sales)
+        VALUES (
+            COALESCE(date(NEW.order_date), ''),
+            COALESCE(CAST(strftime('%H', NEW.order_date) AS INTEGER), 0),
+            COALESCE(NEW.status, ''),
+            1,
+            NEW.total_amount
+        )
+        ON CONFLICT (day, hour, status) DO UPDATE SET
+            total_orders = total_orders + 1,
+            total_sales = total_sales + excluded.total_sales;
+    END
+    ''',
+]
+
+# Version 5: trigram full-text indexes over product and customer fields.
+# They are external-content tables, so they store only the index and read
+# the row values from products and customers; triggers keep them in sync.
+SEARCH_INDEXES = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, category,
+        content='products', content_rowid='id', tokenize='trigram'
+    )
+    ''',
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+        name, phone, email,
+        content='customers', content_rowid='id', tokenize='trigram'
+    )
+    ''',
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+    "INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')",
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert
+    AFTER INSERT ON products
+    BEGIN
+        INSERT INTO products_fts(rowid, name, category)
+        VALUES (NEW.id, NEW.name, NEW.category);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete
+    AFTER DELETE ON products
+    BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, category)
+        VALUES ('delete', OLD.id, OLD.name, OLD.category);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_update
+    AFTER UPDATE OF name, category ON products
+    BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, category)
+        VALUES ('delete', OLD.id, OLD.name, OLD.category);
+        INSERT INTO products_fts(rowid, name, category)
+        VALUES (NEW.id, NEW.name, NEW.category);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customers_fts_insert
+    AFTER INSERT ON customers
+    BEGIN
+        INSERT INTO customers_fts(rowid, name, phone, email)
+        VALUES (NEW.id, NEW.name, NEW.phone, NEW.email);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customers_fts_delete
+    AFTER DELETE ON customers
+    BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, name, phone, email)
+        VALUES ('delete', OLD.id, OLD.name, OLD.phone, OLD.email);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customers_fts_update
+    AFTER UPDATE OF name, phone, email ON customers
+    BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, name, phone, email)
+        VALUES ('delete', OLD.id, OLD.name, OLD.phone, OLD.email);
+        INSERT INTO customers_fts(rowid, name, phone, email)
+        VALUES (NEW.id, NEW.name, NEW.phone, NEW.email);
+    END
+    ''',
+]
+
+# Version 6: units and revenue of completed orders per product, per day
+# and in total, for the popular products report. Triggers on orders and
+# order_items keep product_sales_daily current as orders move into or out
+# of Completed; triggers on product_sales_daily roll each change up into
+# product_sales.
+PRODUCT_SALES = [
+    '''
+    CREATE TABLE IF NOT EXISTS product_sales (
+        product_id INTEGER PRIMARY KEY,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    # Top-N walks this index from the top and stops after N rows
+    "CREATE INDEX IF NOT EXISTS idx_product_sales_units ON product_sales(units)",
+    '''
+    CREATE TABLE IF NOT EXISTS product_sales_daily (
+        day TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_product_sales_daily_insert
+    AFTER INSERT ON product_sales_daily
+    BEGIN
+        INSERT INTO product_sales (product_id, units, revenue)
+        VALUES (NEW.product_id, NEW.units, NEW.revenue)
+        ON CONFLICT (product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_product_sales_daily_update
+    AFTER UPDATE OF units, revenue ON product_sales_daily
+    BEGIN
+        UPDATE product_sales SET
+            units = units + NEW.units - OLD.units,
+            revenue = revenue + NEW.revenue - OLD.revenue
+        WHERE product_id = NEW.product_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_product_sales_daily_delete
+    AFTER DELETE ON product_sales_daily
+    BEGIN
+        UPDATE product_sales SET
+            units = units - OLD.units,
+            revenue = revenue - OLD.revenue
+        WHERE product_id = OLD.product_id;
+    END
+    ''',
+    '''
+    INSERT INTO product_sales_daily (day, product_id, units, revenue)
+    SELECT
+        COALESCE(date(o.order_date), ''),
+        oi.product_id,
+        SUM(oi.quantity),
+        SUM(oi.quantity * oi.price)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.status = 'Completed'
+    GROUP BY 1, 2
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_product_sales_orders_update
+    AFTER UPDATE OF status, order_date ON orders
+    WHEN (OLD.status = 'Completed' OR NEW.status = 'Completed')
+        AND (OLD.status IS NOT NEW.status OR OLD.order_date IS NOT NEW.order_date)
+    BEGIN
+        INSERT INTO product_sales_daily (day, product_id, units, revenue)
+        SELECT
+            COALESCE(date(OLD.order_date), ''),
+            product_id,
+            -quantity,
+            -quantity * price
+        FROM order_items
+        WHERE order_id = OLD.id AND OLD.status = 'Completed'
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue;
+        DELETE FROM product_sales_daily
+        WHERE day = COALESCE(date(OLD.order_date), '') AND units <= 0;
+        INSERT INTO product_sales_daily (day, product_id, units, revenue)
+        SELECT
+            COALESCE(date(NEW.order_date), ''),
+            product_id,
+            quantity,
+            quantity * price
+        FROM order_items
+        WHERE order_id = NEW.id AND NEW.status = 'Completed'
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_product_sales_orders_delete
+    AFTER DELETE ON orders
+    WHEN OLD.status = 'Completed'
+    BEGIN
+        INSERT INTO product_sales_daily (day, product_id, units, revenue)
+        SELECT
+            COALESCE(date(OLD.order_date), ''),
+            product_id,
+            -quantity,
+            -quantity * price
+        FROM order_items
+        WHERE order_id = OLD.id
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue;
+        DELETE FROM product_sales_daily
+        WHERE day = COALESCE(date(OLD.order_date), '') AND units <= 0;
+    END
+    ''',
+    # Items added to or removed from an order that is already completed,
+    # e.g. by an import
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_product_sales_items_insert
+    AFTER INSERT ON order_items
+    WHEN (SELECT status FROM orders WHERE id = NEW.order_id) = 'Completed'
+    BEGIN
+        INSERT INTO product_sales_daily (day, product_id, units, revenue)
+        VALUES (
+            (SELECT COALESCE(date(order_date), '') FROM orders WHERE id = NEW.order_id),
+            NEW.product_id,
+            NEW.quantity,
+            NEW.quantity * NEW.price
+        )
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_product_sales_items_delete
+    AFTER DELETE ON order_items
+    WHEN (SELECT status FROM orders WHERE id = OLD.order_id) = 'Completed'
+    BEGIN
+        UPDATE product_sales_daily SET
+            units = units - OLD.quantity,
+            revenue = revenue - OLD.quantity * OLD.price
+        WHERE day = (SELECT COALESCE(date(order_date), '') FROM orders WHERE id = OLD.order_id)
+            AND product_id = OLD.product_id;
+        DELETE FROM product_sales_daily WHERE units <= 0
+            AND day = (SELECT COALESCE(date(order_date), '') FROM orders WHERE id = OLD.order_id);
+    END
+    ''',
+]
+
+# Version 7: prefix search for the customer picker, by name ignoring case
+# or by phone number
+CUSTOMER_PREFIX_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_customers_name_nocase ON customers(name COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone)",
+]
+
+# Version 8: archiving of old orders into per-year files (archive.py).
+# The dashboard stats and the sales rollups keep counting archived orders,
+# so the triggers that take deleted orders out of them stand aside while
+# archive_state.archiving is set by the archival job's own transaction.
+# archived_before is the newest cutoff used: date ranges from before it
+# also read the archive files.
+ORDER_ARCHIVE = [
+    '''
+    CREATE TABLE IF NOT EXISTS archive_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        archived_before TEXT,
+        archiving INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    "INSERT OR IGNORE INTO archive_state (id) VALUES (1)",
+    "DROP TRIGGER IF EXISTS trg_stats_orders_delete",
+    '''
+    CREATE TRIGGER trg_stats_orders_delete
+    AFTER DELETE ON orders
+    WHEN NOT (SELECT archiving FROM archive_state WHERE id = 1)
+    BEGIN
+        UPDATE stats SET
+            total_orders = total_orders - 1,
+            revenue = revenue
+                - CASE WHEN OLD.status = 'Completed' THEN OLD.total_amount ELSE 0 END
+        WHERE id = 1;
+    END
+    ''',
+    "DROP TRIGGER IF EXISTS trg_daily_sales_orders_delete",
+    '''
+    CREATE TRIGGER trg_daily_sales_orders_delete
+    AFTER DELETE ON orders
+    WHEN NOT (SELECT archiving FROM archive_state WHERE id = 1)
+    BEGIN
+        UPDATE daily_sales SET
+            total_orders = total_orders - 1,
+            total_sales = total_sales - OLD.total_amount
+        WHERE day = COALESCE(date(OLD.order_date), '')
+            AND hour = COALESCE(CAST(strftime('%H', OLD.order_date) AS INTEGER), 0)
+            AND status = COALESCE(OLD.status, '');
+        DELETE FROM daily_sales WHERE total_orders <= 0
+            AND day = COALESCE(date(OLD.order_date), '');
+    END
+    ''',
+    "DROP TRIGGER IF EXISTS trg_product_sales_orders_delete",
+    '''
+    CREATE TRIGGER trg_product_sales_orders_delete
+    AFTER DELETE ON orders
+    WHEN OLD.status = 'Completed'
+        AND NOT (SELECT archiving FROM archive_state WHERE id = 1)
+    BEGIN
+        INSERT INTO product_sales_daily (day, product_id, units, revenue)
+        SELECT
+            COALESCE(date(OLD.order_date), ''),
+            product_id,
+            -quantity,
+            -quantity * price
+        FROM order_items
+        WHERE order_id = OLD.id
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue;
+        DELETE FROM product_sales_daily
+        WHERE day = COALESCE(date(OLD.order_date), '') AND units <= 0;
+    END
+    ''',
+    "DROP TRIGGER IF EXISTS trg_product_sales_items_delete",
+    '''
+    CREATE TRIGGER trg_product_sales_items_delete
+    AFTER DELETE ON order_items
+    WHEN (SELECT status FROM orders WHERE id = OLD.order_id) = 'Completed'
+        AND NOT (SELECT archiving FROM archive_state WHERE id = 1)
+    BEGIN
+        UPDATE product_sales_daily SET
+            units = units - OLD.quantity,
+            revenue = revenue - OLD.quantity * OLD.price
+        WHERE day = (SELECT COALESCE(date(order_date), '') FROM orders WHERE id = OLD.order_id)
+            AND product_id = OLD.product_id;
+        DELETE FROM product_sales_daily WHERE units <= 0
+            AND day = (SELECT COALESCE(date(order_date), '') FROM orders WHERE id = OLD.order_id);
+    END
+    ''',
+]
+
+# Version 9: order_ts, the order_date wall-clock time as whole seconds
+# since 1970-01-01 (what strftime('%s', order_date) returns), so date
+# filters and the order list compare and sort integers instead of text.
+# The application writes it with every order; the triggers fill it in
+# for any other writer. The order_date indexes make way for order_ts ones.
+ORDER_TIMESTAMPS = [
+    "ALTER TABLE orders ADD COLUMN order_ts INTEGER",
+    "UPDATE orders SET order_ts = CAST(strftime('%s', order_date) AS INTEGER)",
+    "DROP INDEX IF EXISTS idx_orders_order_date",
+    "DROP INDEX IF EXISTS idx_orders_status_date",
+    "CREATE INDEX IF NOT EXISTS idx_orders_order_ts ON orders(order_ts)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_status_ts ON orders(status, order_ts)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_orders_ts_insert
+    AFTER INSERT ON orders
+    WHEN NEW.order_ts IS NULL
+    BEGIN
+        UPDATE orders SET order_ts = CAST(strftime('%s', NEW.order_date) AS INTEGER)
+        WHERE id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_orders_ts_update
+    AFTER UPDATE OF order_date ON orders
+    WHEN OLD.order_date IS NOT NEW.order_date
+    BEGIN
+        UPDATE orders SET order_ts = CAST(strftime('%s', NEW.order_date) AS INTEGER)
+        WHERE id = NEW.id;
+    END
+    ''',
+]
+
+# Version 10: loyalty points as an append-only ledger. Every earn, redeem
+# or adjustment is a new row, so crediting an order appends to the end of
+# one b-tree instead of rewriting the customer's row. Compaction folds the
+# ledger into one snapshot per customer, up to points_state.compacted_through;
+# a balance is the customer's snapshot plus their ledger entries after it.
+# Ledger rows are never changed or deleted, so every balance can be rebuilt
+# by replaying it. The points customers had are carried over as one
+# "opening" entry each, and customers.points goes.
+POINTS_LEDGER = [
+    '''
+    CREATE TABLE IF NOT EXISTS points_ledger (
+        id INTEGER PRIMARY KEY,
+        customer_id INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        kind TEXT NOT NULL CHECK (kind IN ('opening', 'earn', 'redeem', 'adjust')),
+        order_id INTEGER,
+        created_ts INTEGER NOT NULL
+    )
+    ''',
+    # Covers the balance lookup's tail sum
+    '''
+    CREATE INDEX IF NOT EXISTS idx_points_ledger_customer
+    ON points_ledger(customer_id, id, points)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS points_snapshots (
+        customer_id INTEGER PRIMARY KEY,
+        balance INTEGER NOT NULL,
+        through_id INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS points_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        compacted_through INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    INSERT INTO points_ledger (customer_id, points, kind, created_ts)
+    SELECT id, points, 'opening', CAST(strftime('%s', 'now', 'localtime') AS INTEGER)
+    FROM customers
+    WHERE points != 0
+    ORDER BY id
+    ''',
+    '''
+    INSERT INTO points_snapshots (customer_id, balance, through_id)
+    SELECT customer_id, SUM(points), MAX(id)
+    FROM points_ledger
+    GROUP BY customer_id
+    ''',
+    '''
+    INSERT OR REPLACE INTO points_state (id, compacted_through)
+    VALUES (1, (SELECT COALESCE(MAX(id), 0) FROM points_ledger))
+    ''',
+    "ALTER TABLE customers DROP COLUMN points",
+]
+
+# Version 11: product sales follow order items edited in place, e.g. a
+# quantity corrected on a completed order; until now only items added or
+# removed were counted. The old line comes out of its order's day and the
+# new one goes in, each only if its order is completed. Aggregates that
+# drifted before can be recomputed with manage.py rebuild-product-sales.
+PRODUCT_SALES_ITEM_EDITS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_product_sales_items_update
+    AFTER UPDATE OF order_id, product_id, quantity, price ON order_items
+    WHEN (SELECT status FROM orders WHERE id = OLD.order_id) = 'Completed'
+        OR (SELECT status FROM orders WHERE id = NEW.order_id) = 'Completed'
+    BEGIN
+        UPDATE product_sales_daily SET
+            units = units - OLD.quantity,
+            revenue = revenue - OLD.quantity * OLD.price
+        WHERE (SELECT status FROM orders WHERE id = OLD.order_id) = 'Completed'
+            AND day = (SELECT COALESCE(date(order_date), '') FROM orders WHERE id = OLD.order_id)
+            AND product_id = OLD.product_id;
+        INSERT INTO product_sales_daily (day, product_id, units, revenue)
+        SELECT
+            COALESCE(date(order_date), ''),
+            NEW.product_id,
+            NEW.quantity,
+            NEW.quantity * NEW.price
+        FROM orders
+        WHERE id = NEW.order_id AND status = 'Completed'
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue;
+        DELETE FROM product_sales_daily WHERE units <= 0
+            AND day = (SELECT COALESCE(date(order_date), '') FROM orders WHERE id = OLD.order_id);
+    END
+    ''',
+]
+
+# (version, description, statements) in the order they must be applied
+MIGRATIONS = [
+    (1, "base tables", BASE_TABLES),
+    (2, "indexes for order lists, joins and reports", INDEXES),
+    (3, "trigger-maintained dashboard stats", STATS),
+    (4, "hourly sales rollup", DAILY_SALES),
+    (5, "full-text search indexes", SEARCH_INDEXES),
+    (6, "per-product sales aggregates", PRODUCT_SALES),
+    (7, "customer prefix search indexes", CUSTOMER_PREFIX_INDEXES),
+    (8, "order archive state", ORDER_ARCHIVE),
+    (9, "integer order timestamps", ORDER_TIMESTAMPS),
+    (10, "loyalty points ledger", POINTS_LEDGER),
+    (11, "product sales follow edited order items", PRODUCT_SALES_ITEM_EDITS),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    """Return the schema version stored in the database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending_migrations(conn):
+    """Return the migrations that have not been applied yet"""
+    version = get_version(conn)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Apply pending migrations up to target and return the new version"""
+    version = get_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this "
+            f"application supports ({SCHEMA_VERSION})"
+        )
+    if version >= target:
+        # The usual case on startup: one header read and nothing to commit
+        return version
+
+    for number, description, statements in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+
+        conn.commit()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+            # user_version is part of the database header, so it is
+            # updated atomically with the rest of the migration
+            cursor.execute(f"PRAGMA user_version = {number:d}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+
+    return version
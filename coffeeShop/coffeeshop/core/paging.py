@@ -0,0 +1,95 @@
+"""Keyset pagination for long result lists
+
+Instead of OFFSET, each page continues from the sort key of the last row
+already shown (``WHERE (order_ts, id) < (?, ?)``), so fetching page 1000
+costs the same as fetching page 1 and only one page is ever held in memory.
+"""
+
+DEFAULT_PAGE_SIZE = 100
+
+
+class KeysetQuery:
+    """A SELECT that can be read page by page in either direction
+
+    select is the SELECT ... FROM ... part, key_columns the unique sort key
+    (the last column must be unique, usually the id) and key_fields the
+    positions of those columns in each result row. where is an optional
+    filter whose parameters come before the key parameters.
+    """
+
+    def __init__(self, select, key_columns, key_fields, where=None, descending=False):
+        self.select = select
+        self.key_columns = tuple(key_columns)
+        self.key_fields = tuple(key_fields)
+        self.where = where
+        self.descending = descending
+
+    def _sql(self, seek, reverse):
+        """Build the statement for one page"""
+        conditions = [f"({self.where})"] if self.where else []
+        columns = ", ".join(self.key_columns)
+        placeholders = ", ".join("?" for _ in self.key_columns)
+
+        # Reading backwards flips both the comparison and the sort order
+        forward = not reverse
+        ascending = forward != self.descending
+        if seek:
+            operator = ">" if ascending else "<"
+            conditions.append(f"({columns}) {operator} ({placeholders})")
+
+        direction = "" if ascending else " DESC"
+        order_by = ", ".join(column + direction for column in self.key_columns)
+
+        sql = self.select
+        if conditions:
+            sql += "\nWHERE " + " AND ".join(conditions)
+        return sql + f"\nORDER BY {order_by}\nLIMIT ?"
+
+    @property
+    def first(self):
+        return self._sql(seek=False, reverse=False)
+
+    @property
+    def after(self):
+        return self._sql(seek=True, reverse=False)
+
+    @property
+    def before(self):
+        return self._sql(seek=True, reverse=True)
+
+    def statements(self):
+        """Return the page statements by name, for query plan checks"""
+        return {"first": self.first, "after": self.after, "before": self.before}
+
+    def key(self, row):
+        """Return the sort key of a result row"""
+        return tuple(row[field] for field in self.key_fields)
+
+
+class KeysetPager:
+    """Fetch pages of a KeysetQuery with fixed filter parameters
+
+    The connection is passed to each call, so page fetches can run on
+    whichever thread owns it.
+    """
+
+    def __init__(self, query, params=(), page_size=DEFAULT_PAGE_SIZE):
+        self.query = query
+        self.params = tuple(params)
+        self.page_size = page_size
+
+    def first_page(self, conn):
+        """Return the first page of rows"""
+        return conn.execute(self.query.first, self.params + (self.page_size,)).fetchall()
+
+    def page_after(self, conn, row):
+        """Return the page of rows that follows row"""
+        params = self.params + self.query.key(row) + (self.page_size,)
+        return conn.execute(self.query.after, params).fetchall()
+
+    def page_before(self, conn, row):
+        """Return the page of rows that precedes row, in display order"""
+        params = self.params + self.query.key(row) + (self.page_size,)
+        rows = conn.execute(self.query.before, params).fetchall()
+        rows.reverse()
+        return rows
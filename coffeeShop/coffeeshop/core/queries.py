@@ -0,0 +1,705 @@
+"""SQL statements used by the coffee shop app
+
+Every statement the app runs is defined here so that its query plan can be
+checked against the indexes created by the migrations (see
+``check_query_plans`` and ``manage.py check-plans``).
+"""
+import re
+from datetime import datetime
+
+from .paging import KeysetQuery
+
+# Dashboard. The stats row is maintained by triggers (migration 3);
+# REBUILD_STATS recomputes it from scratch.
+DASHBOARD_STATS = '''
+    SELECT total_products, total_customers, total_orders, revenue
+    FROM stats
+    WHERE id = 1
+'''
+REBUILD_STATS = '''
+    INSERT OR REPLACE INTO stats (id, total_products, total_customers, total_orders, revenue)
+    SELECT
+        1,
+        (SELECT COUNT(*) FROM products),
+        (SELECT COUNT(*) FROM customers),
+        (SELECT COUNT(*) FROM orders),
+        (SELECT COALESCE(SUM(total_amount), 0) FROM orders WHERE status = 'Completed')
+'''
+
+RECENT_ORDERS = '''
+    SELECT o.id, c.name, o.order_date, o.total_amount, o.status
+    FROM orders o
+    LEFT JOIN customers c ON o.customer_id = c.id
+    ORDER BY o.order_ts DESC
+    LIMIT 10
+'''
+
+# Products. Lists are read a page at a time in (name, id) order.
+PRODUCTS_PAGE = KeysetQuery(
+    "SELECT * FROM products",
+    key_columns=("name", "id"),
+    key_fields=(1, 0),
+)
+# Ranked full-text search (migration 5); a name match weighs more than a
+# category match. Terms under three characters cannot use the trigram index
+# and fall back to the LIKE query.
+SEARCH_PRODUCTS = '''
+    SELECT p.*
+    FROM products_fts
+    JOIN products p ON p.id = products_fts.rowid
+    WHERE products_fts MATCH ?
+    ORDER BY bm25(products_fts, 10.0, 1.0)
+    LIMIT ?
+'''
+SEARCH_PRODUCTS_LIKE = '''
+    SELECT * FROM products
+    WHERE name LIKE ? OR category LIKE ?
+    ORDER BY name
+    LIMIT ?
+'''
+INSERT_PRODUCT = '''
+    INSERT INTO products (name, category, price, cost, stock)
+    VALUES (?, ?, ?, ?, ?)
+'''
+# Rows with their ids already assigned (or NULL for a new id), for bulk loads
+IMPORT_PRODUCT = '''
+    INSERT INTO products (id, name, category, price, cost, stock)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+UPDATE_PRODUCT = '''
+    UPDATE products
+    SET name=?, category=?, price=?, cost=?, stock=?
+    WHERE id=?
+'''
+PRODUCT_CATEGORIES = "SELECT DISTINCT category FROM products ORDER BY category"
+PRODUCTS_IN_STOCK = "SELECT id, name, price FROM products WHERE stock > 0 ORDER BY name"
+PRODUCTS_IN_STOCK_BY_CATEGORY = '''
+    SELECT id, name, price FROM products
+    WHERE category = ? AND stock > 0
+    ORDER BY name
+'''
+# Takes stock out only if there is enough of it; for a product that is
+# short the statement changes no row
+RESERVE_STOCK = "UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?"
+# Products by a JSON array of ids
+PRODUCT_STOCK = '''
+    SELECT id, name, stock FROM products
+    WHERE id IN (SELECT value FROM json_each(?))
+'''
+# Bulk exports (transfer.py) read whole tables in id order
+EXPORT_PRODUCTS = "SELECT id, name, category, price, cost, stock FROM products ORDER BY id"
+EXPORT_ORDERS = '''
+    SELECT id, customer_id, order_date, total_amount, status
+    FROM orders
+    ORDER BY id
+'''
+EXPORT_ORDER_ITEMS = '''
+    SELECT order_id, product_id, quantity, price
+    FROM order_items
+    ORDER BY id
+'''
+# Every product, for the in-memory catalogue (catalogue.py)
+CATALOGUE_PRODUCTS = "SELECT id, name, category, price, stock FROM products"
+
+# Customers. Their points are read as the balance of the points ledger:
+# the snapshot plus the entries after it, summed from the ledger's index.
+_CUSTOMER_COLUMNS = '''
+    c.id, c.name, c.phone, c.email,
+    COALESCE(s.balance, 0) + (
+        SELECT COALESCE(SUM(l.points), 0) FROM points_ledger l
+        WHERE l.customer_id = c.id AND l.id > COALESCE(s.through_id, 0)
+    ) AS points
+'''
+_CUSTOMER_SNAPSHOT = "LEFT JOIN points_snapshots s ON s.customer_id = c.id"
+CUSTOMERS_PAGE = KeysetQuery(
+    f"SELECT {_CUSTOMER_COLUMNS} FROM customers c {_CUSTOMER_SNAPSHOT}",
+    key_columns=("c.name", "c.id"),
+    key_fields=(1, 0),
+)
+SEARCH_CUSTOMERS = f'''
+    SELECT {_CUSTOMER_COLUMNS}
+    FROM customers_fts
+    JOIN customers c ON c.id = customers_fts.rowid
+    {_CUSTOMER_SNAPSHOT}
+    WHERE customers_fts MATCH ?
+    ORDER BY bm25(customers_fts, 10.0, 5.0, 5.0)
+    LIMIT ?
+'''
+SEARCH_CUSTOMERS_LIKE = f'''
+    SELECT {_CUSTOMER_COLUMNS}
+    FROM customers c {_CUSTOMER_SNAPSHOT}
+    WHERE c.name LIKE ? OR c.phone LIKE ? OR c.email LIKE ?
+    ORDER BY c.name
+    LIMIT ?
+'''
+EXPORT_CUSTOMERS = f"SELECT {_CUSTOMER_COLUMNS} FROM customers c {_CUSTOMER_SNAPSHOT} ORDER BY c.id"
+INSERT_CUSTOMER = "INSERT INTO customers (name, phone, email) VALUES (?, ?, ?)"
+# Rows with their ids already assigned, for bulk loads
+IMPORT_CUSTOMER = "INSERT INTO customers (id, name, phone, email) VALUES (?, ?, ?, ?)"
+UPDATE_CUSTOMER = "UPDATE customers SET name=?, phone=?, email=? WHERE id=?"
+REBUILD_PRODUCTS_FTS = "INSERT INTO products_fts(products_fts) VALUES ('rebuild')"
+REBUILD_CUSTOMERS_FTS = "INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')"
+MAX_CUSTOMER_ID = "SELECT COALESCE(MAX(id), 0) FROM customers"
+# Customer picker: prefix searches, each a range scan of one index. The
+# upper bound comes from prefix_upper_bound().
+CUSTOMERS_BY_NAME_PREFIX = '''
+    SELECT id, name, phone FROM customers
+    WHERE name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE
+    ORDER BY name COLLATE NOCASE
+    LIMIT ?
+'''
+CUSTOMERS_BY_PHONE_PREFIX = '''
+    SELECT id, name, phone FROM customers
+    WHERE phone >= ? AND phone < ?
+    ORDER BY phone
+    LIMIT ?
+'''
+CUSTOMER_NAME = "SELECT name FROM customers WHERE id = ?"
+
+# Loyalty points ledger (migration 10). Compaction folds the entries after
+# the last compaction into the snapshots; a replay clears the snapshots and
+# folds the whole ledger again.
+ADD_POINTS = '''
+    INSERT INTO points_ledger (customer_id, points, kind, order_id, created_ts)
+    VALUES (?, ?, ?, ?, ?)
+'''
+# Takes the customer id three times
+POINTS_BALANCE = '''
+    SELECT
+        COALESCE((SELECT balance FROM points_snapshots WHERE customer_id = ?), 0)
+        + (
+            SELECT COALESCE(SUM(points), 0) FROM points_ledger
+            WHERE customer_id = ? AND id > COALESCE(
+                (SELECT through_id FROM points_snapshots WHERE customer_id = ?), 0
+            )
+        )
+'''
+LAST_POINTS_ENTRY = "SELECT COALESCE(MAX(id), 0) FROM points_ledger"
+POINTS_COMPACTED_THROUGH = "SELECT compacted_through FROM points_state WHERE id = 1"
+SET_POINTS_COMPACTED_THROUGH = "UPDATE points_state SET compacted_through = ? WHERE id = 1"
+FOLD_POINTS = '''
+    INSERT INTO points_snapshots (customer_id, balance, through_id)
+    SELECT customer_id, SUM(points), ?
+    FROM points_ledger
+    WHERE id > ? AND id <= ?
+    GROUP BY customer_id
+    ON CONFLICT (customer_id) DO UPDATE SET
+        balance = balance + excluded.balance,
+        through_id = excluded.through_id
+'''
+CLEAR_POINTS_SNAPSHOTS = "DELETE FROM points_snapshots"
+# Every snapshot and every entry after one, summed per customer into the
+# balances as they stand, for comparison with a replay
+POINTS_BALANCES = '''
+    SELECT s.customer_id, s.balance FROM points_snapshots s
+    UNION ALL
+    SELECT l.customer_id, l.points
+    FROM points_ledger l
+    LEFT JOIN points_snapshots s ON s.customer_id = l.customer_id
+    WHERE l.id > COALESCE(s.through_id, 0)
+'''
+
+# Orders. The order list is read a page at a time, newest first; the
+# status filter and the search are extra conditions on the same pages.
+# order_ts comes last, after the displayed columns, as the page key.
+_ORDER_LIST_SELECT = '''
+    SELECT o.id, c.name, o.order_date, o.total_amount, o.status, o.order_ts
+    FROM orders o
+    LEFT JOIN customers c ON o.customer_id = c.id
+'''
+ORDERS_PAGE = KeysetQuery(
+    _ORDER_LIST_SELECT,
+    key_columns=("o.order_ts", "o.id"),
+    key_fields=(5, 0),
+    descending=True,
+)
+ORDERS_BY_STATUS_PAGE = KeysetQuery(
+    _ORDER_LIST_SELECT,
+    key_columns=("o.order_ts", "o.id"),
+    key_fields=(5, 0),
+    where="o.status = ?",
+    descending=True,
+)
+# Customer name, phone or email through the search index, or the order id
+SEARCH_ORDERS_PAGE = KeysetQuery(
+    _ORDER_LIST_SELECT,
+    key_columns=("o.order_ts", "o.id"),
+    key_fields=(5, 0),
+    where='''
+        o.customer_id IN (
+            SELECT rowid FROM customers_fts WHERE customers_fts MATCH ?
+        )
+        OR o.id = ?
+    ''',
+    descending=True,
+)
+# Fallback for terms too short for the trigram index
+SEARCH_ORDERS_LIKE_PAGE = KeysetQuery(
+    _ORDER_LIST_SELECT,
+    key_columns=("o.order_ts", "o.id"),
+    key_fields=(5, 0),
+    where="c.name LIKE ? OR o.id = ?",
+    descending=True,
+)
+ORDER_DETAILS = '''
+    SELECT o.id, c.name, o.order_date, o.total_amount, o.status
+    FROM orders o
+    LEFT JOIN customers c ON o.customer_id = c.id
+    WHERE o.id = ?
+'''
+ORDER_ITEMS = '''
+    SELECT p.name, oi.quantity, oi.price, (oi.quantity * oi.price) as total
+    FROM order_items oi
+    JOIN products p ON oi.product_id = p.id
+    WHERE oi.order_id = ?
+'''
+# One row per order item, in order, for receipts.receipts_from_rows().
+# Date ranges on orders are order_ts bounds, start inclusive, end exclusive
+# (see day_range).
+RECEIPT_ROWS_RANGE = '''
+    SELECT o.id, o.order_date, o.total_amount, c.name, p.name, oi.quantity, oi.price
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    JOIN products p ON oi.product_id = p.id
+    LEFT JOIN customers c ON o.customer_id = c.id
+    WHERE o.order_ts >= ? AND o.order_ts < ?
+    ORDER BY o.order_ts, o.id
+'''
+# Report exports (report_export.py): one row per order or per line item.
+# Like the receipt rows, each starts with the order id and date.
+ORDER_ROWS_RANGE = '''
+    SELECT o.id, o.order_date, o.status, o.customer_id, c.name, o.total_amount
+    FROM orders o
+    LEFT JOIN customers c ON o.customer_id = c.id
+    WHERE o.order_ts >= ? AND o.order_ts < ?
+    ORDER BY o.order_ts, o.id
+'''
+ORDER_LINE_ROWS_RANGE = '''
+    SELECT
+        o.id, o.order_date, o.status, c.name,
+        oi.product_id, p.name, p.category, oi.quantity, oi.price, oi.quantity * oi.price
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    LEFT JOIN products p ON oi.product_id = p.id
+    LEFT JOIN customers c ON o.customer_id = c.id
+    WHERE o.order_ts >= ? AND o.order_ts < ?
+    ORDER BY o.order_ts, o.id, oi.id
+'''
+UPDATE_ORDER_STATUS = "UPDATE orders SET status = ? WHERE id = ?"
+INSERT_ORDER = '''
+    INSERT INTO orders (customer_id, order_date, total_amount, status, order_ts)
+    VALUES (?, ?, ?, ?, ?)
+'''
+MAX_ORDER_ID = "SELECT COALESCE(MAX(id), 0) FROM orders"
+IMPORT_ORDER = '''
+    INSERT INTO orders (id, customer_id, order_date, total_amount, status, order_ts)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+INSERT_ORDER_ITEM = '''
+    INSERT INTO order_items (order_id, product_id, quantity, price)
+    VALUES (?, ?, ?, ?)
+'''
+
+# Reports. Sales figures come from the daily_sales rollup (migration 4),
+# which holds one row per day, hour and status; the report sums every
+# status, as it did when it grouped the orders table directly.
+SALES_REPORT_RANGE = '''
+    SELECT
+        day,
+        SUM(total_orders) as total_orders,
+        SUM(total_sales) as total_sales
+    FROM daily_sales
+    WHERE day BETWEEN ? AND ?
+    GROUP BY day
+    ORDER BY day
+'''
+SALES_REPORT_RECENT = '''
+    SELECT
+        day,
+        SUM(total_orders) as total_orders,
+        SUM(total_sales) as total_sales
+    FROM daily_sales
+    GROUP BY day
+    ORDER BY day DESC
+    LIMIT 30
+'''
+HOURLY_SALES_RANGE = '''
+    SELECT
+        printf('%02d:00', hour) as hour,
+        SUM(total_orders) as total_orders,
+        SUM(total_sales) as total_sales
+    FROM daily_sales
+    WHERE day BETWEEN ? AND ?
+    GROUP BY daily_sales.hour
+    ORDER BY daily_sales.hour
+'''
+# Two subqueries so each can use the min/max optimisation on the index
+ORDER_DATE_RANGE = '''
+    SELECT
+        (SELECT date(MIN(order_ts), 'unixepoch') FROM orders),
+        (SELECT date(MAX(order_ts), 'unixepoch') FROM orders)
+'''
+DELETE_DAILY_SALES_RANGE = "DELETE FROM daily_sales WHERE day BETWEEN ? AND ?"
+# Grouped by whole hours of order_ts, so each group's day is formatted once
+BACKFILL_DAILY_SALES_RANGE = '''
+    INSERT INTO daily_sales (day, hour, status, total_orders, total_sales)
+    SELECT
+        date(order_ts, 'unixepoch'),
+        order_ts % 86400 / 3600,
+        COALESCE(status, ''),
+        COUNT(*),
+        SUM(total_amount)
+    FROM orders
+    WHERE order_ts >= ? AND order_ts < ?
+    GROUP BY order_ts / 3600, 3
+'''
+# Popular products come from the product_sales aggregates (migration 6):
+# all-time figures per product, or per-day figures summed over a range
+POPULAR_PRODUCTS = '''
+    SELECT p.name, p.category, s.units as total_sold, s.revenue as total_revenue
+    FROM product_sales s
+    JOIN products p ON p.id = s.product_id
+    WHERE s.units > 0
+    ORDER BY s.units DESC
+    LIMIT ?
+'''
+POPULAR_PRODUCTS_RANGE = '''
+    SELECT
+        p.name,
+        p.category,
+        SUM(s.units) as total_sold,
+        SUM(s.revenue) as total_revenue
+    FROM product_sales_daily s
+    JOIN products p ON p.id = s.product_id
+    WHERE s.day BETWEEN ? AND ?
+    GROUP BY s.product_id
+    HAVING total_sold > 0
+    ORDER BY total_sold DESC
+    LIMIT ?
+'''
+# Report exports (report_export.py). The rollups count archived orders
+# too, so these never read the archive files.
+DAILY_SALES_EXPORT_RANGE = '''
+    SELECT day, status, SUM(total_orders), SUM(total_sales)
+    FROM daily_sales
+    WHERE day BETWEEN ? AND ?
+    GROUP BY day, status
+    ORDER BY day, status
+'''
+PRODUCT_SALES_EXPORT_RANGE = '''
+    SELECT s.day, s.product_id, p.name, p.category, s.units, s.revenue
+    FROM product_sales_daily s
+    LEFT JOIN products p ON p.id = s.product_id
+    WHERE s.day BETWEEN ? AND ? AND s.units != 0
+    ORDER BY s.day, s.product_id
+'''
+# Rebuilding product_sales_daily also rebuilds product_sales, through the
+# triggers on product_sales_daily
+CLEAR_PRODUCT_SALES_DAILY = "DELETE FROM product_sales_daily"
+CLEAR_PRODUCT_SALES = "DELETE FROM product_sales"
+REBUILD_PRODUCT_SALES = '''
+    INSERT INTO product_sales_daily (day, product_id, units, revenue)
+    SELECT
+        COALESCE(date(o.order_ts, 'unixepoch'), ''),
+        oi.product_id,
+        SUM(oi.quantity),
+        SUM(oi.quantity * oi.price)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.status = 'Completed'
+    GROUP BY o.order_ts / 86400, oi.product_id
+'''
+
+# Archive (migration 8, archive.py). Completed orders older than a cutoff
+# move to per-year archive files. Order ids are passed as one JSON array.
+ARCHIVED_BEFORE = "SELECT archived_before FROM archive_state WHERE id = 1"
+SET_ARCHIVED_BEFORE = '''
+    UPDATE archive_state
+    SET archived_before = MAX(COALESCE(archived_before, ''), ?)
+    WHERE id = 1
+'''
+SET_ARCHIVING = "UPDATE archive_state SET archiving = ? WHERE id = 1"
+ARCHIVABLE_ORDERS = '''
+    SELECT id, customer_id, order_date, total_amount, status
+    FROM orders
+    WHERE status = 'Completed' AND order_ts < ?
+    ORDER BY order_ts
+    LIMIT ?
+'''
+ITEMS_OF_ORDERS = '''
+    SELECT id, order_id, product_id, quantity, price
+    FROM order_items
+    WHERE order_id IN (SELECT value FROM json_each(?))
+'''
+DELETE_ITEMS_OF_ORDERS = '''
+    DELETE FROM order_items WHERE order_id IN (SELECT value FROM json_each(?))
+'''
+DELETE_ORDERS = "DELETE FROM orders WHERE id IN (SELECT value FROM json_each(?))"
+# Run on an archive file's own connection; REPLACE makes a batch that is
+# copied again after an interrupted run a no-op
+ARCHIVE_ORDER = '''
+    INSERT OR REPLACE INTO orders (id, customer_id, order_date, total_amount, status)
+    VALUES (?, ?, ?, ?, ?)
+'''
+ARCHIVE_ORDER_ITEM = '''
+    INSERT OR REPLACE INTO order_items (id, order_id, product_id, quantity, price)
+    VALUES (?, ?, ?, ?, ?)
+'''
+# Run on the hot database with one archive file attached as "archive"
+ARCHIVED_RECEIPT_ROWS_RANGE = '''
+    SELECT o.id, o.order_date, o.total_amount, c.name, p.name, oi.quantity, oi.price
+    FROM archive.orders o
+    JOIN archive.order_items oi ON oi.order_id = o.id
+    JOIN main.products p ON oi.product_id = p.id
+    LEFT JOIN main.customers c ON o.customer_id = c.id
+    WHERE o.order_date >= ? AND o.order_date < date(?, '+1 day')
+    ORDER BY o.order_date, o.id
+'''
+ARCHIVED_ORDER_ROWS_RANGE = '''
+    SELECT o.id, o.order_date, o.status, o.customer_id, c.name, o.total_amount
+    FROM archive.orders o
+    LEFT JOIN main.customers c ON o.customer_id = c.id
+    WHERE o.order_date >= ? AND o.order_date < date(?, '+1 day')
+    ORDER BY o.order_date, o.id
+'''
+ARCHIVED_ORDER_LINE_ROWS_RANGE = '''
+    SELECT
+        o.id, o.order_date, o.status, c.name,
+        oi.product_id, p.name, p.category, oi.quantity, oi.price, oi.quantity * oi.price
+    FROM archive.orders o
+    JOIN archive.order_items oi ON oi.order_id = o.id
+    LEFT JOIN main.products p ON oi.product_id = p.id
+    LEFT JOIN main.customers c ON o.customer_id = c.id
+    WHERE o.order_date >= ? AND o.order_date < date(?, '+1 day')
+    ORDER BY o.order_date, o.id, oi.id
+'''
+ARCHIVED_DATE_RANGE = '''
+    SELECT
+        (SELECT date(MIN(order_date)) FROM archive.orders),
+        (SELECT date(MAX(order_date)) FROM archive.orders)
+'''
+ARCHIVED_ORDER_TOTALS = '''
+    SELECT
+        COUNT(*),
+        COALESCE(SUM(CASE WHEN status = 'Completed' THEN total_amount END), 0)
+    FROM archive.orders
+'''
+ARCHIVED_DAILY_SALES_RANGE = '''
+    SELECT
+        COALESCE(date(order_date), ''),
+        COALESCE(CAST(strftime('%H', order_date) AS INTEGER), 0),
+        COALESCE(status, ''),
+        COUNT(*),
+        SUM(total_amount)
+    FROM archive.orders
+    WHERE order_date >= ? AND order_date < date(?, '+1 day')
+    GROUP BY 1, 2, 3
+'''
+ARCHIVED_PRODUCT_SALES = '''
+    SELECT
+        COALESCE(date(o.order_date), ''),
+        oi.product_id,
+        SUM(oi.quantity),
+        SUM(oi.quantity * oi.price)
+    FROM archive.orders o
+    JOIN archive.order_items oi ON oi.order_id = o.id
+    WHERE o.status = 'Completed'
+    GROUP BY 1, 2
+'''
+# Rebuilds add the archived orders' share back on top of the hot database's
+ADD_STATS_ORDERS = '''
+    UPDATE stats SET total_orders = total_orders + ?, revenue = revenue + ? WHERE id = 1
+'''
+ADD_DAILY_SALES = '''
+    INSERT INTO daily_sales (day, hour, status, total_orders, total_sales)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day, hour, status) DO UPDATE SET
+        total_orders = total_orders + excluded.total_orders,
+        total_sales = total_sales + excluded.total_sales
+'''
+ADD_PRODUCT_SALES_DAILY = '''
+    INSERT INTO product_sales_daily (day, product_id, units, revenue)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (day, product_id) DO UPDATE SET
+        units = units + excluded.units,
+        revenue = revenue + excluded.revenue
+'''
+
+# Indexes each query's plan must use. A plan regression (an index dropped
+# or no longer chosen) shows up as a missing name here.
+EXPECTED_INDEXES = {
+    "REBUILD_STATS": ["idx_orders_completed"],
+    "RECENT_ORDERS": ["idx_orders_order_ts"],
+    "PRODUCTS_PAGE": ["idx_products_name"],
+    "PRODUCT_CATEGORIES": ["idx_products_category"],
+    "PRODUCTS_IN_STOCK": ["idx_products_name"],
+    "PRODUCTS_IN_STOCK_BY_CATEGORY": ["idx_products_category"],
+    "SEARCH_PRODUCTS": ["products_fts VIRTUAL TABLE INDEX"],
+    "CUSTOMERS_PAGE": ["idx_customers_name", "idx_points_ledger_customer"],
+    "SEARCH_CUSTOMERS": ["customers_fts VIRTUAL TABLE INDEX"],
+    "CUSTOMERS_BY_NAME_PREFIX": ["idx_customers_name_nocase"],
+    "CUSTOMERS_BY_PHONE_PREFIX": ["idx_customers_phone"],
+    "ORDERS_PAGE": ["idx_orders_order_ts"],
+    "ORDERS_BY_STATUS_PAGE": ["idx_orders_status_ts"],
+    "SEARCH_ORDERS_PAGE": ["customers_fts VIRTUAL TABLE INDEX", "idx_orders_customer_id"],
+    "SEARCH_ORDERS_LIKE_PAGE": ["idx_orders_order_ts"],
+    "ORDER_ITEMS": ["idx_order_items_order_id"],
+    "RECEIPT_ROWS_RANGE": ["idx_orders_order_ts", "idx_order_items_order_id"],
+    "ORDER_ROWS_RANGE": ["idx_orders_order_ts"],
+    "ORDER_LINE_ROWS_RANGE": ["idx_orders_order_ts", "idx_order_items_order_id"],
+    "DAILY_SALES_EXPORT_RANGE": ["daily_sales USING PRIMARY KEY"],
+    "PRODUCT_SALES_EXPORT_RANGE": ["s USING PRIMARY KEY"],
+    "SALES_REPORT_RANGE": ["daily_sales USING PRIMARY KEY"],
+    "HOURLY_SALES_RANGE": ["daily_sales USING PRIMARY KEY"],
+    "DELETE_DAILY_SALES_RANGE": ["daily_sales USING PRIMARY KEY"],
+    "ORDER_DATE_RANGE": ["idx_orders_order_ts"],
+    "BACKFILL_DAILY_SALES_RANGE": ["idx_orders_order_ts"],
+    "POPULAR_PRODUCTS": ["idx_product_sales_units"],
+    "POPULAR_PRODUCTS_RANGE": ["s USING PRIMARY KEY"],
+    "REBUILD_PRODUCT_SALES": ["idx_order_items_order_id"],
+    "ARCHIVABLE_ORDERS": ["idx_orders_status_ts"],
+    "ITEMS_OF_ORDERS": ["idx_order_items_order_id"],
+    "DELETE_ITEMS_OF_ORDERS": ["idx_order_items_order_id"],
+    "ARCHIVED_RECEIPT_ROWS_RANGE": ["idx_orders_order_date", "idx_order_items_order_id"],
+    "ARCHIVED_ORDER_ROWS_RANGE": ["idx_orders_order_date"],
+    "ARCHIVED_ORDER_LINE_ROWS_RANGE": ["idx_orders_order_date", "idx_order_items_order_id"],
+    "ARCHIVED_DATE_RANGE": ["idx_orders_order_date"],
+    "ARCHIVED_DAILY_SALES_RANGE": ["idx_orders_order_date"],
+    "POINTS_BALANCE": ["idx_points_ledger_customer"],
+}
+
+# Queries whose full table scan is inherent: counting every row, grouping
+# the whole history, or leading-wildcard LIKE which no b-tree index can serve.
+# SALES_REPORT_RECENT walks the rollup's primary key newest first and stops
+# after 30 days. CLEAR_PRODUCT_SALES_DAILY deletes row by row so that its
+# triggers fire. The archived totals and product sales read a whole
+# archive file for a rebuild. A points replay reads every snapshot and
+# the ledger after them.
+FULL_SCAN_ALLOWED = {
+    "REBUILD_STATS",
+    "CATALOGUE_PRODUCTS",
+    "EXPORT_PRODUCTS",
+    "EXPORT_CUSTOMERS",
+    "EXPORT_ORDERS",
+    "EXPORT_ORDER_ITEMS",
+    "CLEAR_PRODUCT_SALES_DAILY",
+    "SALES_REPORT_RECENT",
+    "ARCHIVED_ORDER_TOTALS",
+    "ARCHIVED_PRODUCT_SALES",
+    "SEARCH_PRODUCTS_LIKE",
+    "SEARCH_CUSTOMERS_LIKE",
+    "CLEAR_POINTS_SNAPSHOTS",
+    "POINTS_BALANCES",
+}
+
+_EPOCH = datetime(1970, 1, 1)
+# COLLATE NOCASE folds only the ASCII letters
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+# Most rows a search returns; searches are lookups, not a way to browse
+SEARCH_LIMIT = 200
+# Matches the customer picker shows per keystroke
+PICKER_LIMIT = 20
+
+# "SCAN orders" or "SCAN o" (3.36+), "SCAN TABLE orders AS o" (older),
+# "SCAN archive.orders" in an attached database
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?[\w.]+( AS \w+)?$")
+
+
+def all_queries():
+    """Return a dict of every named statement in this module
+
+    Each page statement of a KeysetQuery is listed as NAME.first,
+    NAME.after and NAME.before.
+    """
+    statements = {}
+    for name, value in globals().items():
+        if not name.isupper() or name.startswith("_"):
+            continue
+        if isinstance(value, str):
+            statements[name] = value
+        elif isinstance(value, KeysetQuery):
+            for variant, sql in value.statements().items():
+                statements[f"{name}.{variant}"] = sql
+    return statements
+
+
+def prefix_upper_bound(prefix, nocase=False):
+    """Return the smallest string above every string starting with prefix
+
+    Used as the exclusive end of an index range scan; prefix must not be
+    empty. With nocase the bound is for a COLLATE NOCASE comparison, which
+    folds A-Z to a-z before comparing: the prefix is folded first, and a
+    bound that would land on an upper-case letter skips past them to "[".
+    """
+    if nocase:
+        prefix = prefix.translate(_ASCII_LOWER)
+    bound = chr(ord(prefix[-1]) + 1)
+    if nocase and "A" <= bound <= "Z":
+        bound = "["
+    return prefix[:-1] + bound
+
+
+def timestamp(order_date):
+    """Return the order_ts of an order_date, or None if it is not a valid date
+
+    That is the whole seconds from 1970-01-01 to its wall-clock time, as
+    SQLite's strftime('%s', order_date) computes them.
+    """
+    try:
+        return int((datetime.fromisoformat(order_date) - _EPOCH).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def day_range(first_day, last_day):
+    """Return the order_ts bounds of a range of days, start inclusive, end exclusive
+
+    Raises ValueError if either day is missing or not a valid date.
+    """
+    first, last = timestamp(first_day), timestamp(last_day)
+    if first is None or last is None:
+        raise ValueError(
+            f"Invalid range of days {first_day!r} to {last_day!r}, expected YYYY-MM-DD"
+        )
+    return first, last + 86400
+
+
+def fts_match(search_term):
+    """Return an FTS5 MATCH expression for a search term
+
+    Each word becomes a quoted string so punctuation in phone numbers and
+    email addresses is matched literally. Returns None when a word is
+    shorter than three characters, which the trigram index cannot match.
+    """
+    words = search_term.split()
+    if not words or any(len(word) < 3 for word in words):
+        return None
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def explain(conn, sql):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    params = (None,) * sql.count("?")
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check_query_plans(conn):
+    """Check every query's plan and return a list of problems found"""
+    problems = []
+
+    for name, sql in all_queries().items():
+        plan = explain(conn, sql)
+        details = " | ".join(plan)
+        base_name = name.split(".")[0]
+
+        for index in EXPECTED_INDEXES.get(base_name, []):
+            if index not in details:
+                problems.append(f"{name}: expected {index}, got: {details}")
+
+        if base_name not in FULL_SCAN_ALLOWED:
+            for line in plan:
+                if _FULL_SCAN.match(line):
+                    problems.append(f"{name}: full table scan: {details}")
+
+    return problems
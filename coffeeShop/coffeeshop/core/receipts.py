@@ -0,0 +1,172 @@
+"""Receipt rendering, as plain text or ESC/POS printer commands
+
+A Receipt is built from data the caller already has: the SubmittedOrder
+and the items of a new order, or rows streamed from the database for a
+bulk export. The fixed parts of a receipt (shop header, footer, printer
+set-up) are rendered once per width and format and cached.
+"""
+import functools
+import itertools
+import os
+from collections import namedtuple
+
+WIDTH = 40
+
+SHOP_NAME = "COFFEE SHOP"
+SHOP_ADDRESS = "123 Coffee Street, Java City"
+SHOP_PHONE = "Tel: (123) 456-7890"
+FOOTER = "Thank you for your order!"
+
+# ESC/POS commands
+ESC_INIT = b"\x1b@"
+ESC_ALIGN_LEFT = b"\x1ba\x00"
+ESC_ALIGN_CENTER = b"\x1ba\x01"
+ESC_BOLD_ON = b"\x1bE\x01"
+ESC_BOLD_OFF = b"\x1bE\x00"
+GS_DOUBLE_SIZE = b"\x1d!\x11"
+GS_NORMAL_SIZE = b"\x1d!\x00"
+ESC_FEED_4 = b"\x1bd\x04"
+GS_PARTIAL_CUT = b"\x1dV\x01"
+# Code page most receipt printers start in
+ESCPOS_ENCODING = "cp437"
+
+# lines are (product name, quantity, unit price)
+Receipt = namedtuple("Receipt", "order_id order_date customer lines total")
+
+
+def receipt_for_order(order, items, customer=None):
+    """Return the Receipt of a SubmittedOrder and the item dicts it was made from"""
+    lines = [(item["name"], item["quantity"], item["price"]) for item in items]
+    return Receipt(order.order_id, order.order_date, customer, lines, order.total)
+
+
+def receipts_from_rows(rows):
+    """Yield a Receipt per order from rows sorted by order
+
+    rows are (order id, date, total, customer name, product name, quantity,
+    unit price), one per order item, as returned by
+    OrderRepository.receipt_rows(). They are consumed lazily.
+    """
+    for order_id, order_rows in itertools.groupby(rows, key=lambda row: row[0]):
+        first = next(order_rows)
+        lines = [first[4:7]]
+        lines.extend(row[4:7] for row in order_rows)
+        yield Receipt(order_id, first[1], first[3], lines, first[2])
+
+
+def _columns(left, right, width):
+    """Return left and right on one line, shortening left if needed"""
+    room = width - len(right) - 1
+    if len(left) > room:
+        left = left[:room - 1] + "~"
+    return f"{left:<{room}} {right}"
+
+
+@functools.lru_cache(maxsize=None)
+def text_template(width=WIDTH):
+    """Return the (header, footer) of a plain-text receipt"""
+    rule = "-" * width
+    header = "\n".join([
+        SHOP_NAME.center(width).rstrip(),
+        SHOP_ADDRESS.center(width).rstrip(),
+        SHOP_PHONE.center(width).rstrip(),
+        rule,
+    ])
+    footer = "\n".join([rule, FOOTER.center(width).rstrip(), ""])
+    return header, footer
+
+
+def body_lines(receipt, width=WIDTH):
+    """Return the order details and item lines of a receipt"""
+    lines = [f"Order #: {receipt.order_id}", f"Date: {receipt.order_date}"]
+    if receipt.customer:
+        lines.append(f"Customer: {receipt.customer}")
+    lines.append("-" * width)
+    for name, quantity, price in receipt.lines:
+        lines.append(_columns(f"{name} x{quantity}", f"${price * quantity:.2f}", width))
+    lines.append("-" * width)
+    return lines
+
+
+def total_line(receipt, width=WIDTH):
+    """Return the total line of a receipt"""
+    return _columns("TOTAL:", f"${receipt.total:.2f}", width)
+
+
+def render_text(receipt, width=WIDTH):
+    """Return a receipt as plain text"""
+    header, footer = text_template(width)
+    return "\n".join([header, *body_lines(receipt, width), total_line(receipt, width), footer])
+
+
+@functools.lru_cache(maxsize=None)
+def escpos_template(width=WIDTH):
+    """Return the (header, footer) printer commands of an ESC/POS receipt"""
+    header = b"".join([
+        ESC_INIT,
+        ESC_ALIGN_CENTER,
+        GS_DOUBLE_SIZE, SHOP_NAME.encode(ESCPOS_ENCODING), b"\n",
+        GS_NORMAL_SIZE, SHOP_ADDRESS.encode(ESCPOS_ENCODING), b"\n",
+        SHOP_PHONE.encode(ESCPOS_ENCODING), b"\n",
+        ESC_ALIGN_LEFT, b"-" * width, b"\n",
+    ])
+    footer = b"".join([
+        ESC_ALIGN_CENTER, FOOTER.encode(ESCPOS_ENCODING), b"\n",
+        ESC_FEED_4,
+        GS_PARTIAL_CUT,
+    ])
+    return header, footer
+
+
+def render_escpos(receipt, width=WIDTH):
+    """Return a receipt as ESC/POS bytes for a thermal printer"""
+    header, footer = escpos_template(width)
+    body = "\n".join(body_lines(receipt, width)) + "\n"
+    return b"".join([
+        header,
+        body.encode(ESCPOS_ENCODING, errors="replace"),
+        ESC_BOLD_ON, total_line(receipt, width).encode(ESCPOS_ENCODING), b"\n", ESC_BOLD_OFF,
+        b"-" * width, b"\n",
+        footer,
+    ])
+
+
+# format: (render function, file extension)
+FORMATS = {
+    "text": (render_text, ".txt"),
+    "escpos": (render_escpos, ".bin"),
+}
+
+
+def check_format(fmt):
+    """Raise ValueError unless fmt names one of FORMATS"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown receipt format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+def render(receipt, fmt="text", width=WIDTH):
+    """Return a receipt in one of FORMATS"""
+    check_format(fmt)
+    return FORMATS[fmt][0](receipt, width)
+
+
+def export_receipts(receipts, directory, fmt="text", width=WIDTH, progress=None):
+    """Write each receipt to its own file in directory; return how many
+
+    receipts may be a generator, so only one receipt is held at a time.
+    progress, if given, is called with the number written every 1000.
+    """
+    check_format(fmt)
+    render_fn, extension = FORMATS[fmt]
+    binary = fmt != "text"
+    os.makedirs(directory, exist_ok=True)
+
+    written = 0
+    for receipt in receipts:
+        path = os.path.join(directory, f"receipt-{receipt.order_id:08d}{extension}")
+        with open(path, "wb" if binary else "w", encoding=None if binary else "utf-8") as output:
+            output.write(render_fn(receipt, width))
+        written += 1
+        if progress and written % 1000 == 0:
+            progress(written)
+    return written
@@ -0,0 +1,88 @@
+"""Export sales and product reports over any range of days as CSV or JSON Lines
+
+The reports screen shows at most a month of daily totals and the top ten
+products; month-end accounting needs years of them, down to single orders
+and line items. Exports stream: each report is read from a cursor (or, for
+orders, a merge of the hot database and the archive files) a chunk at a
+time and written straight out, so memory stays flat however long the range.
+
+Reports and their columns:
+
+    daily-sales    day, status, orders, sales
+    product-sales  day, product_id, product, category, units, revenue
+    orders         order_id, order_date, status, customer_id, customer, total
+    order-lines    order_id, order_date, status, customer, product_id, product,
+                   category, quantity, price, amount
+
+The two sales reports come from the rollups, which also count archived
+orders; orders and order-lines read the archive files for the years that
+were archived. A range defaults to the first and last day with orders.
+"""
+from collections import namedtuple
+from datetime import date
+
+from . import transfer
+
+# rows(shop, first_day, last_day) returns a cursor or an iterator over the
+# report's rows for a range of days
+Report = namedtuple("Report", "columns rows")
+
+REPORTS = {
+    "daily-sales": Report(
+        columns=("day", "status", "orders", "sales"),
+        rows=lambda shop, first, last: shop.reports.daily_sales_rows(first, last),
+    ),
+    "product-sales": Report(
+        columns=("day", "product_id", "product", "category", "units", "revenue"),
+        rows=lambda shop, first, last: shop.reports.product_sales_rows(first, last),
+    ),
+    "orders": Report(
+        columns=("order_id", "order_date", "status", "customer_id", "customer", "total"),
+        rows=lambda shop, first, last: shop.archive_service.order_rows(first, last),
+    ),
+    "order-lines": Report(
+        columns=(
+            "order_id", "order_date", "status", "customer", "product_id", "product",
+            "category", "quantity", "price", "amount",
+        ),
+        rows=lambda shop, first, last: shop.archive_service.order_line_rows(first, last),
+    ),
+}
+
+
+def check_report(report):
+    """Raise ValueError unless report names one of REPORTS"""
+    if report not in REPORTS:
+        raise ValueError(f"Unknown report {report!r}, expected one of {', '.join(REPORTS)}")
+
+
+def default_range(shop):
+    """Return the first and last day with orders, hot or archived, or (None, None)"""
+    days = [*shop.reports.order_date_range(), *shop.archive_service.date_range()]
+    days = [day for day in days if day]
+    if not days:
+        return None, None
+    return min(days), max(days)
+
+
+def export_report(shop, report, path, first_day=None, last_day=None, fmt=None,
+                  chunk_rows=transfer.CHUNK_ROWS, progress=None):
+    """Write a report over a range of days to a CSV or JSON Lines file; return the rows written
+
+    Missing ends of the range default to those of default_range(). Rows
+    are read and written chunk_rows at a time. progress, if given, is
+    called with the number written after each chunk.
+    """
+    check_report(report)
+    fmt = transfer.file_format(path, fmt)
+    if not (first_day and last_day):
+        first, last = default_range(shop)
+        first_day = first_day or first
+        last_day = last_day or last
+    if first_day is None or last_day is None:
+        rows = []
+    else:
+        if date.fromisoformat(first_day) > date.fromisoformat(last_day):
+            raise ValueError(f"The range ends ({last_day}) before it starts ({first_day})")
+        rows = REPORTS[report].rows(shop, first_day, last_day)
+    return transfer.write_rows(rows, REPORTS[report].columns, path, fmt, chunk_rows, progress)
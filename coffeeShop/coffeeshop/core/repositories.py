@@ -0,0 +1,510 @@
+"""Data access for products, customers, points, orders, reports and the order archive
+
+Each repository wraps the statements in queries.py for one part of the
+schema. Repositories never commit: writes join the caller's transaction,
+so a service can combine several of them into one unit of work.
+"""
+import json
+from collections import Counter
+from datetime import datetime
+
+from . import queries
+from .paging import KeysetPager
+
+
+class ProductRepository:
+    """Products and their stock"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @staticmethod
+    def pager():
+        """Return a pager over all products, by name
+
+        Pagers take the connection on each fetch, so this needs no instance.
+        """
+        return KeysetPager(queries.PRODUCTS_PAGE)
+
+    def search(self, search_term, limit=queries.SEARCH_LIMIT):
+        """Return the products best matching a search term"""
+        match = queries.fts_match(search_term)
+        if match:
+            return self.conn.execute(queries.SEARCH_PRODUCTS, (match, limit)).fetchall()
+
+        pattern = f"%{search_term}%"
+        return self.conn.execute(
+            queries.SEARCH_PRODUCTS_LIKE, (pattern, pattern, limit)
+        ).fetchall()
+
+    def add(self, name, category, price, cost, stock):
+        """Insert a product and return its id"""
+        cursor = self.conn.execute(queries.INSERT_PRODUCT, (name, category, price, cost, stock))
+        return cursor.lastrowid
+
+    def import_rows(self, rows):
+        """Insert (id, name, category, price, cost, stock) rows, in one executemany
+
+        An id of None gets the next free id.
+        """
+        self.conn.executemany(queries.IMPORT_PRODUCT, rows)
+
+    def export_rows(self):
+        """Return a cursor over (id, name, category, price, cost, stock) of every product"""
+        return self.conn.execute(queries.EXPORT_PRODUCTS)
+
+    def update(self, product_id, name, category, price, cost, stock):
+        """Overwrite a product's details"""
+        self.conn.execute(
+            queries.UPDATE_PRODUCT, (name, category, price, cost, stock, product_id)
+        )
+
+    def categories(self):
+        """Return the distinct product categories, sorted"""
+        return [row[0] for row in self.conn.execute(queries.PRODUCT_CATEGORIES)]
+
+    def in_stock(self, category=None):
+        """Return (id, name, price) of the products that can be ordered"""
+        if category is None:
+            return self.conn.execute(queries.PRODUCTS_IN_STOCK).fetchall()
+        return self.conn.execute(queries.PRODUCTS_IN_STOCK_BY_CATEGORY, (category,)).fetchall()
+
+    def catalogue(self):
+        """Return (id, name, category, price, stock) of every product"""
+        return self.conn.execute(queries.CATALOGUE_PRODUCTS).fetchall()
+
+    def reserve_stock(self, quantities):
+        """Take stock out for (product_id, quantity) pairs that have enough of it
+
+        Returns the pairs whose product is short (or missing); their stock
+        is left as it was, and the caller should roll back.
+        """
+        short = []
+        for product_id, quantity in quantities:
+            cursor = self.conn.execute(queries.RESERVE_STOCK, (quantity, product_id, quantity))
+            if cursor.rowcount == 0:
+                short.append((product_id, quantity))
+        return short
+
+    def stock_of(self, product_ids):
+        """Return {id: (name, stock)} of the products that exist among some ids"""
+        rows = self.conn.execute(queries.PRODUCT_STOCK, (json.dumps(list(product_ids)),))
+        return {product_id: (name, stock) for product_id, name, stock in rows}
+
+
+class CustomerRepository:
+    """Customers; their loyalty points are in PointsRepository"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @staticmethod
+    def pager():
+        """Return a pager over all customers, by name"""
+        return KeysetPager(queries.CUSTOMERS_PAGE)
+
+    def search(self, search_term, limit=queries.SEARCH_LIMIT):
+        """Return the customers best matching a name, phone or email"""
+        match = queries.fts_match(search_term)
+        if match:
+            return self.conn.execute(queries.SEARCH_CUSTOMERS, (match, limit)).fetchall()
+
+        pattern = f"%{search_term}%"
+        return self.conn.execute(
+            queries.SEARCH_CUSTOMERS_LIKE, (pattern, pattern, pattern, limit)
+        ).fetchall()
+
+    def add(self, name, phone, email):
+        """Insert a customer and return its id"""
+        cursor = self.conn.execute(queries.INSERT_CUSTOMER, (name, phone, email))
+        return cursor.lastrowid
+
+    def import_rows(self, rows):
+        """Insert (id, name, phone, email) rows, in one executemany"""
+        self.conn.executemany(queries.IMPORT_CUSTOMER, rows)
+
+    def export_rows(self):
+        """Return a cursor over (id, name, phone, email, points) of every customer"""
+        return self.conn.execute(queries.EXPORT_CUSTOMERS)
+
+    def max_id(self):
+        """Return the highest customer id, 0 if there are none"""
+        return self.conn.execute(queries.MAX_CUSTOMER_ID).fetchone()[0]
+
+    def update(self, customer_id, name, phone, email):
+        """Overwrite a customer's details"""
+        self.conn.execute(queries.UPDATE_CUSTOMER, (name, phone, email, customer_id))
+
+    def prefix_search(self, prefix, limit=queries.PICKER_LIMIT):
+        """Return (id, name, phone) of the customers whose name or phone starts with prefix
+
+        A prefix starting with a digit, + or ( is taken as a phone number,
+        anything else as a name, ignoring case.
+        """
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        if prefix[0] in "0123456789+(":
+            query, bound = queries.CUSTOMERS_BY_PHONE_PREFIX, queries.prefix_upper_bound(prefix)
+        else:
+            query, bound = queries.CUSTOMERS_BY_NAME_PREFIX, queries.prefix_upper_bound(prefix, True)
+        return self.conn.execute(query, (prefix, bound, limit)).fetchall()
+
+    def name(self, customer_id):
+        """Return a customer's name, or None if there is no such customer"""
+        row = self.conn.execute(queries.CUSTOMER_NAME, (customer_id,)).fetchone()
+        return row[0] if row else None
+
+
+class PointsRepository:
+    """The loyalty points ledger and its per-customer snapshots
+
+    Entries are only ever appended. Balances are read as a snapshot plus
+    the entries after it; fold() moves a range of entries into the
+    snapshots.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def add(self, customer_id, points, kind, order_id=None, created=None):
+        """Append a ledger entry and return its id
+
+        created is a "YYYY-MM-DD HH:MM:SS" time like an order_date, by
+        default now.
+        """
+        created = created or datetime.now().isoformat(" ", "seconds")
+        cursor = self.conn.execute(
+            queries.ADD_POINTS,
+            (customer_id, points, kind, order_id, queries.timestamp(created)),
+        )
+        return cursor.lastrowid
+
+    def add_many(self, rows):
+        """Append (customer_id, points, kind, order_id, created) rows, in one executemany
+
+        A created of None means now.
+        """
+        now = datetime.now().isoformat(" ", "seconds")
+        self.conn.executemany(
+            queries.ADD_POINTS, ((*row[:4], queries.timestamp(row[4] or now)) for row in rows)
+        )
+
+    def balance(self, customer_id):
+        """Return a customer's points"""
+        return self.conn.execute(
+            queries.POINTS_BALANCE, (customer_id,) * 3
+        ).fetchone()[0]
+
+    def balances(self):
+        """Return {customer_id: points} of every customer with ledger entries"""
+        balances = Counter()
+        for customer_id, points in self.conn.execute(queries.POINTS_BALANCES):
+            balances[customer_id] += points
+        return dict(balances)
+
+    def last_entry(self):
+        """Return the id of the newest ledger entry, 0 if there are none"""
+        return self.conn.execute(queries.LAST_POINTS_ENTRY).fetchone()[0]
+
+    def compacted_through(self):
+        """Return the id of the last entry folded into the snapshots"""
+        return self.conn.execute(queries.POINTS_COMPACTED_THROUGH).fetchone()[0]
+
+    def fold(self, after, through):
+        """Add the entries after one id up to another to the snapshots
+
+        Returns the number of snapshots changed.
+        """
+        cursor = self.conn.execute(queries.FOLD_POINTS, (through, after, through))
+        self.conn.execute(queries.SET_POINTS_COMPACTED_THROUGH, (through,))
+        return cursor.rowcount
+
+    def clear_snapshots(self):
+        """Delete every snapshot, leaving the balances to the ledger alone"""
+        self.conn.execute(queries.CLEAR_POINTS_SNAPSHOTS)
+        self.conn.execute(queries.SET_POINTS_COMPACTED_THROUGH, (0,))
+
+
+class OrderRepository:
+    """Orders and their line items"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def recent(self):
+        """Return the ten newest orders"""
+        return self.conn.execute(queries.RECENT_ORDERS).fetchall()
+
+    @staticmethod
+    def pager(status=None, search_term=None):
+        """Return a pager over the orders, newest first
+
+        search_term matches the customer's name, phone or email, or the
+        order id; status keeps only orders with that status.
+        """
+        if search_term:
+            # The id column's integer affinity converts a numeric term
+            match = queries.fts_match(search_term)
+            if match:
+                return KeysetPager(queries.SEARCH_ORDERS_PAGE, (match, search_term))
+            return KeysetPager(
+                queries.SEARCH_ORDERS_LIKE_PAGE, (f"%{search_term}%", search_term)
+            )
+
+        if status is None:
+            return KeysetPager(queries.ORDERS_PAGE)
+        return KeysetPager(queries.ORDERS_BY_STATUS_PAGE, (status,))
+
+    def get(self, order_id):
+        """Return (id, customer name, date, total, status) of an order"""
+        return self.conn.execute(queries.ORDER_DETAILS, (order_id,)).fetchone()
+
+    def items(self, order_id):
+        """Return (name, quantity, price, line total) of an order's items"""
+        return self.conn.execute(queries.ORDER_ITEMS, (order_id,)).fetchall()
+
+    def receipt_rows(self, first_day, last_day):
+        """Return a cursor over the receipt rows of the orders of a range of days
+
+        Rows are (order id, date, total, customer name, product name,
+        quantity, unit price), one per item, oldest order first. They are
+        read as the cursor is iterated, never all at once.
+        """
+        return self.conn.execute(
+            queries.RECEIPT_ROWS_RANGE, queries.day_range(first_day, last_day)
+        )
+
+    def order_rows(self, first_day, last_day):
+        """Return a cursor over the orders of a range of days, oldest first
+
+        Rows are (order id, date, status, customer id, customer name, total).
+        """
+        return self.conn.execute(
+            queries.ORDER_ROWS_RANGE, queries.day_range(first_day, last_day)
+        )
+
+    def order_line_rows(self, first_day, last_day):
+        """Return a cursor over the line items of the orders of a range of days
+
+        Rows are (order id, date, status, customer name, product id,
+        product name, category, quantity, unit price, line total), oldest
+        order first.
+        """
+        return self.conn.execute(
+            queries.ORDER_LINE_ROWS_RANGE, queries.day_range(first_day, last_day)
+        )
+
+    def add(self, customer_id, order_date, total, status="Pending"):
+        """Insert an order and return its id"""
+        cursor = self.conn.execute(
+            queries.INSERT_ORDER,
+            (customer_id, order_date, total, status, queries.timestamp(order_date)),
+        )
+        return cursor.lastrowid
+
+    def add_items(self, order_id, items):
+        """Insert an order's line items, in one executemany
+
+        items are dicts with the product "id", "quantity" and unit "price".
+        """
+        self.conn.executemany(
+            queries.INSERT_ORDER_ITEM,
+            ((order_id, item["id"], item["quantity"], item["price"]) for item in items),
+        )
+
+    def import_rows(self, rows):
+        """Insert (id, customer_id, order_date, total, status) rows, in one executemany"""
+        self.conn.executemany(
+            queries.IMPORT_ORDER, ((*row, queries.timestamp(row[2])) for row in rows)
+        )
+
+    def import_items(self, rows):
+        """Insert (order_id, product_id, quantity, price) rows, in one executemany"""
+        self.conn.executemany(queries.INSERT_ORDER_ITEM, rows)
+
+    def export_rows(self):
+        """Return a cursor over (id, customer_id, order_date, total, status) of every order"""
+        return self.conn.execute(queries.EXPORT_ORDERS)
+
+    def export_items(self):
+        """Return a cursor over (order_id, product_id, quantity, price) of every order item"""
+        return self.conn.execute(queries.EXPORT_ORDER_ITEMS)
+
+    def max_id(self):
+        """Return the highest order id, 0 if there are none"""
+        return self.conn.execute(queries.MAX_ORDER_ID).fetchone()[0]
+
+    def set_status(self, order_id, status):
+        """Change an order's status"""
+        self.conn.execute(queries.UPDATE_ORDER_STATUS, (status, order_id))
+
+
+class ReportRepository:
+    """Dashboard figures, sales reports and the tables behind them"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def dashboard_stats(self):
+        """Return (products, customers, orders, revenue) from the stats row"""
+        return self.conn.execute(queries.DASHBOARD_STATS).fetchone()
+
+    def rebuild_stats(self, archived=None):
+        """Recompute the stats row from the base tables
+
+        archived is (orders, revenue) of the orders in the archive files.
+        """
+        self.conn.execute(queries.REBUILD_STATS)
+        if archived:
+            self.conn.execute(queries.ADD_STATS_ORDERS, archived)
+
+    def sales(self, from_date=None, to_date=None, hourly=False):
+        """Return (day or hour, orders, sales) rows from the sales rollup
+
+        Without a date range the 30 most recent days are returned, newest
+        first. hourly groups the range by hour of day instead of by day.
+        """
+        if from_date and to_date:
+            query = queries.HOURLY_SALES_RANGE if hourly else queries.SALES_REPORT_RANGE
+            return self.conn.execute(query, (from_date, to_date)).fetchall()
+        return self.conn.execute(queries.SALES_REPORT_RECENT).fetchall()
+
+    def popular_products(self, from_date=None, to_date=None, limit=10):
+        """Return the best selling products of completed orders
+
+        Rows are (name, category, units, revenue), read from the product
+        sales aggregates. With a date range only orders of those days count.
+        """
+        if from_date and to_date:
+            return self.conn.execute(
+                queries.POPULAR_PRODUCTS_RANGE, (from_date, to_date, limit)
+            ).fetchall()
+        return self.conn.execute(queries.POPULAR_PRODUCTS, (limit,)).fetchall()
+
+    def daily_sales_rows(self, first_day, last_day):
+        """Return a cursor over (day, status, orders, sales) of a range of days"""
+        return self.conn.execute(queries.DAILY_SALES_EXPORT_RANGE, (first_day, last_day))
+
+    def product_sales_rows(self, first_day, last_day):
+        """Return a cursor over the units and revenue of each product on each day of a range
+
+        Rows are (day, product id, name, category, units, revenue).
+        """
+        return self.conn.execute(queries.PRODUCT_SALES_EXPORT_RANGE, (first_day, last_day))
+
+    def order_date_range(self):
+        """Return the days of the oldest and newest order, or (None, None)"""
+        return self.conn.execute(queries.ORDER_DATE_RANGE).fetchone()
+
+    def backfill_daily_sales(self, first_day, last_day, archived_rows=()):
+        """Rebuild the sales rollup rows of a range of days
+
+        archived_rows are the rollup rows of the archived orders of those days.
+        """
+        self.conn.execute(queries.DELETE_DAILY_SALES_RANGE, (first_day, last_day))
+        self.conn.execute(
+            queries.BACKFILL_DAILY_SALES_RANGE, queries.day_range(first_day, last_day)
+        )
+        self.conn.executemany(queries.ADD_DAILY_SALES, archived_rows)
+
+    def rebuild_product_sales(self, archived_rows=()):
+        """Recompute the product sales aggregates from the completed orders
+
+        archived_rows are the (day, product, units, revenue) rows of the
+        archived orders.
+        """
+        self.conn.execute(queries.CLEAR_PRODUCT_SALES_DAILY)
+        self.conn.execute(queries.CLEAR_PRODUCT_SALES)
+        self.conn.execute(queries.REBUILD_PRODUCT_SALES)
+        self.conn.executemany(queries.ADD_PRODUCT_SALES_DAILY, archived_rows)
+
+    def rebuild_search(self):
+        """Rebuild the product and customer full-text indexes"""
+        self.conn.execute(queries.REBUILD_PRODUCTS_FTS)
+        self.conn.execute(queries.REBUILD_CUSTOMERS_FTS)
+
+
+class ArchiveRepository:
+    """Moving orders out of the hot database and reading them from an archive file
+
+    The reads expect one archive file attached as "archive" (see
+    archive.ArchiveFiles.attached).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def archived_before(self):
+        """Return the newest archive cutoff day, or None if nothing was archived"""
+        return self.conn.execute(queries.ARCHIVED_BEFORE).fetchone()[0]
+
+    def set_archived_before(self, day):
+        """Record an archive cutoff; an older one than recorded is ignored"""
+        self.conn.execute(queries.SET_ARCHIVED_BEFORE, (day,))
+
+    def archivable(self, before, limit):
+        """Return up to limit of the oldest completed orders dated before a day
+
+        Rows are (id, customer_id, order_date, total, status).
+        """
+        return self.conn.execute(
+            queries.ARCHIVABLE_ORDERS, (queries.timestamp(before), limit)
+        ).fetchall()
+
+    def items_of(self, order_ids):
+        """Return (id, order_id, product_id, quantity, price) of the items of some orders"""
+        return self.conn.execute(queries.ITEMS_OF_ORDERS, (json.dumps(order_ids),)).fetchall()
+
+    def delete(self, order_ids):
+        """Delete orders and their items, leaving the stats and rollups as they are"""
+        ids = (json.dumps(order_ids),)
+        self.conn.execute(queries.SET_ARCHIVING, (1,))
+        self.conn.execute(queries.DELETE_ITEMS_OF_ORDERS, ids)
+        self.conn.execute(queries.DELETE_ORDERS, ids)
+        self.conn.execute(queries.SET_ARCHIVING, (0,))
+
+    def vacuum(self):
+        """Rebuild the database file so the space of deleted orders is returned"""
+        self.conn.execute("VACUUM")
+
+    def receipt_rows(self, first_day, last_day):
+        """Return a cursor over the archived receipt rows of a range of days
+
+        Rows are as OrderRepository.receipt_rows() returns them.
+        """
+        return self.conn.execute(queries.ARCHIVED_RECEIPT_ROWS_RANGE, (first_day, last_day))
+
+    def order_rows(self, first_day, last_day):
+        """Return a cursor over the archived orders of a range of days
+
+        Rows are as OrderRepository.order_rows() returns them.
+        """
+        return self.conn.execute(queries.ARCHIVED_ORDER_ROWS_RANGE, (first_day, last_day))
+
+    def order_line_rows(self, first_day, last_day):
+        """Return a cursor over the archived line items of a range of days
+
+        Rows are as OrderRepository.order_line_rows() returns them.
+        """
+        return self.conn.execute(
+            queries.ARCHIVED_ORDER_LINE_ROWS_RANGE, (first_day, last_day)
+        )
+
+    def date_range(self):
+        """Return the days of the oldest and newest archived order, or (None, None)"""
+        return self.conn.execute(queries.ARCHIVED_DATE_RANGE).fetchone()
+
+    def order_totals(self):
+        """Return (orders, revenue) of the archived orders"""
+        return self.conn.execute(queries.ARCHIVED_ORDER_TOTALS).fetchone()
+
+    def daily_sales(self, first_day, last_day):
+        """Return the sales rollup rows of the archived orders of a range of days"""
+        return self.conn.execute(
+            queries.ARCHIVED_DAILY_SALES_RANGE, (first_day, last_day)
+        ).fetchall()
+
+    def product_sales(self):
+        """Return (day, product, units, revenue) of the archived completed orders"""
+        return self.conn.execute(queries.ARCHIVED_PRODUCT_SALES).fetchall()
@@ -0,0 +1,566 @@
+"""Business rules of the coffee shop
+
+Services combine repository calls into complete operations and own the
+transactions: each public method either commits all of its writes or
+none of them.
+"""
+import heapq
+import random
+import sqlite3
+import time
+from collections import Counter, namedtuple
+from datetime import date, datetime, timedelta
+
+from . import receipts
+from .catalogue import CatalogueCache, Product
+
+# Loyalty points earned per whole dollar of an order
+POINTS_PER_DOLLAR = 1
+
+# An order write that finds the database locked (after the connection's
+# own busy timeout) is retried this many times, sleeping LOCK_BACKOFF
+# seconds before the first retry and twice as long before each next one
+LOCK_RETRIES = 5
+LOCK_BACKOFF = 0.05
+
+# Orders moved to the archive per transaction; each batch holds the hot
+# database's write lock for a fraction of a second
+ARCHIVE_BATCH_ORDERS = 5000
+
+SubmittedOrder = namedtuple("SubmittedOrder", "order_id customer_id order_date total timing")
+# Seconds spent waiting for the write lock (including backoff), holding it,
+# and in total; attempts is 1 unless the database was locked
+OrderTiming = namedtuple("OrderTiming", "attempts lock_wait write total")
+SalesReport = namedtuple("SalesReport", "rows hourly total_sales average_sales")
+ArchiveResult = namedtuple("ArchiveResult", "orders items years")
+# Ledger entries folded into snapshots, snapshots changed, newest entry folded
+PointsCompaction = namedtuple("PointsCompaction", "entries customers through")
+# changed lists (customer_id, balance before, balance replayed) where they differ
+PointsReplay = namedtuple("PointsReplay", "entries customers changed")
+# An order line the stock cannot cover; name is None for an unknown product
+Shortfall = namedtuple("Shortfall", "product_id name requested available")
+_PreparedOrder = namedtuple("_PreparedOrder", "customer_id items order_date total")
+
+
+class OutOfStockError(ValueError):
+    """An order asks for more of some products than there is in stock"""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = list(shortfalls)
+        super().__init__("Not enough stock: " + "; ".join(
+            f"{shortfall.name or f'product {shortfall.product_id}'} "
+            f"{shortfall.requested} wanted, {shortfall.available} left"
+            for shortfall in self.shortfalls
+        ))
+
+
+def is_lock_error(error):
+    """Tell whether an OperationalError means another connection holds the lock"""
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message
+
+
+class CatalogueService:
+    """Add and edit products and customers
+
+    Product changes are written through to the catalogue cache once they
+    are committed.
+    """
+
+    def __init__(self, conn, products, customers, points, cache=None):
+        self.conn = conn
+        self.products = products
+        self.customers = customers
+        self.points = points
+        self.cache = cache if cache is not None else CatalogueCache()
+
+    def product_catalogue(self):
+        """Return the catalogue cache, loading it first if it is stale"""
+        if not self.cache.fresh:
+            self.cache.load(self.products)
+        return self.cache
+
+    def add_product(self, name, category, price, cost, stock):
+        """Save a new product and return its id"""
+        with self.conn:
+            product_id = self.products.add(name, category, price, cost, stock)
+        self.cache.put(Product(product_id, name, category, price, stock))
+        return product_id
+
+    def update_product(self, product_id, name, category, price, cost, stock):
+        """Save changes to a product"""
+        # The cache is keyed by int ids; a UI may hand over the id as text
+        product_id = int(product_id)
+        with self.conn:
+            self.products.update(product_id, name, category, price, cost, stock)
+        self.cache.put(Product(product_id, name, category, price, stock))
+
+    def add_customer(self, name, phone="", email="", points=0):
+        """Save a new customer and return its id
+
+        Starting points are recorded as an "opening" ledger entry.
+        """
+        with self.conn:
+            customer_id = self.customers.add(name, phone, email)
+            if points:
+                self.points.add(customer_id, points, "opening")
+        return customer_id
+
+    def update_customer(self, customer_id, name, phone, email, points):
+        """Save changes to a customer
+
+        A new points balance is recorded as an "adjust" entry for the
+        difference, read after the customer row is written, so an order
+        crediting points at the same time cannot slip in between.
+        """
+        with self.conn:
+            self.customers.update(customer_id, name, phone, email)
+            difference = points - self.points.balance(customer_id)
+            if difference:
+                self.points.add(customer_id, difference, "adjust")
+
+
+class OrderService:
+    """Take orders and move them through their statuses"""
+
+    def __init__(self, conn, orders, products, points, cache=None, archive=None):
+        self.conn = conn
+        self.orders = orders
+        self.products = products
+        self.points = points
+        self.cache = cache if cache is not None else CatalogueCache()
+        self.archive = archive
+
+    def submit_order(self, customer_id, items, order_date=None):
+        """Record an order, take its items out of stock and credit points
+
+        items are dicts with the product "id", "quantity" and unit "price".
+        customer_id is None for a walk-in customer. Returns a SubmittedOrder.
+        If any product is short, nothing is written and OutOfStockError
+        lists every line that is.
+
+        Everything is written in one BEGIN IMMEDIATE transaction, which takes
+        the write lock up front: a second till writing at the same time waits
+        (or retries with backoff) here rather than failing halfway through.
+        """
+        order = self._prepare(customer_id, items, order_date)
+        order_id, timing = self._write_locked(lambda: self._write(order))
+        self.cache.take_stock((item["id"], item["quantity"]) for item in order.items)
+        return SubmittedOrder(order_id, customer_id, order.order_date, order.total, timing)
+
+    def submit_orders(self, orders):
+        """Record several orders with a single commit (group commit)
+
+        orders are (customer_id, items) pairs as for submit_order. Returns a
+        list in the same order holding a SubmittedOrder, or the exception
+        for an order that was refused; their timings are the whole batch's.
+
+        If the database refuses an order, or there is not enough stock for
+        it (OutOfStockError), the batch is written again with a
+        savepoint per order, so only that order is rolled back and the
+        others still go in. Lock and I/O errors abort the whole batch and
+        are raised.
+        """
+        orders = list(orders)
+        results = [None] * len(orders)
+        prepared = []
+        for index, (customer_id, items) in enumerate(orders):
+            try:
+                prepared.append((index, self._prepare(customer_id, items)))
+            except (KeyError, TypeError, ValueError) as error:
+                results[index] = error
+        if not prepared:
+            return results
+
+        def write_all(isolated):
+            for index, order in prepared:
+                if not isolated:
+                    results[index] = self._write(order)
+                    continue
+                self.conn.execute("SAVEPOINT submit_order")
+                try:
+                    results[index] = self._write(order)
+                except (sqlite3.IntegrityError, OutOfStockError) as error:
+                    self.conn.execute("ROLLBACK TO submit_order")
+                    results[index] = error
+                self.conn.execute("RELEASE submit_order")
+
+        try:
+            _, timing = self._write_locked(lambda: write_all(False))
+        except (sqlite3.IntegrityError, OutOfStockError):
+            # Savepoints slow every order down, so they are only used to
+            # find out which orders the database refuses
+            _, timing = self._write_locked(lambda: write_all(True))
+        for index, order in prepared:
+            if isinstance(results[index], Exception):
+                continue
+            self.cache.take_stock((item["id"], item["quantity"]) for item in order.items)
+            results[index] = SubmittedOrder(
+                results[index], order.customer_id, order.order_date, order.total, timing
+            )
+        return results
+
+    def _prepare(self, customer_id, items, order_date=None):
+        """Check an order and work out its total and date"""
+        items = list(items)
+        if not items:
+            raise ValueError("An order needs at least one item")
+        for item in items:
+            # A negative quantity would put stock back through reserve_stock
+            if not item["quantity"] > 0:
+                raise ValueError(f"Quantity must be positive, not {item['quantity']}")
+            if not item["price"] >= 0:
+                raise ValueError(f"Price must be at least 0, not {item['price']}")
+
+        total = sum(item["price"] * item["quantity"] for item in items)
+        if order_date is None:
+            order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return _PreparedOrder(customer_id, items, order_date, total)
+
+    def _write(self, order):
+        """Write a prepared order inside the current transaction; return its id
+
+        Raises OutOfStockError, after taking out the stock of the products
+        that had enough; the caller rolls back.
+        """
+        # Stock is checked and taken in the same statement, so two tills
+        # selling the last few of a product cannot both succeed
+        quantities = Counter()
+        for item in order.items:
+            quantities[item["id"]] += item["quantity"]
+        short = self.products.reserve_stock(quantities.items())
+        if short:
+            stock = self.products.stock_of(product_id for product_id, _ in short)
+            # The cache showed these products as available; reload it
+            self.cache.invalidate()
+            shortfalls = []
+            for product_id, quantity in short:
+                name, available = stock.get(product_id, (None, 0))
+                shortfalls.append(Shortfall(product_id, name, quantity, available))
+            raise OutOfStockError(shortfalls)
+
+        order_id = self.orders.add(order.customer_id, order.order_date, order.total)
+        self.orders.add_items(order_id, order.items)
+
+        points = int(order.total) * POINTS_PER_DOLLAR
+        if order.customer_id and points:
+            self.points.add(order.customer_id, points, "earn", order_id, order.order_date)
+        return order_id
+
+    def _write_locked(self, write):
+        """Run write() in a BEGIN IMMEDIATE transaction and commit
+
+        Retries with backoff while the database is locked. Returns what
+        write() returned and an OrderTiming.
+        """
+        started = time.perf_counter()
+        for attempt in range(1, LOCK_RETRIES + 2):
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                locked = time.perf_counter()
+                result = write()
+                self.conn.commit()
+                break
+            except sqlite3.OperationalError as error:
+                if self.conn.in_transaction:
+                    self.conn.rollback()
+                if attempt > LOCK_RETRIES or not is_lock_error(error):
+                    raise
+                backoff = LOCK_BACKOFF * 2 ** (attempt - 1)
+                time.sleep(random.uniform(backoff / 2, backoff))
+            except BaseException:
+                if self.conn.in_transaction:
+                    self.conn.rollback()
+                raise
+
+        finished = time.perf_counter()
+        return result, OrderTiming(attempt, locked - started, finished - locked, finished - started)
+
+    def set_status(self, order_id, status):
+        """Change the status of an order"""
+        with self.conn:
+            self.orders.set_status(order_id, status)
+
+    def details(self, order_id):
+        """Return an order and its items"""
+        return self.orders.get(order_id), self.orders.items(order_id)
+
+    def receipts(self, first_day, last_day):
+        """Return the Receipts of the orders of a range of days, oldest first
+
+        They are built lazily, one order at a time, as the rows are read.
+        Archived orders are included when an ArchiveService was given.
+        """
+        if self.archive is not None:
+            rows = self.archive.receipt_rows(first_day, last_day)
+        else:
+            rows = self.orders.receipt_rows(first_day, last_day)
+        return receipts.receipts_from_rows(rows)
+
+
+class PointsService:
+    """Loyalty points: balances, redemptions, compaction and replay"""
+
+    def __init__(self, conn, points):
+        self.conn = conn
+        self.points = points
+
+    def balance(self, customer_id):
+        """Return a customer's points"""
+        return self.points.balance(customer_id)
+
+    def redeem(self, customer_id, points, order_id=None):
+        """Spend some of a customer's points and return the balance left
+
+        Raises ValueError, writing nothing, if the balance is too low.
+        """
+        if points <= 0:
+            raise ValueError("Points to redeem must be positive")
+        with self.conn:
+            # Appending first takes the write lock, so the balance read
+            # next cannot be spent twice by two tills
+            self.points.add(customer_id, -points, "redeem", order_id)
+            balance = self.points.balance(customer_id)
+            if balance < 0:
+                raise ValueError(
+                    f"Customer {customer_id} has {balance + points} points, not {points}"
+                )
+        return balance
+
+    def compact(self):
+        """Fold the ledger entries added since the last compaction into the snapshots
+
+        Balance lookups then only sum the entries after a customer's
+        snapshot. Returns a PointsCompaction.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            after = self.points.compacted_through()
+            through = self.points.last_entry()
+            customers = self.points.fold(after, through) if through > after else 0
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return PointsCompaction(through - after, customers, through)
+
+    def replay(self, check=False):
+        """Rebuild every snapshot from the whole ledger
+
+        With check, nothing is written and the result only reports the
+        balances a replay would change. Returns a PointsReplay.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.points.balances()
+            through = self.points.last_entry()
+            self.points.clear_snapshots()
+            customers = self.points.fold(0, through)
+            after = self.points.balances()
+            if check:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+
+        changed = [
+            (customer_id, before.get(customer_id, 0), after.get(customer_id, 0))
+            for customer_id in sorted(before.keys() | after.keys())
+            if before.get(customer_id, 0) != after.get(customer_id, 0)
+        ]
+        return PointsReplay(through, customers, changed)
+
+
+class ReportService:
+    """Sales figures for the reports screen"""
+
+    def __init__(self, reports):
+        self.reports = reports
+
+    def sales_report(self, from_date=None, to_date=None, hourly=False):
+        """Return the sales rows of a period with their total and average
+
+        Hourly grouping needs a date range; without one the report covers
+        the 30 most recent days.
+        """
+        hourly = bool(from_date and to_date) and hourly
+        rows = self.reports.sales(from_date, to_date, hourly)
+
+        total_sales = sum(row[2] for row in rows)
+        average_sales = total_sales / len(rows) if rows else 0
+        return SalesReport(rows, hourly, total_sales, average_sales)
+
+    def popular_products(self, from_date=None, to_date=None, limit=10):
+        """Return the best selling products, over all time or a date range"""
+        return self.reports.popular_products(from_date, to_date, limit)
+
+
+def _order_row_key(row):
+    return row[1], row[0]
+
+
+class ArchiveService:
+    """Move old orders into the per-year archive files and read them back
+
+    Reads attach one archive file at a time, and only for date ranges that
+    start before the archive cutoff, so recent ranges never touch them.
+    """
+
+    def __init__(self, conn, archive, orders, files):
+        self.conn = conn
+        self.archive = archive
+        self.orders = orders
+        self.files = files
+
+    def archive_orders(self, before, batch_orders=ARCHIVE_BATCH_ORDERS, progress=None):
+        """Move the completed orders dated before a day into the archive files
+
+        Each batch is read and deleted in one BEGIN IMMEDIATE transaction on
+        the hot database, and committed to its archive files first: an
+        interrupted run can leave a batch in both places but never in
+        neither, and running again finishes it. progress, if given, is
+        called with the number of orders moved after each batch. Returns an
+        ArchiveResult.
+        """
+        if self.files.db_path is None:
+            raise ValueError("An in-memory database cannot be archived")
+        # A bad day would bind a NULL cutoff and quietly match nothing
+        try:
+            date.fromisoformat(before)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid cutoff day {before!r}, expected YYYY-MM-DD") from None
+
+        moved_orders = moved_items = 0
+        files = {}
+        try:
+            while True:
+                self.conn.execute("BEGIN IMMEDIATE")
+                rows = self.archive.archivable(before, batch_orders)
+                if not rows:
+                    self.conn.rollback()
+                    break
+
+                order_ids = [row[0] for row in rows]
+                items = self.archive.items_of(order_ids)
+                year_of = {row[0]: int(row[2][:4]) for row in rows}
+                for year in sorted(set(year_of.values())):
+                    if year not in files:
+                        files[year] = self.files.open(year)
+                    files[year].add(
+                        [row for row in rows if year_of[row[0]] == year],
+                        [item for item in items if year_of[item[1]] == year],
+                    )
+
+                self.archive.delete(order_ids)
+                self.archive.set_archived_before(before)
+                self.conn.commit()
+
+                moved_orders += len(rows)
+                moved_items += len(items)
+                if progress:
+                    progress(moved_orders)
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+        finally:
+            for archive_file in files.values():
+                archive_file.close()
+
+        return ArchiveResult(moved_orders, moved_items, sorted(files))
+
+    def vacuum(self):
+        """Shrink the hot database file after orders were archived"""
+        self.archive.vacuum()
+
+    def years(self, first_day, last_day):
+        """Return the archive years a range of days has to read, oldest first"""
+        archived_before = self.archive.archived_before()
+        if archived_before is None or first_day >= archived_before:
+            return []
+        return self.files.years(int(first_day[:4]), int(last_day[:4]))
+
+    def receipt_rows(self, first_day, last_day):
+        """Yield the receipt rows of a range of days, hot and archived, oldest first"""
+        return self._rows(first_day, last_day, self.orders.receipt_rows, self.archive.receipt_rows)
+
+    def order_rows(self, first_day, last_day):
+        """Yield the order rows of a range of days, hot and archived, oldest first"""
+        return self._rows(first_day, last_day, self.orders.order_rows, self.archive.order_rows)
+
+    def order_line_rows(self, first_day, last_day):
+        """Yield the line item rows of a range of days, hot and archived, oldest first"""
+        return self._rows(
+            first_day, last_day, self.orders.order_line_rows, self.archive.order_line_rows
+        )
+
+    def _rows(self, first_day, last_day, hot_rows, archived_rows):
+        """Yield the rows of a range of days from the hot database and the archive
+
+        hot_rows and archived_rows return a cursor for a range of days, its
+        rows starting with the order id and date. The range is read a year
+        at a time where it has an archive file, merging that year's rows
+        from the hot database and the archive.
+        """
+        day = date.fromisoformat(first_day)
+        last = date.fromisoformat(last_day)
+        for year in self.years(first_day, last_day):
+            year_start = max(day, date(year, 1, 1))
+            year_end = min(last, date(year, 12, 31))
+            if day < year_start:
+                yield from hot_rows(day.isoformat(), (year_start - timedelta(days=1)).isoformat())
+
+            params = (year_start.isoformat(), year_end.isoformat())
+            with self.files.attached(self.conn, year):
+                hot = hot_rows(*params)
+                archived = archived_rows(*params)
+                try:
+                    yield from heapq.merge(archived, hot, key=_order_row_key)
+                finally:
+                    # Detaching needs every statement on the file finished
+                    hot.close()
+                    archived.close()
+            day = year_end + timedelta(days=1)
+
+        if day <= last:
+            yield from hot_rows(day.isoformat(), last.isoformat())
+
+    def date_range(self):
+        """Return the days of the oldest and newest archived order, or (None, None)"""
+        years = self.files.years()
+        if not years:
+            return None, None
+        with self.files.attached(self.conn, years[0]):
+            first = self.archive.date_range()[0]
+        with self.files.attached(self.conn, years[-1]):
+            last = self.archive.date_range()[1]
+        return first, last
+
+    def order_totals(self):
+        """Return (orders, revenue) of every archived order"""
+        orders = revenue = 0
+        for year in self.files.years():
+            with self.files.attached(self.conn, year):
+                year_orders, year_revenue = self.archive.order_totals()
+            orders += year_orders
+            revenue += year_revenue
+        return orders, revenue
+
+    def daily_sales(self, first_day, last_day):
+        """Return the sales rollup rows of the archived orders of a range of days"""
+        rows = []
+        for year in self.files.years(int(first_day[:4]), int(last_day[:4])):
+            with self.files.attached(self.conn, year):
+                rows.extend(self.archive.daily_sales(first_day, last_day))
+        return rows
+
+    def product_sales(self):
+        """Return the product sales rows of every archived completed order"""
+        rows = []
+        for year in self.files.years():
+            with self.files.attached(self.conn, year):
+                rows.extend(self.archive.product_sales())
+        return rows
@@ -0,0 +1,75 @@
+"""One connection's worth of repositories and services"""
+from . import migrations
+from .archive import ArchiveFiles
+from .catalogue import CatalogueCache
+from .connection import DEFAULT_PROFILE, connect
+from .repositories import (
+    ArchiveRepository,
+    CustomerRepository,
+    OrderRepository,
+    PointsRepository,
+    ProductRepository,
+    ReportRepository,
+)
+from .services import (
+    ArchiveService,
+    CatalogueService,
+    OrderService,
+    PointsService,
+    ReportService,
+)
+
+
+class CoffeeShop:
+    """The repositories and services of one database connection
+
+    Like the connection itself, an instance must only be used by one thread
+    at a time. It also behaves enough like a connection (in_transaction,
+    rollback, close) to be handed out by a DatabaseWorker.
+
+    catalogue_cache may be shared with other threads, e.g. a UI that reads
+    products from it while this shop's services keep it current.
+    """
+
+    def __init__(self, conn, catalogue_cache=None):
+        self.conn = conn
+        self.catalogue_cache = catalogue_cache if catalogue_cache is not None else CatalogueCache()
+
+        self.products = ProductRepository(conn)
+        self.customers = CustomerRepository(conn)
+        self.points = PointsRepository(conn)
+        self.orders = OrderRepository(conn)
+        self.reports = ReportRepository(conn)
+        self.archives = ArchiveRepository(conn)
+
+        self.archive_service = ArchiveService(
+            conn, self.archives, self.orders, ArchiveFiles.for_connection(conn)
+        )
+        self.catalogue = CatalogueService(
+            conn, self.products, self.customers, self.points, self.catalogue_cache
+        )
+        self.order_service = OrderService(
+            conn, self.orders, self.products, self.points, self.catalogue_cache,
+            self.archive_service,
+        )
+        self.points_service = PointsService(conn, self.points)
+        self.report_service = ReportService(self.reports)
+
+    def migrate(self):
+        """Upgrade the schema to the current version; returns the version"""
+        return migrations.migrate(self.conn)
+
+    @property
+    def in_transaction(self):
+        return self.conn.in_transaction
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+
+def open_shop(path, profile=DEFAULT_PROFILE):
+    """Connect to the database at path and return a CoffeeShop for it"""
+    return CoffeeShop(connect(path, profile))
@@ -0,0 +1,358 @@
+"""Bulk import and export of whole tables as CSV or JSON Lines
+
+Files are streamed in both directions, so their size is not limited by
+memory. Imports check every row before it reaches the database and write
+the rows they reject, with the reason, to a separate file. Valid rows go
+in with one executemany and one transaction per CHUNK_ROWS rows. A chunk
+the database refuses (a duplicate id, an order for an unknown customer)
+is rolled back and retried row by row, so only the offending rows are
+rejected. Chunks are whole transactions rather than savepoints in one
+long transaction: a savepoint makes every later chunk slower, as the
+pages the triggers keep rewriting go through its journal again.
+
+Tables and their columns:
+
+    products     id, name, category, price, cost, stock
+    customers    id, name, phone, email, points
+    orders       id, customer_id, order_date, total_amount, status
+    order_items  order_id, product_id, quantity, price
+
+A missing or empty id gets the next free one. Customers' points go into
+the points ledger as an opening entry each; an export has their balance.
+Orders must be imported before their items, and customers before their
+orders.
+"""
+import csv
+import itertools
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+
+FORMATS = ("csv", "jsonl")
+# Rows per executemany and transaction
+CHUNK_ROWS = 20000
+ORDER_STATUSES = ("Pending", "Completed", "Cancelled")
+
+# parse turns a raw value (str from CSV, any JSON value) into what is
+# stored, raising ValueError; it is not called for missing values
+Column = namedtuple("Column", "name parse required default")
+Table = namedtuple("Table", "columns load dump")
+ImportResult = namedtuple("ImportResult", "read imported rejected")
+
+
+def _text(value):
+    return str(value)
+
+
+def _integer(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"not a whole number: {value!r}")
+    return int(value)
+
+
+def _positive_integer(value):
+    value = _integer(value)
+    if value <= 0:
+        raise ValueError(f"must be positive: {value}")
+    return value
+
+
+def _amount(value):
+    value = float(value)
+    if not value >= 0:  # also rejects NaN
+        raise ValueError(f"must not be negative: {value}")
+    return value
+
+
+def _timestamp(value):
+    value = str(value)
+    datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def _status(value):
+    if value not in ORDER_STATUSES:
+        raise ValueError(f"unknown status {value!r}")
+    return value
+
+
+def _load_customers(shop, rows):
+    """Insert customer rows, their points as "opening" ledger entries
+
+    The ledger needs each customer's id, so missing ids are given out here,
+    after the highest one in the database or the rows.
+    """
+    next_id = max([shop.customers.max_id(), *(row[0] for row in rows if row[0])]) + 1
+    customers = []
+    points = []
+    for customer_id, name, phone, email, opening in rows:
+        if customer_id is None:
+            customer_id, next_id = next_id, next_id + 1
+        customers.append((customer_id, name, phone, email))
+        if opening:
+            points.append((customer_id, opening, "opening", None, None))
+    shop.customers.import_rows(customers)
+    shop.points.add_many(points)
+
+
+TABLES = {
+    "products": Table(
+        columns=(
+            Column("id", _positive_integer, False, None),
+            Column("name", _text, True, None),
+            Column("category", _text, True, None),
+            Column("price", _amount, True, None),
+            Column("cost", _amount, True, None),
+            Column("stock", _integer, False, 0),
+        ),
+        load=lambda shop, rows: shop.products.import_rows(rows),
+        dump=lambda shop: shop.products.export_rows(),
+    ),
+    "customers": Table(
+        columns=(
+            Column("id", _positive_integer, False, None),
+            Column("name", _text, True, None),
+            Column("phone", _text, False, None),
+            Column("email", _text, False, None),
+            Column("points", _integer, False, 0),
+        ),
+        load=lambda shop, rows: _load_customers(shop, rows),
+        dump=lambda shop: shop.customers.export_rows(),
+    ),
+    "orders": Table(
+        columns=(
+            Column("id", _positive_integer, False, None),
+            Column("customer_id", _positive_integer, False, None),
+            Column("order_date", _timestamp, True, None),
+            Column("total_amount", _amount, True, None),
+            Column("status", _status, False, "Pending"),
+        ),
+        load=lambda shop, rows: shop.orders.import_rows(rows),
+        dump=lambda shop: shop.orders.export_rows(),
+    ),
+    "order_items": Table(
+        columns=(
+            Column("order_id", _positive_integer, True, None),
+            Column("product_id", _positive_integer, True, None),
+            Column("quantity", _positive_integer, True, None),
+            Column("price", _amount, True, None),
+        ),
+        load=lambda shop, rows: shop.orders.import_items(rows),
+        dump=lambda shop: shop.orders.export_items(),
+    ),
+}
+
+
+def check_table(table):
+    """Raise ValueError unless table names one of TABLES"""
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}, expected one of {', '.join(TABLES)}")
+
+
+def file_format(path, fmt=None):
+    """Return fmt, or the format implied by the file extension"""
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower()
+        fmt = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(extension)
+        if fmt is None:
+            raise ValueError(f"Cannot tell the format of {path}; use .csv or .jsonl")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def read_records(source, fmt):
+    """Yield (line number, dict) for each record of an open text file"""
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            record = {"_error": f"invalid JSON: {error}", "_line": line.rstrip("\n")}
+        if not isinstance(record, dict):
+            record = {"_error": "not a JSON object", "_line": line.rstrip("\n")}
+        yield line_number, record
+
+
+def parse_record(columns, record):
+    """Return the row tuple for a record, or raise ValueError saying why not"""
+    if "_error" in record:
+        raise ValueError(record["_error"])
+
+    row = []
+    for column in columns:
+        value = record.get(column.name)
+        if value is None or value == "":
+            if column.required:
+                raise ValueError(f"{column.name} is required")
+            row.append(column.default)
+            continue
+        try:
+            row.append(column.parse(value))
+        except (TypeError, ValueError) as error:
+            raise ValueError(f"{column.name}: {error}") from None
+    return tuple(row)
+
+
+class RejectWriter:
+    """Write rejected records, with line number and reason, in the input's format"""
+
+    def __init__(self, path, fmt, columns):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.fmt = fmt
+        self.count = 0
+        if fmt == "csv":
+            self.writer = csv.DictWriter(
+                self.file, ["line", "error", *(column.name for column in columns)],
+                extrasaction="ignore",
+            )
+            self.writer.writeheader()
+
+    def write(self, line_number, record, error):
+        """Record one rejected record"""
+        self.count += 1
+        if self.fmt == "csv":
+            self.writer.writerow(dict(record, line=line_number, error=error))
+        else:
+            entry = {"line": line_number, "error": error, "record": record}
+            self.file.write(json.dumps(entry) + "\n")
+
+    def close(self):
+        """Close the rejects file"""
+        self.file.close()
+
+
+def _load_chunk(shop, table, chunk, rejects):
+    """Insert a chunk of (line number, record, row) in one transaction
+
+    Returns how many rows went in.
+    """
+    conn = shop.conn
+    try:
+        conn.execute("BEGIN")
+        table.load(shop, [row for _, _, row in chunk])
+        conn.commit()
+        return len(chunk)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+
+    # Find the rows the database refuses, one at a time
+    imported = 0
+    conn.execute("BEGIN")
+    for line_number, record, row in chunk:
+        try:
+            table.load(shop, [row])
+            imported += 1
+        except sqlite3.IntegrityError as error:
+            if rejects:
+                rejects.write(line_number, record, str(error))
+    conn.commit()
+    return imported
+
+
+def import_file(shop, table, path, fmt=None, rejects_path=None, chunk_rows=CHUNK_ROWS,
+                progress=None):
+    """Import a CSV or JSON Lines file into a table; return an ImportResult
+
+    shop should use the bulk connection profile. Each chunk_rows rows are
+    one transaction. Rejected rows go to rejects_path if given. progress,
+    if given, is called with the number of rows read after each chunk.
+    """
+    check_table(table)
+    fmt = file_format(path, fmt)
+    spec = TABLES[table]
+    conn = shop.conn
+
+    rejects = RejectWriter(rejects_path, fmt, spec.columns) if rejects_path else None
+    read = imported = rejected = 0
+    chunk = []
+    # Foreign keys catch items of unknown orders and orders of unknown
+    # customers; the setting only applies outside a transaction
+    conn.commit()
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = ON")
+    try:
+        with open(path, newline="", encoding="utf-8") as source:
+            for line_number, record in read_records(source, fmt):
+                read += 1
+                try:
+                    chunk.append((line_number, record, parse_record(spec.columns, record)))
+                except ValueError as error:
+                    rejected += 1
+                    if rejects:
+                        rejects.write(line_number, record, str(error))
+
+                if len(chunk) >= chunk_rows:
+                    done = _load_chunk(shop, spec, chunk, rejects)
+                    imported += done
+                    rejected += len(chunk) - done
+                    chunk.clear()
+                    if progress:
+                        progress(read)
+
+            if chunk:
+                done = _load_chunk(shop, spec, chunk, rejects)
+                imported += done
+                rejected += len(chunk) - done
+            if progress:
+                progress(read)
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {foreign_keys:d}")
+        if rejects:
+            rejects.close()
+
+    return ImportResult(read, imported, rejected)
+
+
+def export_file(shop, table, path, fmt=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Write every row of a table to a CSV or JSON Lines file; return how many
+
+    Rows are fetched chunk_rows at a time. progress, if given, is called
+    with the number written after each chunk.
+    """
+    check_table(table)
+    names = [column.name for column in TABLES[table].columns]
+    return write_rows(TABLES[table].dump(shop), names, path, fmt, chunk_rows, progress)
+
+
+def write_rows(rows, names, path, fmt=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Write rows with the given column names to a CSV or JSON Lines file; return how many
+
+    rows is a cursor, read with fetchmany, or any other iterable, read
+    chunk_rows at a time, so only one chunk is in memory. progress, if
+    given, is called with the number written after each chunk.
+    """
+    fmt = file_format(path, fmt)
+    if hasattr(rows, "fetchmany"):
+        chunks = iter(lambda: rows.fetchmany(chunk_rows), [])
+    else:
+        rows = iter(rows)
+        chunks = iter(lambda: list(itertools.islice(rows, chunk_rows)), [])
+
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as output:
+        if fmt == "csv":
+            writer = csv.writer(output)
+            writer.writerow(names)
+        for chunk in chunks:
+            if fmt == "csv":
+                writer.writerows(chunk)
+            else:
+                output.writelines(json.dumps(dict(zip(names, row))) + "\n" for row in chunk)
+            written += len(chunk)
+            if progress:
+                progress(written)
+    return written
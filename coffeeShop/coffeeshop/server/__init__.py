@@ -0,0 +1,29 @@
+"""The order service, which writes orders for many tills with group commit
+
+    python coffeeShop/manage.py serve-orders --listen unix:/tmp/coffee.sock
+    python coffeeShop/project.py --order-server unix:/tmp/coffee.sock
+
+and the HTTP API for kiosks and online ordering, which writes its orders
+the same way:
+
+    python coffeeShop/manage.py serve-api --listen 127.0.0.1:8080
+"""
+from .api import ApiServer, ConnectionPool, serve_api
+from .client import AsyncOrderClient, OrderClient, OrderServiceError
+from .protocol import DEFAULT_ADDRESS, ProtocolError, parse_address
+from .server import MAX_BATCH, OrderServer, serve
+
+__all__ = [
+    "ApiServer",
+    "AsyncOrderClient",
+    "ConnectionPool",
+    "DEFAULT_ADDRESS",
+    "MAX_BATCH",
+    "OrderClient",
+    "OrderServer",
+    "OrderServiceError",
+    "ProtocolError",
+    "parse_address",
+    "serve",
+    "serve_api",
+]
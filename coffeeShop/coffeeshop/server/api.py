@@ -0,0 +1,500 @@
+"""HTTP/JSON API over the coffee shop data, for kiosks and online ordering
+
+    GET  /menu[?category=...]             products that can be ordered
+    GET  /customers?q=...                 customers by name or phone prefix
+    GET  /customers/{id}                  one customer and their points
+    POST /orders                          {"customer_id": 12 or null,
+                                           "items": [{"id": 3, "quantity": 2}]}
+    GET  /orders/{id}                     an order, its status and items
+    GET  /reports/sales[?from=&to=&hourly=1]
+    GET  /reports/popular[?from=&to=&limit=]
+
+Orders are priced from the catalogue, never from the request, and written
+by an in-process OrderServer, so orders from many kiosks share commits.
+An order the stock cannot cover gets 409 with a "shortfalls" list.
+Reads go through a bounded pool of read-only connections, each used by a
+thread of its own. Menu responses are cached for MENU_MAX_AGE seconds and
+carry an ETag.
+
+Once it starts, a request has REQUEST_TIMEOUT seconds to arrive, and then
+QUERY_TIMEOUT seconds for its database work, after which the query is
+interrupted and the client gets 504; when every connection stays busy
+for that long, it gets 503. An order that gets 504 was not recorded: it
+is withdrawn from the order queue, never cut off mid-write.
+
+The HTTP side is deliberately small: HTTP/1.1 with keep-alive,
+Content-Length bodies only, no TLS. Like the order service it only
+listens on loopback addresses; put a reverse proxy in front of it to
+reach it from elsewhere.
+"""
+import asyncio
+import json
+import logging
+import re
+import signal
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from coffeeshop.core import CatalogueCache, CoffeeShop, OutOfStockError
+
+from . import protocol
+from .server import OrderServer
+
+DEFAULT_ADDRESS = "127.0.0.1:8080"
+# Read-only connections in the pool
+POOL_SIZE = 4
+# Seconds for a request to arrive once started, and for its database work
+REQUEST_TIMEOUT = 10.0
+QUERY_TIMEOUT = 5.0
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE = 30.0
+# Seconds a menu response is served from the cache
+MENU_MAX_AGE = 5
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 256 * 1024
+# Most line items in one order, and most rows of a popular products report
+MAX_ORDER_ITEMS = 100
+MAX_REPORT_ROWS = 100
+
+Request = namedtuple("Request", "method path query headers body")
+
+log = logging.getLogger("coffeeshop.api")
+
+
+class HTTPError(Exception):
+    """An error response"""
+
+    def __init__(self, status, message=None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+class ConnectionPool:
+    """At most size read-only CoffeeShops, each used by one thread
+
+    open_shop is called on each connection's own thread.
+    """
+
+    def __init__(self, open_shop, size=POOL_SIZE):
+        self.open_shop = open_shop
+        self.size = size
+        self._idle = None
+        self._slots = []
+
+    async def start(self):
+        """Open every connection"""
+        self._idle = asyncio.Queue()
+        for number in range(self.size):
+            executor = ThreadPoolExecutor(1, thread_name_prefix=f"api-db-{number}")
+            shop = await asyncio.get_running_loop().run_in_executor(executor, self.open_shop)
+            self._slots.append((executor, shop))
+            self._idle.put_nowait((executor, shop))
+
+    async def run(self, fn, *args, timeout=QUERY_TIMEOUT):
+        """Return fn(shop, *args), run on an idle connection's thread
+
+        Raises HTTPError 503 if no connection is free within timeout, and
+        504 if fn takes longer; the query is then interrupted.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            slot = await asyncio.wait_for(self._idle.get(), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(503, "All database connections are busy") from None
+
+        executor, shop = slot
+        future = executor.submit(fn, shop, *args)
+        # The connection goes back to the pool only once its call is over,
+        # even if the request gave up on it
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._idle.put_nowait, slot)
+        )
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout - (loop.time() - started)
+            )
+        except asyncio.TimeoutError:
+            if not future.done():
+                shop.conn.interrupt()
+            raise HTTPError(504, "The database took too long") from None
+
+    async def close(self):
+        """Close every connection once its current call is over"""
+        loop = asyncio.get_running_loop()
+        for executor, shop in self._slots:
+            await loop.run_in_executor(executor, shop.close)
+            executor.shutdown()
+        self._slots.clear()
+
+
+def _json_body(request):
+    if not request.body:
+        raise HTTPError(400, "A JSON body is required")
+    try:
+        return json.loads(request.body)
+    except ValueError as error:
+        raise HTTPError(400, f"Invalid JSON: {error}") from None
+
+
+def _day(request, name):
+    value = request.query.get(name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPError(400, f"{name} must be a date, YYYY-MM-DD") from None
+
+
+def _whole_number(value, name, minimum=1):
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise HTTPError(400, f"{name} must be a whole number of at least {minimum}")
+    return value
+
+
+class ApiServer:
+    """The HTTP API of one database
+
+    database is a ConnectionFactory: the pool uses its reporting profile,
+    the order writer its default profile.
+    """
+
+    def __init__(self, database, pool_size=POOL_SIZE, query_timeout=QUERY_TIMEOUT):
+        self.database = database
+        self.query_timeout = query_timeout
+        self.catalogue = CatalogueCache(max_age=MENU_MAX_AGE)
+        self.pool = ConnectionPool(
+            lambda: CoffeeShop(database.connect("reporting")), pool_size
+        )
+        # The writer shares the catalogue, so stock taken by orders placed
+        # here shows on the menu straight away
+        self.orders = OrderServer(lambda: CoffeeShop(database.connect(), self.catalogue))
+        self._catalogue_lock = asyncio.Lock()
+        self._menu = {}  # category or None -> (built at, etag, body)
+        self._server = None
+        self._connections = set()
+        self.routes = [
+            ("GET", re.compile(r"^/menu$"), self.get_menu),
+            ("GET", re.compile(r"^/customers$"), self.find_customers),
+            ("GET", re.compile(r"^/customers/(\d+)$"), self.get_customer),
+            ("POST", re.compile(r"^/orders$"), self.submit_order),
+            ("GET", re.compile(r"^/orders/(\d+)$"), self.get_order),
+            ("GET", re.compile(r"^/reports/sales$"), self.sales_report),
+            ("GET", re.compile(r"^/reports/popular$"), self.popular_products),
+        ]
+
+    async def start(self, address):
+        """Open the database and listen on a loopback host:port"""
+        address = protocol.parse_address(address)
+        if address[0] != "tcp":
+            raise ValueError("The HTTP API listens on a host:port, not a Unix socket")
+        _, host, port = address
+        await self.orders.start()  # migrates the schema before the readers open
+        await self.pool.start()
+        self._server = await asyncio.start_server(
+            self._serve_client, host, port, limit=MAX_HEADER_BYTES
+        )
+
+    async def close(self):
+        """Stop listening, finish the queued orders and close the database"""
+        self._server.close()
+        await self._server.wait_closed()
+        for writer in list(self._connections):
+            writer.close()
+        await self.orders.close()
+        await self.pool.close()
+
+    # Handlers return (status, JSON payload) or (status, payload, headers)
+
+    async def get_menu(self, request):
+        category = request.query.get("category")
+        entry = self._menu.get(category)
+        if entry is None or time.monotonic() - entry[0] >= MENU_MAX_AGE:
+            await self._fresh_catalogue()
+            products = [
+                {"id": product_id, "name": name, "price": price}
+                for product_id, name, price in self.catalogue.in_stock(category)
+            ]
+            body = json.dumps({
+                "categories": self.catalogue.categories(), "products": products,
+            }).encode()
+            entry = (time.monotonic(), f'"{zlib.crc32(body):08x}"', body)
+            self._menu[category] = entry
+
+        headers = {"ETag": entry[1], "Cache-Control": f"max-age={MENU_MAX_AGE}"}
+        if request.headers.get("if-none-match") == entry[1]:
+            return 304, None, headers
+        return 200, entry[2], headers
+
+    async def find_customers(self, request):
+        prefix = request.query.get("q", "")
+        rows = await self.pool.run(
+            lambda shop: shop.customers.prefix_search(prefix), timeout=self.query_timeout
+        )
+        return 200, {"customers": [
+            {"id": customer_id, "name": name, "phone": phone} for customer_id, name, phone in rows
+        ]}
+
+    async def get_customer(self, request, customer_id):
+        customer_id = int(customer_id)
+        name, points = await self.pool.run(
+            lambda shop: (shop.customers.name(customer_id), shop.points.balance(customer_id)),
+            timeout=self.query_timeout,
+        )
+        if name is None:
+            raise HTTPError(404, f"No customer {customer_id}")
+        return 200, {"id": customer_id, "name": name, "points": points}
+
+    async def submit_order(self, request):
+        body = _json_body(request)
+        if not isinstance(body, dict):
+            raise HTTPError(400, "The body must be a JSON object")
+        customer_id = body.get("customer_id")
+        if customer_id is not None:
+            customer_id = _whole_number(customer_id, "customer_id")
+        lines = body.get("items")
+        if not isinstance(lines, list) or not 0 < len(lines) <= MAX_ORDER_ITEMS:
+            raise HTTPError(400, f"items must be a list of 1 to {MAX_ORDER_ITEMS} items")
+
+        await self._fresh_catalogue()
+        items = []
+        for line in lines:
+            if not isinstance(line, dict):
+                raise HTTPError(400, "each item must be an object")
+            product_id = _whole_number(line.get("id"), "id")
+            product = self.catalogue.get(product_id)
+            if product is None:
+                raise HTTPError(400, f"No product {product_id}")
+            quantity = _whole_number(line.get("quantity", 1), "quantity")
+            items.append({"id": product_id, "quantity": quantity, "price": product.price})
+        if customer_id is not None:
+            name = await self.pool.run(
+                lambda shop: shop.customers.name(customer_id), timeout=self.query_timeout
+            )
+            if name is None:
+                raise HTTPError(400, f"No customer {customer_id}")
+
+        try:
+            order = await self.orders.submit_order(customer_id, items, self.query_timeout)
+        except asyncio.TimeoutError:
+            # Withdrawn before its batch was written, so safe to retry
+            raise HTTPError(504, "The order was not recorded in time; nothing was written") from None
+        self._menu.clear()  # stock went down
+        return 201, {
+            "order_id": order.order_id, "customer_id": order.customer_id,
+            "order_date": order.order_date, "total": order.total, "status": "Pending",
+        }
+
+    async def get_order(self, request, order_id):
+        order_id = int(order_id)
+        order, items = await self.pool.run(
+            lambda shop: shop.order_service.details(order_id), timeout=self.query_timeout
+        )
+        if order is None:
+            raise HTTPError(404, f"No order {order_id}")
+        _, customer, order_date, total, status = order
+        return 200, {
+            "order_id": order_id, "customer": customer, "order_date": order_date,
+            "total": total, "status": status,
+            "items": [
+                {"name": name, "quantity": quantity, "price": price, "total": line_total}
+                for name, quantity, price, line_total in items
+            ],
+        }
+
+    async def sales_report(self, request):
+        from_date, to_date = _day(request, "from"), _day(request, "to")
+        hourly = request.query.get("hourly") in ("1", "true", "yes")
+        report = await self.pool.run(
+            lambda shop: shop.report_service.sales_report(from_date, to_date, hourly),
+            timeout=self.query_timeout,
+        )
+        return 200, {
+            "hourly": report.hourly,
+            "rows": [
+                {"period": period, "orders": orders, "sales": sales}
+                for period, orders, sales in report.rows
+            ],
+            "total_sales": report.total_sales,
+            "average_sales": report.average_sales,
+        }
+
+    async def popular_products(self, request):
+        from_date, to_date = _day(request, "from"), _day(request, "to")
+        limit = request.query.get("limit", "10")
+        limit = min(_whole_number(limit, "limit"), MAX_REPORT_ROWS)
+        rows = await self.pool.run(
+            lambda shop: shop.report_service.popular_products(from_date, to_date, limit),
+            timeout=self.query_timeout,
+        )
+        return 200, {"products": [
+            {"name": name, "category": category, "units": units, "revenue": revenue}
+            for name, category, units, revenue in rows
+        ]}
+
+    async def _fresh_catalogue(self):
+        """Reload the catalogue from the database if it is older than MENU_MAX_AGE"""
+        async with self._catalogue_lock:
+            if not self.catalogue.fresh:
+                await self.pool.run(
+                    lambda shop: self.catalogue.load(shop.products), timeout=self.query_timeout
+                )
+
+    async def _serve_client(self, reader, writer):
+        """Answer requests on one connection until it closes or idles out"""
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as error:
+                    writer.write(response(error.status, {"error": str(error)}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                writer.write(response(*await self._dispatch(request), keep_alive=keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, request):
+        """Run the handler of a request; returns (status, payload, headers)"""
+        allowed = []
+        for method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if not match:
+                continue
+            if method != request.method:
+                allowed.append(method)
+                continue
+            try:
+                result = await handler(request, *match.groups())
+            except HTTPError as error:
+                return error.status, {"error": str(error)}, {}
+            except OutOfStockError as error:
+                self._menu.clear()
+                return 409, {
+                    "error": str(error),
+                    "shortfalls": [shortfall._asdict() for shortfall in error.shortfalls],
+                }, {}
+            except ValueError as error:
+                return 400, {"error": str(error)}, {}
+            except Exception:
+                log.exception("%s %s failed", request.method, request.path)
+                return 500, {"error": "Internal error"}, {}
+            return result if len(result) == 3 else (*result, {})
+
+        if allowed:
+            return 405, {"error": "Method not allowed"}, {"Allow": ", ".join(allowed)}
+        return 404, {"error": f"No such resource {request.path}"}, {}
+
+
+async def read_request(reader):
+    """Read one request; returns None when the client closed the connection
+
+    Raises HTTPError for a malformed request or one that is too slow or
+    too big.
+    """
+    try:
+        first = await asyncio.wait_for(reader.read(1), KEEP_ALIVE)
+    except asyncio.TimeoutError:
+        return None
+    if not first:
+        return None
+    try:
+        head = first + await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+    except asyncio.IncompleteReadError:
+        raise HTTPError(400) from None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431) from None
+    except asyncio.TimeoutError:
+        raise HTTPError(408) from None
+    if len(head) > MAX_HEADER_BYTES:
+        raise HTTPError(431)
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise HTTPError(400, "Malformed request line") from None
+    if not version.startswith("HTTP/1."):
+        raise HTTPError(505)
+
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    if "transfer-encoding" in headers:
+        raise HTTPError(411, "Send a Content-Length instead of a chunked body")
+
+    length = headers.get("content-length", "0")
+    if not length.isdigit():
+        raise HTTPError(400, "Invalid Content-Length")
+    if int(length) > MAX_BODY_BYTES:
+        raise HTTPError(413)
+    try:
+        body = await asyncio.wait_for(reader.readexactly(int(length)), REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPError(408) from None
+
+    url = urlsplit(target)
+    return Request(method, url.path, dict(parse_qsl(url.query)), headers, body)
+
+
+def response(status, payload, headers=None, keep_alive=True):
+    """Return an HTTP response as bytes; payload is JSON-able, bytes or None"""
+    if payload is None:
+        body = b""
+    elif isinstance(payload, bytes):
+        body = payload
+    else:
+        body = json.dumps(payload).encode()
+
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    if status != 304:
+        lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def _serve(database, address, pool_size, ready):
+    server = ApiServer(database, pool_size)
+    await server.start(address)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    if ready:
+        ready()
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+    return server.orders.stats
+
+
+def serve_api(database, address=DEFAULT_ADDRESS, pool_size=POOL_SIZE, ready=None):
+    """Run the HTTP API on a ConnectionFactory until SIGINT or SIGTERM
+
+    ready, if given, is called once it is listening. Returns the stats of
+    its order writer.
+    """
+    return asyncio.run(_serve(database, address, pool_size, ready))
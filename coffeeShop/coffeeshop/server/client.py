@@ -0,0 +1,179 @@
+"""Clients of the order service
+
+OrderClient is a blocking connection for a till, used from one thread
+(the GUI's database worker). AsyncOrderClient is its asyncio counterpart,
+which the load test runs many of at once.
+
+A refused order raises the same exception type as OrderService would
+(OutOfStockError with its shortfalls, ValueError, sqlite3.IntegrityError),
+and OrderServiceError for anything else. If the connection breaks while an
+order is in flight, the order may or may not have been recorded, so it is
+never sent again automatically.
+"""
+import asyncio
+import itertools
+import socket
+import sqlite3
+
+from . import protocol
+
+# Seconds to wait for the service to answer
+DEFAULT_TIMEOUT = 10.0
+
+_ERRORS = {
+    "ValueError": ValueError,
+    "ProtocolError": ValueError,
+    "KeyError": ValueError,
+    "TypeError": ValueError,
+    "IntegrityError": sqlite3.IntegrityError,
+}
+
+
+class OrderServiceError(Exception):
+    """The order service could not be reached or failed a request"""
+
+
+def _result(reply, key):
+    """Return reply[key], raising the error of a failed reply"""
+    if reply.get("ok"):
+        return reply.get(key)
+    out_of_stock = protocol.error_from_reply(reply)
+    if out_of_stock is not None:
+        raise out_of_stock
+    error = _ERRORS.get(reply.get("error"), OrderServiceError)
+    raise error(reply.get("message") or reply.get("error") or "request failed")
+
+
+class OrderClient:
+    """A blocking connection to the order service
+
+    It connects on first use and again after the connection breaks.
+    """
+
+    def __init__(self, address=protocol.DEFAULT_ADDRESS, timeout=DEFAULT_TIMEOUT):
+        self.address = protocol.parse_address(address)
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._socket = None
+        self._file = None
+
+    def submit_order(self, customer_id, items):
+        """Submit an order like OrderService.submit_order; returns a SubmittedOrder"""
+        request = protocol.order_request(next(self._ids), customer_id, items)
+        return protocol.order_from_json(_result(self._call(request), "order"))
+
+    def ping(self):
+        """Check that the service answers"""
+        _result(self._call({"id": next(self._ids), "op": "ping"}), "ok")
+
+    def stats(self):
+        """Return the service's counters"""
+        return _result(self._call({"id": next(self._ids), "op": "stats"}), "stats")
+
+    def close(self):
+        """Close the connection"""
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = self._file = None
+
+    def _connect(self):
+        if self.address[0] == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            target = self.address[1]
+        else:
+            sock = socket.socket(
+                socket.AF_INET6 if ":" in self.address[1] else socket.AF_INET,
+                socket.SOCK_STREAM,
+            )
+            target = self.address[1:]
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(target)
+        except BaseException:
+            sock.close()
+            raise
+        self._socket = sock
+        self._file = sock.makefile("rb")
+
+    def _call(self, request):
+        """Send a request and return its reply"""
+        try:
+            if self._socket is None:
+                self._connect()
+            self._socket.sendall(protocol.encode(request))
+            line = self._file.readline(protocol.MAX_LINE)
+        except OSError as error:
+            self.close()
+            raise OrderServiceError(f"Order service unavailable: {error}") from error
+        if not line:
+            self.close()
+            raise OrderServiceError("The order service closed the connection")
+        return protocol.decode(line)
+
+
+class AsyncOrderClient:
+    """An asyncio connection to the order service
+
+    Requests may be made concurrently; replies are matched up by id.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._waiting = {}
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, address=protocol.DEFAULT_ADDRESS):
+        """Open a connection to the service at address"""
+        address = protocol.parse_address(address)
+        if address[0] == "unix":
+            reader, writer = await asyncio.open_unix_connection(
+                address[1], limit=protocol.MAX_LINE
+            )
+        else:
+            reader, writer = await asyncio.open_connection(
+                address[1], address[2], limit=protocol.MAX_LINE
+            )
+        return cls(reader, writer)
+
+    async def submit_order(self, customer_id, items):
+        """Submit an order; returns a SubmittedOrder"""
+        request = protocol.order_request(next(self._ids), customer_id, items)
+        return protocol.order_from_json(_result(await self._call(request), "order"))
+
+    async def stats(self):
+        """Return the service's counters"""
+        return _result(await self._call({"id": next(self._ids), "op": "stats"}), "stats")
+
+    async def close(self):
+        """Close the connection"""
+        self._writer.close()
+        await self._writer.wait_closed()
+        await asyncio.gather(self._receiver, return_exceptions=True)
+
+    async def _call(self, request):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request["id"]] = future
+        self._writer.write(protocol.encode(request))
+        await self._writer.drain()
+        return await future
+
+    async def _receive(self):
+        """Hand each reply to the request waiting for it"""
+        error = OrderServiceError("The order service closed the connection")
+        try:
+            while line := await self._reader.readline():
+                reply = protocol.decode(line)
+                future = self._waiting.pop(reply.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        except (OSError, ValueError) as failure:
+            error = OrderServiceError(f"Order service connection failed: {failure}")
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(error)
+        self._waiting.clear()
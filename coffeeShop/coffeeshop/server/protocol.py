@@ -0,0 +1,141 @@
+"""Wire format of the order service
+
+Tills talk to the order service over a Unix socket or a localhost TCP
+port, one JSON object per line in each direction. Every request carries
+an "id" that its reply echoes, so a connection may have several requests
+in flight and replies may come back in any order:
+
+    {"id": 1, "op": "submit_order", "customer_id": 12,
+     "items": [{"id": 3, "quantity": 2, "price": 3.5}]}
+    {"id": 1, "ok": true, "order": {"order_id": 9001, "customer_id": 12,
+     "order_date": "2024-05-01 08:15:02", "total": 7.0, "timing": {...}}}
+
+    {"id": 2, "op": "submit_order", "customer_id": null, "items": []}
+    {"id": 2, "ok": false, "error": "ValueError", "message": "An order needs at least one item"}
+
+    {"id": 3, "ok": false, "error": "OutOfStockError", "message": "Not enough stock: ...",
+     "shortfalls": [{"product_id": 3, "name": "Muffin", "requested": 4, "available": 1}]}
+
+The other operations are "ping" and "stats".
+
+Addresses are "unix:/path/to/socket", a path containing a slash, or
+"host:port" with a loopback host. The service has no authentication, so
+it never listens on a public interface.
+"""
+import ipaddress
+import json
+
+from coffeeshop.core import OrderTiming, OutOfStockError, Shortfall, SubmittedOrder
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+# Longest request or reply line, in bytes; an order of a few hundred line
+# items fits comfortably
+MAX_LINE = 1024 * 1024
+OPERATIONS = ("submit_order", "ping", "stats")
+
+
+class ProtocolError(ValueError):
+    """A message that does not follow the wire format"""
+
+
+def parse_address(address):
+    """Return ("unix", path) or ("tcp", host, port) for an address string"""
+    if address.startswith("unix:"):
+        return ("unix", address[len("unix:"):])
+    if "/" in address:
+        return ("unix", address)
+
+    host, separator, port = address.rpartition(":")
+    if not separator or not port.isdigit():
+        raise ValueError(f"Invalid order service address {address!r}, expected host:port")
+    host = host.strip("[]") or "127.0.0.1"
+    if host != "localhost" and not ipaddress.ip_address(host).is_loopback:
+        raise ValueError(f"The order service only listens on loopback addresses, not {host}")
+    return ("tcp", host, int(port))
+
+
+def encode(message):
+    """Return a message as one line of bytes"""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode(line):
+    """Return the dict in a line of bytes, or raise ProtocolError"""
+    try:
+        message = json.loads(line)
+    except ValueError as error:
+        raise ProtocolError(f"invalid JSON: {error}") from None
+    if not isinstance(message, dict):
+        raise ProtocolError("a message must be a JSON object")
+    return message
+
+
+def _whole_number(value, name):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ProtocolError(f"{name} must be a whole number")
+    return value
+
+
+def parse_order(request):
+    """Return (customer_id, items) from a submit_order request, or raise ProtocolError"""
+    customer_id = request.get("customer_id")
+    if customer_id is not None:
+        _whole_number(customer_id, "customer_id")
+
+    items = request.get("items")
+    if not isinstance(items, list):
+        raise ProtocolError("items must be a list")
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ProtocolError("each item must be an object")
+        # Only the types are checked here; OrderService checks the values
+        quantity = _whole_number(item.get("quantity"), "quantity")
+        price = item.get("price")
+        if isinstance(price, bool) or not isinstance(price, (int, float)):
+            raise ProtocolError("price must be a number")
+        parsed.append({
+            "id": _whole_number(item.get("id"), "id"), "quantity": quantity, "price": price,
+        })
+    return customer_id, parsed
+
+
+def order_request(request_id, customer_id, items):
+    """Return a submit_order request"""
+    return {
+        "id": request_id,
+        "op": "submit_order",
+        "customer_id": customer_id,
+        "items": [
+            {"id": item["id"], "quantity": item["quantity"], "price": item["price"]}
+            for item in items
+        ],
+    }
+
+
+def order_to_json(order):
+    """Return a SubmittedOrder as a JSON object"""
+    return dict(order._replace(timing=order.timing._asdict())._asdict())
+
+
+def order_from_json(data):
+    """Return the SubmittedOrder of a JSON object made by order_to_json"""
+    return SubmittedOrder(**dict(data, timing=OrderTiming(**data["timing"])))
+
+
+def error_reply(request_id, error):
+    """Return the reply to a request that failed with an exception"""
+    reply = {
+        "id": request_id, "ok": False,
+        "error": type(error).__name__, "message": str(error),
+    }
+    if isinstance(error, OutOfStockError):
+        reply["shortfalls"] = [shortfall._asdict() for shortfall in error.shortfalls]
+    return reply
+
+
+def error_from_reply(reply):
+    """Return the OutOfStockError of a failed reply, or None if it is another error"""
+    if reply.get("error") != "OutOfStockError":
+        return None
+    return OutOfStockError(Shortfall(**shortfall) for shortfall in reply.get("shortfalls", ()))
@@ -0,0 +1,237 @@
+"""The order service: one process that owns the database for every till
+
+Tills that each write to the same SQLite file take turns on its write
+lock, and every order costs one transaction and one commit. The order
+service accepts orders from all tills over a socket instead and writes
+them itself, on one connection, with group commit: while one batch is
+being written, the orders that arrive queue up, and the next batch writes
+all of them in a single transaction. Under light load a batch is one
+order and nothing waits; under heavy load the commit cost is shared.
+
+The asyncio loop only talks to the tills. Database work runs on one
+thread of its own, which opens the connection and is the only one to use
+it, so the loop keeps reading requests while a batch is written.
+"""
+import asyncio
+import os
+import signal
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from . import protocol
+
+# Most orders written in one transaction; a bigger backlog becomes
+# several transactions back to back
+MAX_BATCH = 256
+
+
+class OrderServer:
+    """Accept orders from tills and write them with group commit
+
+    open_shop is called on the database thread and returns the CoffeeShop
+    to write with; it should use the pos profile.
+    """
+
+    def __init__(self, open_shop, max_batch=MAX_BATCH):
+        self.open_shop = open_shop
+        self.max_batch = max_batch
+        self.stats = Counter(orders=0, refused=0, withdrawn=0, batches=0, largest_batch=0)
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="order-db")
+        self._queue = None
+        self._shop = None
+        self._server = None
+        self._committer = None
+        self._clients = set()
+        # Futures of the orders in the batch being written
+        self._writing = set()
+
+    async def start(self, address=None):
+        """Open the database and listen on an address from protocol.parse_address
+
+        Without an address the server only takes orders from submit_order,
+        e.g. from the HTTP API in the same process.
+        """
+        loop = asyncio.get_running_loop()
+        self._shop = await loop.run_in_executor(self._executor, self.open_shop)
+        await loop.run_in_executor(self._executor, self._shop.migrate)
+        self._queue = asyncio.Queue()
+        self._committer = asyncio.create_task(self._commit_batches())
+
+        if address is None:
+            return
+        if address[0] == "unix":
+            path = address[1]
+            if os.path.exists(path):
+                os.unlink(path)  # left behind by a server that did not shut down
+            self._server = await asyncio.start_unix_server(
+                self._serve_client, path, limit=protocol.MAX_LINE
+            )
+        else:
+            self._server = await asyncio.start_server(
+                self._serve_client, address[1], address[2], limit=protocol.MAX_LINE
+            )
+
+    async def close(self):
+        """Stop listening, write the orders already queued and close the database"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in list(self._clients):
+            writer.close()
+
+        await self._queue.put(None)
+        await self._committer
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._shop.close)
+        self._executor.shutdown()
+
+    async def submit_order(self, customer_id, items, timeout=None):
+        """Queue an order for the next batch; returns its SubmittedOrder
+
+        An order still queued after timeout seconds, or when the caller is
+        cancelled, is withdrawn and never written, and asyncio.TimeoutError
+        (or the cancellation) is raised. Once its batch is being written it
+        is waited for instead, so a timeout always means "not recorded".
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((customer_id, items, future))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done() or future in self._writing:
+                return await future
+            future.cancel()
+            raise
+        except asyncio.CancelledError:
+            if not future.done() and future not in self._writing:
+                future.cancel()
+            raise
+
+    async def _commit_batches(self):
+        """Write queued orders, as many per transaction as have queued up"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if None in batch:
+                stopping = True
+                batch.remove(None)
+            # Orders withdrawn by their callers while queued
+            queued = len(batch)
+            batch = [entry for entry in batch if not entry[2].cancelled()]
+            self.stats["withdrawn"] += queued - len(batch)
+            if not batch:
+                continue
+
+            orders = [(customer_id, items) for customer_id, items, _ in batch]
+            self._writing = {future for _, _, future in batch}
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._shop.order_service.submit_orders, orders
+                )
+            except Exception as error:
+                results = [error] * len(batch)
+            finally:
+                self._writing = set()
+
+            self.stats["batches"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            for (_, _, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.stats["refused"] += 1
+                    if not future.done():
+                        future.set_exception(result)
+                else:
+                    self.stats["orders"] += 1
+                    if not future.done():
+                        future.set_result(result)
+
+    async def _serve_client(self, reader, writer):
+        """Answer one till's requests until it disconnects"""
+        self._clients.add(writer)
+        pending = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(protocol.encode(
+                        protocol.error_reply(None, protocol.ProtocolError("request too long"))
+                    ))
+                    break
+                if not line:
+                    break
+                # Each request is answered on its own, so a till may pipeline
+                task = asyncio.create_task(self._answer(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except ConnectionError:
+            pass
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _answer(self, line, writer):
+        """Handle one request line and write its reply"""
+        request_id = None
+        try:
+            request = protocol.decode(line)
+            request_id = request.get("id")
+            reply = await self._handle(request)
+        except Exception as error:
+            reply = protocol.error_reply(request_id, error)
+        reply["id"] = request_id
+
+        if not writer.is_closing():
+            writer.write(protocol.encode(reply))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _handle(self, request):
+        """Return the reply to a decoded request"""
+        op = request.get("op")
+        if op == "submit_order":
+            customer_id, items = protocol.parse_order(request)
+            order = await self.submit_order(customer_id, items)
+            return {"ok": True, "order": protocol.order_to_json(order)}
+        if op == "ping":
+            return {"ok": True}
+        if op == "stats":
+            return {"ok": True, "stats": dict(self.stats, queued=self._queue.qsize())}
+        raise protocol.ProtocolError(
+            f"unknown op {op!r}, expected one of {', '.join(protocol.OPERATIONS)}"
+        )
+
+
+async def _serve(open_shop, address, max_batch, ready):
+    server = OrderServer(open_shop, max_batch)
+    await server.start(address)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    if ready:
+        ready()
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        if address[0] == "unix" and os.path.exists(address[1]):
+            os.unlink(address[1])
+    return server.stats
+
+
+def serve(open_shop, address, max_batch=MAX_BATCH, ready=None):
+    """Run an order service until SIGINT or SIGTERM; returns its stats
+
+    address is a string for protocol.parse_address. ready, if given, is
+    called once the service is listening.
+    """
+    return asyncio.run(_serve(open_shop, protocol.parse_address(address), max_batch, ready))
@@ -0,0 +1,72 @@
+"""Shared pytest fixtures; its directory is what puts coffeeshop on the import path"""
+import pytest
+
+from coffeeshop.core import open_shop
+
+
+@pytest.fixture
+def shop():
+    """A CoffeeShop on a freshly migrated in-memory database"""
+    shop = open_shop(":memory:")
+    shop.migrate()
+    yield shop
+    shop.close()
+
+
+@pytest.fixture
+def busy_shop(shop):
+    """shop after orders, status changes, edits and deletes, all through the triggers"""
+    catalogue, orders, conn = shop.catalogue, shop.order_service, shop.conn
+    latte = catalogue.add_product("Latte", "Coffee", 3.5, 1.0, 100)
+    muffin = catalogue.add_product("Muffin", "Food", 2.25, 0.8, 100)
+    scone = catalogue.add_product("Scone", "Food", 2.0, 0.7, 100)
+    discontinued = catalogue.add_product("Discontinued", "Food", 1.0, 0.5, 0)
+    alice = catalogue.add_customer("Alice", "555-0100", "", 10)
+    bob = catalogue.add_customer("Bob", "555-0101", "")
+    one_off = catalogue.add_customer("One-off", "555-0102", "")
+
+    def item(product_id, quantity, price):
+        return {"id": product_id, "quantity": quantity, "price": price}
+
+    ids = [
+        orders.submit_order(customer_id, items, order_date).order_id
+        for customer_id, items, order_date in [
+            (alice, [item(latte, 2, 3.5)], "2024-03-01 08:15:00"),
+            (bob, [item(latte, 1, 3.5), item(muffin, 3, 2.25)], "2024-03-01 08:45:00"),
+            (None, [item(scone, 1, 2.0)], "2024-03-01 13:05:00"),
+            (alice, [item(muffin, 2, 2.25), item(scone, 2, 2.0)], "2024-03-02 09:30:00"),
+            (None, [item(latte, 1, 3.5)], "2024-03-03 17:00:00"),
+            (bob, [item(scone, 4, 2.0)], "2024-03-03 17:40:00"),
+        ]
+    ]
+    for order_id in ids:
+        orders.set_status(order_id, "Completed")
+    orders.set_status(ids[2], "Cancelled")
+    orders.set_status(ids[4], "Pending")
+
+    with conn:
+        # Moved to another day and hour, and repriced
+        conn.execute("UPDATE orders SET order_date = '2024-03-02 18:20:00' WHERE id = ?", (ids[1],))
+        conn.execute("UPDATE orders SET total_amount = total_amount + 1 WHERE id = ?", (ids[0],))
+        # Items of completed orders added, changed and removed
+        conn.execute(
+            "INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, 1, 2.0)",
+            (ids[3], scone),
+        )
+        conn.execute(
+            "UPDATE order_items SET quantity = 5 WHERE order_id = ? AND product_id = ?",
+            (ids[3], muffin),
+        )
+        conn.execute(
+            "DELETE FROM order_items WHERE order_id = ? AND product_id = ?", (ids[1], latte)
+        )
+        conn.execute("UPDATE order_items SET price = 3.0 WHERE order_id = ?", (ids[0],))
+        # Moved from a completed order to a pending one
+        conn.execute("UPDATE order_items SET order_id = ? WHERE order_id = ?", (ids[4], ids[1]))
+        # Whole orders deleted, completed and cancelled
+        for order_id in (ids[5], ids[2]):
+            conn.execute("DELETE FROM orders WHERE id = ?", (order_id,))
+            conn.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
+        conn.execute("DELETE FROM products WHERE id = ?", (discontinued,))
+        conn.execute("DELETE FROM customers WHERE id = ?", (one_off,))
+    return shop
@@ -0,0 +1,125 @@
+"""Run database calls on a dedicated thread
+
+The UI thread queues calls and gets a Future back; the worker thread owns
+the only SQLite connection and runs the calls one at a time, in order.
+Finished calls are handed back to the UI through ``dispatch``, which the
+UI polls (tkinter: ``root.after``), so callbacks always run on the thread
+that owns the widgets.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class DatabaseWorker:
+    """A thread with its own connection that runs queued database calls
+
+    connect is called on the worker thread to open the connection, or an
+    object wrapping one such as a coffeeshop.core.CoffeeShop; it needs
+    in_transaction, rollback and close. If connect raises, every call
+    fails with its exception. Every call is fn(conn, *args). call, submit
+    and dispatch are meant to be used from a single (UI) thread.
+    """
+
+    def __init__(self, connect, name="db-worker"):
+        self.connect = connect
+        self._requests = queue.Queue()
+        self._completed = queue.SimpleQueue()
+        self._latest = {}  # key -> newest Future submitted with that key
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, key=None):
+        """Queue fn(conn, *args) and return its Future
+
+        A call made with the same key as an earlier one supersedes it: the
+        earlier call is cancelled if it has not started yet, and its result
+        is never dispatched.
+        """
+        future = Future()
+
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._latest[key] = future
+
+        self._requests.put((future, fn, args))
+        return future
+
+    def call(self, fn, *args, key=None, on_done=None, on_error=None):
+        """Queue fn(conn, *args); dispatch passes the result to on_done
+
+        If fn raises, on_error is called with the exception instead.
+        """
+        future = self.submit(fn, *args, key=key)
+        future.add_done_callback(
+            lambda done: self._completed.put((done, key, on_done, on_error))
+        )
+        return future
+
+    def dispatch(self):
+        """Run the callbacks of finished calls on the calling thread"""
+        while True:
+            try:
+                future, key, on_done, on_error = self._completed.get_nowait()
+            except queue.Empty:
+                return
+
+            if future.cancelled():
+                continue
+            if key is not None:
+                if self._latest.get(key) is not future:
+                    continue  # superseded while it was running
+                del self._latest[key]
+
+            error = future.exception()
+            if error is not None:
+                if on_error is not None:
+                    on_error(error)
+            elif on_done is not None:
+                on_done(future.result())
+
+    def close(self, timeout=None):
+        """Finish the queued calls, then close the connection"""
+        self._requests.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            conn = self.connect()
+        except BaseException as error:
+            self._fail_calls(error)
+            return
+
+        try:
+            while True:
+                request = self._requests.get()
+                if request is None:
+                    break
+
+                future, fn, args = request
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                try:
+                    result = fn(conn, *args)
+                except BaseException as error:
+                    # Never leave a failed call's transaction open for the next one
+                    if conn.in_transaction:
+                        conn.rollback()
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        finally:
+            conn.close()
+
+    def _fail_calls(self, error):
+        """Fail every call, queued or still to come, with error until close()"""
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            future = request[0]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
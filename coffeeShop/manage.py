@@ -0,0 +1,664 @@
+"""Maintenance commands for the coffee shop database
+
+Usage:
+    python coffeeShop/manage.py migrate
+    python coffeeShop/manage.py check-plans
+    python coffeeShop/manage.py rebuild-stats
+    python coffeeShop/manage.py backfill-daily-sales [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+    python coffeeShop/manage.py rebuild-search
+    python coffeeShop/manage.py rebuild-product-sales
+    python coffeeShop/manage.py compact-points
+    python coffeeShop/manage.py replay-points [--check]
+    python coffeeShop/manage.py archive-orders [--before YYYY-MM-DD | --keep-days 365] [--vacuum]
+    python coffeeShop/manage.py import TABLE FILE [--rejects rejects.csv]
+    python coffeeShop/manage.py export TABLE FILE
+    python coffeeShop/manage.py export-report REPORT FILE [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+    python coffeeShop/manage.py export-receipts --output receipts/ [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--format text|escpos]
+    python coffeeShop/manage.py serve-orders [--listen 127.0.0.1:8765 | --listen unix:/path/to/socket]
+    python coffeeShop/manage.py serve-api [--listen 127.0.0.1:8080] [--pool-size 4]
+    python coffeeShop/manage.py bench-submit [--items 1 10 100] [--orders 200]
+    python coffeeShop/manage.py bench-order-service [--clients 1 2 4 8 16 32] [--orders 2000] [--no-direct]
+    python coffeeShop/manage.py bench-stock [--threads 1 4 16 32] [--stock 1000]
+    python coffeeShop/manage.py bench-api [--clients 1 8 32] [--requests 200]
+    python coffeeShop/manage.py generate-data --db bench.db --orders 100000 [--seed 0]
+    python coffeeShop/manage.py bench --db bench.db [--output results.json] [--query-stats stats.json]
+
+The database and connection profile come from coffeeshop.ini if present;
+--config, --profile (before the command) and --db override them.
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from coffeeshop.bench import api as api_bench
+from coffeeshop.bench import generate
+from coffeeshop.bench import order_service as order_service_bench
+from coffeeshop.bench import orders as order_bench
+from coffeeshop.bench import runner
+from coffeeshop.bench import stock as stock_bench
+from coffeeshop.core import (
+    CoffeeShop,
+    archive,
+    connection,
+    load_config,
+    migrations,
+    queries,
+    receipts,
+    report_export,
+    transfer,
+)
+from coffeeshop.core.instrument import STATS
+from coffeeshop.core.services import ARCHIVE_BATCH_ORDERS
+from coffeeshop.server import DEFAULT_ADDRESS, MAX_BATCH, api, serve
+
+DB_HELP = "database file (default: from the config file, else coffee_shop.db)"
+
+
+def iso_day(text):
+    """argparse type for a YYYY-MM-DD day; returns the text unchanged"""
+    try:
+        valid = date.fromisoformat(text).isoformat() == text
+    except ValueError:
+        valid = False
+    if not valid:
+        raise argparse.ArgumentTypeError(f"invalid day {text!r}, expected YYYY-MM-DD")
+    return text
+
+
+def open_database(args, preferred_profile=None):
+    """Return the ConnectionFactory and a CoffeeShop for the command's database
+
+    --profile wins over the command's preferred profile, which wins over
+    the one in the config file.
+    """
+    factory = load_config(args.config, args.db, args.profile)
+    return factory, CoffeeShop(factory.connect(args.profile or preferred_profile))
+
+
+def cmd_migrate(args):
+    """Upgrade the database schema to the current version"""
+    factory, shop = open_database(args)
+    before = migrations.get_version(shop.conn)
+    after = shop.migrate()
+    shop.close()
+
+    if before == after:
+        print(f"{factory.path} is up to date (schema version {after})")
+    else:
+        print(f"Migrated {factory.path} from schema version {before} to {after}")
+    return 0
+
+
+def cmd_check_plans(args):
+    """Check the query plan of every statement in coffeeshop.core.queries"""
+    # By default an empty, freshly migrated database is used: its plans only
+    # depend on the schema, so results are reproducible across machines
+    if args.db:
+        conn = open_database(args, "reporting")[1].conn
+    else:
+        conn = connection.connect(":memory:")
+        migrations.migrate(conn)
+    archive.attach_empty(conn)
+
+    if args.verbose:
+        for name, sql in queries.all_queries().items():
+            print(f"{name}:")
+            for line in queries.explain(conn, sql):
+                print(f"    {line}")
+
+    problems = queries.check_query_plans(conn)
+    conn.close()
+
+    for problem in problems:
+        print(problem)
+    print(f"{len(queries.all_queries())} queries checked, {len(problems)} problems")
+    return 1 if problems else 0
+
+
+def cmd_rebuild_stats(args):
+    """Recompute the dashboard stats row from the base tables"""
+    shop = open_database(args, "bulk")[1]
+    shop.migrate()
+    archived = shop.archive_service.order_totals()
+    with shop.conn:
+        shop.reports.rebuild_stats(archived)
+    stats = shop.reports.dashboard_stats()
+    shop.close()
+
+    print(
+        "Rebuilt stats: {} products, {} customers, {} orders, ${:.2f} revenue".format(*stats)
+    )
+    return 0
+
+
+def cmd_backfill_daily_sales(args):
+    """Rebuild the daily_sales rollup from the orders table"""
+    shop = open_database(args, "bulk")[1]
+    shop.migrate()
+
+    first, last = shop.reports.order_date_range()
+    if first is None:
+        print("No orders to backfill")
+        shop.close()
+        return 0
+
+    start = date.fromisoformat(args.from_date or first)
+    end = date.fromisoformat(args.to_date or last)
+
+    # One transaction per batch keeps the write lock short, so tills can
+    # keep taking orders while a long history is backfilled
+    batch_start = start
+    while batch_start <= end:
+        batch_end = min(batch_start + timedelta(days=args.batch_days - 1), end)
+        params = (batch_start.isoformat(), batch_end.isoformat())
+        archived_rows = shop.archive_service.daily_sales(*params)
+        with shop.conn:
+            shop.reports.backfill_daily_sales(*params, archived_rows)
+        print(f"Backfilled {params[0]} to {params[1]}")
+        batch_start = batch_end + timedelta(days=1)
+
+    shop.close()
+    return 0
+
+
+def cmd_rebuild_search(args):
+    """Rebuild the full-text search indexes from the products and customers"""
+    shop = open_database(args, "bulk")[1]
+    shop.migrate()
+    with shop.conn:
+        shop.reports.rebuild_search()
+    shop.close()
+
+    print("Rebuilt product and customer search indexes")
+    return 0
+
+
+def cmd_rebuild_product_sales(args):
+    """Recompute the product sales aggregates from the completed orders"""
+    shop = open_database(args, "bulk")[1]
+    shop.migrate()
+    archived_rows = shop.archive_service.product_sales()
+    with shop.conn:
+        shop.reports.rebuild_product_sales(archived_rows)
+    shop.close()
+
+    print("Rebuilt product sales")
+    return 0
+
+
+def cmd_compact_points(args):
+    """Fold the new loyalty points ledger entries into the per-customer snapshots"""
+    shop = open_database(args)[1]
+    shop.migrate()
+    result = shop.points_service.compact()
+    shop.close()
+
+    print(
+        f"Folded {result.entries} ledger entries into {result.customers} "
+        f"customers' snapshots, through entry {result.through}"
+    )
+    return 0
+
+
+def cmd_replay_points(args):
+    """Rebuild every points balance from the whole ledger"""
+    shop = open_database(args, "bulk")[1]
+    shop.migrate()
+    result = shop.points_service.replay(check=args.check)
+    shop.close()
+
+    print(
+        f"Replayed {result.entries} ledger entries into {result.customers} balances"
+        + (" (checked only, nothing written)" if args.check else "")
+    )
+    for customer_id, before, after in result.changed:
+        print(f"    customer {customer_id}: {before} -> {after}")
+    print(f"{len(result.changed)} balances {'would change' if args.check else 'changed'}")
+    return 1 if args.check and result.changed else 0
+
+
+def cmd_archive_orders(args):
+    """Move completed orders older than a cutoff into per-year archive files"""
+    shop = open_database(args)[1]
+    shop.migrate()
+    before = args.before or (date.today() - timedelta(days=args.keep_days)).isoformat()
+
+    def progress(moved):
+        print(f"\r{moved} orders archived", end="", flush=True)
+
+    result = shop.archive_service.archive_orders(before, args.batch_orders, progress)
+    print(f"\rArchived {result.orders} orders and {result.items} items from before {before}")
+    for year in result.years:
+        print(f"    {shop.archive_service.files.path(year)}")
+
+    if args.vacuum and result.orders:
+        print("Vacuuming...")
+        shop.archive_service.vacuum()
+    shop.close()
+    return 0
+
+
+def cmd_import(args):
+    """Load a CSV or JSON Lines file into a table"""
+    shop = open_database(args, "bulk")[1]
+    shop.migrate()
+
+    def progress(read):
+        print(f"\r{read} rows read", end="", flush=True)
+
+    result = transfer.import_file(
+        shop, args.table, args.file, args.format, args.rejects,
+        chunk_rows=args.chunk_rows, progress=progress,
+    )
+    shop.close()
+
+    print(f"\rImported {result.imported} of {result.read} rows into {args.table}, "
+          f"rejected {result.rejected}")
+    if result.rejected and args.rejects:
+        print(f"Rejected rows are in {args.rejects}")
+    return 1 if result.rejected else 0
+
+
+def cmd_export(args):
+    """Write every row of a table to a CSV or JSON Lines file"""
+    shop = open_database(args, "reporting")[1]
+
+    def progress(written):
+        print(f"\r{written} rows", end="", flush=True)
+
+    written = transfer.export_file(shop, args.table, args.file, args.format, progress=progress)
+    shop.close()
+
+    print(f"\rExported {written} rows of {args.table} to {args.file}")
+    return 0
+
+
+def cmd_export_report(args):
+    """Write a sales or product report over a range of days to a CSV or JSON Lines file"""
+    shop = open_database(args, "reporting")[1]
+
+    def progress(written):
+        print(f"\r{written} rows", end="", flush=True)
+
+    written = report_export.export_report(
+        shop, args.report, args.file, args.from_date, args.to_date, args.format,
+        chunk_rows=args.chunk_rows, progress=progress,
+    )
+    shop.close()
+
+    print(f"\rExported {written} rows of {args.report} to {args.file}")
+    return 0
+
+
+def cmd_export_receipts(args):
+    """Write a receipt file for every order of a range of days"""
+    shop = open_database(args, "reporting")[1]
+
+    # The default range reaches back to the oldest archived order
+    first, last = report_export.default_range(shop)
+    if first is None:
+        print("No orders to export")
+        shop.close()
+        return 0
+
+    def progress(written):
+        print(f"\r{written} receipts", end="", flush=True)
+
+    written = receipts.export_receipts(
+        shop.order_service.receipts(args.from_date or first, args.to_date or last),
+        args.output, args.format, progress=progress,
+    )
+    shop.close()
+
+    print(f"\rWrote {written} receipts to {args.output}")
+    return 0
+
+
+def cmd_serve_orders(args):
+    """Run the order service, which writes orders for every till, until interrupted"""
+    factory = load_config(args.config, args.db, args.profile)
+
+    def ready():
+        print(f"Order service for {factory.path} listening on {args.listen}", flush=True)
+
+    stats = serve(lambda: CoffeeShop(factory.connect()), args.listen, args.max_batch, ready)
+    print(f"Stopped after {stats['orders']} orders in {stats['batches']} transactions "
+          f"(largest {stats['largest_batch']}), {stats['refused']} refused")
+    return 0
+
+
+def cmd_serve_api(args):
+    """Run the HTTP API for kiosks and online ordering until interrupted"""
+    factory = load_config(args.config, args.db, args.profile)
+
+    def ready():
+        print(f"HTTP API for {factory.path} listening on http://{args.listen}/", flush=True)
+
+    stats = api.serve_api(factory, args.listen, args.pool_size, ready)
+    print(f"Stopped after {stats['orders']} orders in {stats['batches']} transactions")
+    return 0
+
+
+def cmd_bench_stock(args):
+    """Sell limited stock from many writer threads and check nothing was oversold"""
+    results = stock_bench.bench_stock_contention(args.threads, args.products, args.stock)
+    print(stock_bench.format_results(results))
+    oversold = any(result["negative_stock"] or result["mismatched"] for result in results)
+    return 1 if oversold else 0
+
+
+def cmd_bench_api(args):
+    """Load test the HTTP API with concurrent clients and report latency percentiles"""
+    results = api_bench.bench_api(args.clients, args.requests, args.data_orders)
+    print(api_bench.format_results(results))
+    return 0
+
+
+def cmd_bench_order_service(args):
+    """Measure orders per second through the order service for several client counts"""
+    results = order_service_bench.bench_order_service(
+        args.clients, args.orders, direct=not args.no_direct
+    )
+    print(order_service_bench.format_results(results))
+    return 0
+
+
+def cmd_bench_submit(args):
+    """Measure order submission throughput on a scratch database"""
+    results = order_bench.bench_submit_order(args.items, args.orders)
+    print(order_bench.format_results(results))
+    return 0
+
+
+def cmd_generate_data(args):
+    """Fill a database with seeded synthetic products, customers and orders"""
+    shop = open_database(args, "bulk")[1]
+    shop.migrate()
+
+    def progress(written):
+        print(f"\r{written}/{args.orders} orders", end="", flush=True)
+
+    counts = generate.generate(
+        shop, args.orders, customers=args.customers, days=args.days, seed=args.seed,
+        progress=progress,
+    )
+    shop.close()
+
+    print()
+    print("Added {products} products, {customers} customers, {orders} orders "
+          "and {order_items} order items".format(**counts))
+    return 0
+
+
+def cmd_bench(args):
+    """Time every database path of the app and optionally save JSON results"""
+    shop = open_database(args)[1]
+    shop.migrate()
+    results = runner.run_benchmarks(shop, args.repeat, writes=not args.no_writes, only=args.only)
+    shop.close()
+
+    print(runner.format_results(results))
+    if args.output:
+        runner.save_results(results, args.output)
+        print(f"Saved results to {args.output}")
+    if args.query_stats:
+        STATS.dump(args.query_stats)
+        print(f"Saved per-statement query stats to {args.query_stats}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coffee shop database maintenance")
+    connection.add_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="upgrade the schema in place")
+    migrate_parser.add_argument("--db", help=DB_HELP)
+    migrate_parser.set_defaults(func=cmd_migrate)
+
+    plans_parser = subparsers.add_parser(
+        "check-plans", help="check query plans against the expected indexes"
+    )
+    plans_parser.add_argument(
+        "--db", help="database to check (default: a fresh in-memory database)"
+    )
+    plans_parser.add_argument("-v", "--verbose", action="store_true")
+    plans_parser.set_defaults(func=cmd_check_plans)
+
+    stats_parser = subparsers.add_parser(
+        "rebuild-stats", help="recompute the dashboard stats from scratch"
+    )
+    stats_parser.add_argument("--db", help=DB_HELP)
+    stats_parser.set_defaults(func=cmd_rebuild_stats)
+
+    backfill_parser = subparsers.add_parser(
+        "backfill-daily-sales", help="rebuild the sales rollup from the orders table"
+    )
+    backfill_parser.add_argument("--db", help=DB_HELP)
+    backfill_parser.add_argument(
+        "--from", dest="from_date", type=iso_day, help="first day (default: oldest order)"
+    )
+    backfill_parser.add_argument(
+        "--to", dest="to_date", type=iso_day, help="last day (default: newest order)"
+    )
+    backfill_parser.add_argument("--batch-days", type=int, default=31)
+    backfill_parser.set_defaults(func=cmd_backfill_daily_sales)
+
+    search_parser = subparsers.add_parser(
+        "rebuild-search", help="rebuild the product and customer search indexes"
+    )
+    search_parser.add_argument("--db", help=DB_HELP)
+    search_parser.set_defaults(func=cmd_rebuild_search)
+
+    product_sales_parser = subparsers.add_parser(
+        "rebuild-product-sales", help="recompute the popular products aggregates"
+    )
+    product_sales_parser.add_argument("--db", help=DB_HELP)
+    product_sales_parser.set_defaults(func=cmd_rebuild_product_sales)
+
+    compact_parser = subparsers.add_parser(
+        "compact-points", help="fold new loyalty points entries into the snapshots"
+    )
+    compact_parser.add_argument("--db", help=DB_HELP)
+    compact_parser.set_defaults(func=cmd_compact_points)
+
+    replay_parser = subparsers.add_parser(
+        "replay-points", help="rebuild every points balance from the ledger"
+    )
+    replay_parser.add_argument("--db", help=DB_HELP)
+    replay_parser.add_argument(
+        "--check", action="store_true",
+        help="only report the balances that differ; exit 1 if any do",
+    )
+    replay_parser.set_defaults(func=cmd_replay_points)
+
+    archive_parser = subparsers.add_parser(
+        "archive-orders", help="move old completed orders into per-year archive files"
+    )
+    archive_parser.add_argument("--db", help=DB_HELP)
+    cutoff = archive_parser.add_mutually_exclusive_group()
+    cutoff.add_argument("--before", type=iso_day, help="archive orders dated before this day")
+    cutoff.add_argument(
+        "--keep-days", type=int, default=365, help="days of orders to keep (default: 365)"
+    )
+    archive_parser.add_argument(
+        "--batch-orders", type=int, default=ARCHIVE_BATCH_ORDERS, help="orders per transaction"
+    )
+    archive_parser.add_argument(
+        "--vacuum", action="store_true", help="shrink the database file afterwards"
+    )
+    archive_parser.set_defaults(func=cmd_archive_orders)
+
+    import_parser = subparsers.add_parser(
+        "import", help="load a CSV or JSON Lines file into a table"
+    )
+    import_parser.add_argument("table", choices=list(transfer.TABLES))
+    import_parser.add_argument("file", help="a .csv or .jsonl file")
+    import_parser.add_argument("--db", help=DB_HELP)
+    import_parser.add_argument("--format", choices=transfer.FORMATS, help="override the file extension")
+    import_parser.add_argument("--rejects", help="write rejected rows and the reasons to this file")
+    import_parser.add_argument(
+        "--chunk-rows", type=int, default=transfer.CHUNK_ROWS, help="rows per transaction"
+    )
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser(
+        "export", help="write a table to a CSV or JSON Lines file"
+    )
+    export_parser.add_argument("table", choices=list(transfer.TABLES))
+    export_parser.add_argument("file", help="a .csv or .jsonl file")
+    export_parser.add_argument("--db", help=DB_HELP)
+    export_parser.add_argument("--format", choices=transfer.FORMATS, help="override the file extension")
+    export_parser.set_defaults(func=cmd_export)
+
+    report_parser = subparsers.add_parser(
+        "export-report", help="write a sales or product report to a CSV or JSON Lines file"
+    )
+    report_parser.add_argument("report", choices=list(report_export.REPORTS))
+    report_parser.add_argument("file", help="a .csv or .jsonl file")
+    report_parser.add_argument("--db", help=DB_HELP)
+    report_parser.add_argument(
+        "--from", dest="from_date", type=iso_day, help="first day (default: oldest order)"
+    )
+    report_parser.add_argument(
+        "--to", dest="to_date", type=iso_day, help="last day (default: newest order)"
+    )
+    report_parser.add_argument("--format", choices=transfer.FORMATS, help="override the file extension")
+    report_parser.add_argument(
+        "--chunk-rows", type=int, default=transfer.CHUNK_ROWS, help="rows read and written at a time"
+    )
+    report_parser.set_defaults(func=cmd_export_report)
+
+    receipts_parser = subparsers.add_parser(
+        "export-receipts", help="write receipt files for the orders of a range of days"
+    )
+    receipts_parser.add_argument("--db", help=DB_HELP)
+    receipts_parser.add_argument("--output", required=True, help="directory for the receipt files")
+    receipts_parser.add_argument(
+        "--from", dest="from_date", type=iso_day, help="first day (default: oldest order)"
+    )
+    receipts_parser.add_argument(
+        "--to", dest="to_date", type=iso_day, help="last day (default: newest order)"
+    )
+    receipts_parser.add_argument(
+        "--format", choices=list(receipts.FORMATS), default="text", help="receipt format"
+    )
+    receipts_parser.set_defaults(func=cmd_export_receipts)
+
+    serve_parser = subparsers.add_parser(
+        "serve-orders", help="accept orders from tills over a socket and write them"
+    )
+    serve_parser.add_argument("--db", help=DB_HELP)
+    serve_parser.add_argument(
+        "--listen", default=DEFAULT_ADDRESS,
+        help=f"loopback host:port or unix:PATH (default: {DEFAULT_ADDRESS})",
+    )
+    serve_parser.add_argument(
+        "--max-batch", type=int, default=MAX_BATCH, help="most orders per transaction"
+    )
+    serve_parser.set_defaults(func=cmd_serve_orders)
+
+    api_parser = subparsers.add_parser(
+        "serve-api", help="serve the HTTP/JSON API for kiosks and online ordering"
+    )
+    api_parser.add_argument("--db", help=DB_HELP)
+    api_parser.add_argument(
+        "--listen", default=api.DEFAULT_ADDRESS,
+        help=f"loopback host:port (default: {api.DEFAULT_ADDRESS})",
+    )
+    api_parser.add_argument(
+        "--pool-size", type=int, default=api.POOL_SIZE, help="read-only connections"
+    )
+    api_parser.set_defaults(func=cmd_serve_api)
+
+    bench_parser = subparsers.add_parser(
+        "bench-submit", help="benchmark order submission at several order sizes"
+    )
+    bench_parser.add_argument(
+        "--items", type=int, nargs="+", default=list(order_bench.DEFAULT_LINE_ITEMS),
+        help="line items per order (default: 1 10 100)",
+    )
+    bench_parser.add_argument(
+        "--orders", type=int, default=order_bench.DEFAULT_ORDERS, help="orders per size"
+    )
+    bench_parser.set_defaults(func=cmd_bench_submit)
+
+    load_parser = subparsers.add_parser(
+        "bench-order-service", help="load test the order service with concurrent clients"
+    )
+    load_parser.add_argument(
+        "--clients", type=int, nargs="+", default=list(order_service_bench.DEFAULT_CLIENTS),
+        help="numbers of concurrent clients to try",
+    )
+    load_parser.add_argument(
+        "--orders", type=int, default=order_service_bench.DEFAULT_ORDERS,
+        help="orders per client count, shared between the clients",
+    )
+    load_parser.add_argument(
+        "--no-direct", action="store_true",
+        help="skip the comparison with clients writing to the database directly",
+    )
+    load_parser.set_defaults(func=cmd_bench_order_service)
+
+    stock_parser = subparsers.add_parser(
+        "bench-stock", help="check stock reservation under many concurrent writers"
+    )
+    stock_parser.add_argument(
+        "--threads", type=int, nargs="+", default=list(stock_bench.DEFAULT_THREADS),
+        help="numbers of writer threads to try",
+    )
+    stock_parser.add_argument(
+        "--products", type=int, default=stock_bench.DEFAULT_PRODUCTS, help="products to sell"
+    )
+    stock_parser.add_argument(
+        "--stock", type=int, default=stock_bench.DEFAULT_STOCK, help="starting stock of each"
+    )
+    stock_parser.set_defaults(func=cmd_bench_stock)
+
+    api_bench_parser = subparsers.add_parser(
+        "bench-api", help="load test the HTTP API with concurrent clients"
+    )
+    api_bench_parser.add_argument(
+        "--clients", type=int, nargs="+", default=list(api_bench.DEFAULT_CLIENTS),
+        help="numbers of concurrent clients to try",
+    )
+    api_bench_parser.add_argument(
+        "--requests", type=int, default=api_bench.DEFAULT_REQUESTS, help="requests per client"
+    )
+    api_bench_parser.add_argument(
+        "--data-orders", type=int, default=api_bench.DATA_ORDERS,
+        help="synthetic orders in the test database",
+    )
+    api_bench_parser.set_defaults(func=cmd_bench_api)
+
+    generate_parser = subparsers.add_parser(
+        "generate-data", help="add seeded synthetic data to a database"
+    )
+    generate_parser.add_argument("--db", help=DB_HELP)
+    generate_parser.add_argument("--orders", type=int, default=10000)
+    generate_parser.add_argument(
+        "--customers", type=int, help="customers to create (default: one per 20 orders)"
+    )
+    generate_parser.add_argument("--days", type=int, default=365, help="days of history")
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.set_defaults(func=cmd_generate_data)
+
+    run_parser = subparsers.add_parser("bench", help="time every database path of the app")
+    run_parser.add_argument("--db", help=DB_HELP)
+    run_parser.add_argument("--repeat", type=int, default=runner.DEFAULT_REPEAT)
+    run_parser.add_argument("--output", help="write the results to this JSON file")
+    run_parser.add_argument(
+        "--no-writes", action="store_true", help="skip benchmarks that add orders"
+    )
+    run_parser.add_argument("--only", nargs="+", metavar="NAME", help="run only these benchmarks")
+    run_parser.add_argument(
+        "--query-stats", metavar="PATH", help="write per-statement query stats to this JSON file"
+    )
+    run_parser.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
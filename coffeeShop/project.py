@@ -1,27 +1,375 @@
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox
-import sqlite3
-from datetime import datetime
+from tkinter import ttk, messagebox, filedialog
 import random
+import threading
+import time
+from contextlib import contextmanager
+
+from coffeeshop.core import (
+    CatalogueCache, CoffeeShop, CustomerRepository, OrderRepository, OutOfStockError, ProductRepository,
+    connection, receipts, report_export
+)
+from coffeeshop.core.instrument import STATS
+from coffeeshop.server import OrderClient
+from db_worker import DatabaseWorker
+
+# How often the UI picks up finished database calls (milliseconds)
+DB_POLL_INTERVAL = 20
+
+# Screens in navigation order: (name, button text, method reloading its
+# data). Each is built once, by build_<name>, on first use.
+SCREENS = [
+    ("dashboard", "Dashboard", "refresh_dashboard"),
+    ("products", "Products", "refresh_products"),
+    ("customers", "Customers", "refresh_customers"),
+    ("orders", "Orders", "refresh_orders"),
+    ("new_order", "New Order", "refresh_new_order"),
+    ("reports", "Reports", "generate_reports"),
+    ("admin", "Admin", "refresh_query_stats"),
+]
+
+# Calls whose results complete the first dashboard, and so the startup
+STARTUP_CALLS = ("dashboard_stats", "recent_orders")
+
+
+class StartupProfile:
+    """Time the phases of starting the app, for --profile-startup
+    
+    Phases are timed from when the profile is created. Those run on the
+    database worker overlap the ones on the Tk thread, so each is listed
+    with the thread it ran on, when it started and how long it took.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def phase(self, name):
+        """Time the body of a with statement as a phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start)
+    
+    def add(self, name, start, end=None):
+        """Record a phase that ran from start until end (default now), both perf_counter()"""
+        end = time.perf_counter() if end is None else end
+        with self.lock:
+            self.phases.append((name, threading.current_thread().name, start, end))
+    
+    def mark(self, name):
+        """Record a phase ending now that started with the previous one on this thread"""
+        thread = threading.current_thread().name
+        with self.lock:
+            start = max(
+                (end for _, on, _, end in self.phases if on == thread), default=self.started
+            )
+        self.add(name, start)
+    
+    def timed(self, name, fn):
+        """Return fn wrapped to record each call as a phase"""
+        def call(*args):
+            with self.phase(name):
+                return fn(*args)
+        return call
+    
+    def report(self):
+        """Return the phases as a text table, in the order they started"""
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[2])
+        lines = [f"{'phase':<22}  {'thread':<12}  {'start ms':>8}  {'took ms':>8}"]
+        for name, thread, start, end in phases:
+            lines.append(
+                f"{name:<22}  {thread:<12}  {(start - self.started) * 1000:8.1f}  "
+                f"{(end - start) * 1000:8.1f}"
+            )
+        total = max((end for *_, end in phases), default=self.started)
+        lines.append(f"{'ready':<22}  {'':<12}  {(total - self.started) * 1000:8.1f}")
+        return "\n".join(lines)
+
+
+class PagedTreeview:
+    """Show a bounded window of a KeysetPager's rows in a Treeview
+    
+    The next page is loaded when the view scrolls near the bottom and the
+    previous page near the top. Rows beyond max_rows are dropped from the
+    other end, so the widget never holds more than max_rows items. Pages
+    are fetched on the database worker; a new load supersedes any fetch
+    still in flight.
+    """
+    
+    def __init__(self, tree, db, scrollbar=None, on_error=None, max_rows=500, threshold=0.1):
+        self.tree = tree
+        self.db = db
+        self.scrollbar = scrollbar
+        self.on_error = on_error
+        self.max_rows = max_rows
+        self.threshold = threshold
+        self.pager = None
+        self.rows = []  # raw rows, in the same order as the tree items
+        self.more_before = False
+        self.more_after = False
+        self.loading = False
+        
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        if scrollbar:
+            scrollbar.configure(command=self.tree.yview)
+    
+    def fetch(self, fn, *args, on_done):
+        """Run a fetch for this view on the worker; the newest one wins"""
+        self.loading = True
+        
+        def deliver(rows):
+            self.loading = False
+            if self.tree.winfo_exists():
+                on_done(rows)
+        
+        def fail(error):
+            self.loading = False
+            if self.on_error:
+                self.on_error(error)
+        
+        # Keyed on the view, so a new load cancels pages still in flight
+        self.db.call(fn, *args, key=self, on_done=deliver, on_error=fail)
+    
+    def load(self, pager):
+        """Show the first page of a pager"""
+        self.pager = pager
+        self.fetch(lambda shop: pager.first_page(shop.conn), on_done=self.show_first_page)
+    
+    def load_rows(self, fn, *args):
+        """Show the rows returned by fn(shop, *args), without paging"""
+        self.pager = None
+        self.fetch(fn, *args, on_done=self.show_rows)
+    
+    def show_first_page(self, rows):
+        """Replace the tree contents with the first page"""
+        self.show_rows(rows)
+        self.more_after = len(rows) == self.pager.page_size
+    
+    def show_rows(self, rows):
+        """Replace the tree contents with a fixed list of rows"""
+        self.tree.delete(*self.tree.get_children())
+        self.rows = list(rows)
+        self.more_before = False
+        self.more_after = False
+        
+        for row in self.rows:
+            self.tree.insert("", tk.END, values=row)
+        
+        self.tree.yview_moveto(0)
+    
+    def row(self, item):
+        """Return the raw row behind a tree item"""
+        return self.rows[self.tree.index(item)]
+    
+    def replace_row(self, item, row):
+        """Replace the row behind a tree item, e.g. after an update"""
+        self.rows[self.tree.index(item)] = row
+        self.tree.item(item, values=row)
+    
+    def remove_row(self, item):
+        """Remove a tree item and its row"""
+        del self.rows[self.tree.index(item)]
+        self.tree.delete(item)
+    
+    def on_scroll(self, first, last):
+        """Track the visible range and fetch a page when near either end"""
+        if self.scrollbar:
+            self.scrollbar.set(first, last)
+        
+        if self.loading or not self.rows:
+            return
+        
+        pager = self.pager
+        if float(last) >= 1 - self.threshold and self.more_after:
+            row = self.rows[-1]
+            self.fetch(lambda shop: pager.page_after(shop.conn, row), on_done=self.append_page)
+        elif float(first) <= self.threshold and self.more_before:
+            row = self.rows[0]
+            self.fetch(lambda shop: pager.page_before(shop.conn, row), on_done=self.prepend_page)
+    
+    def append_page(self, rows):
+        """Append the page after the last row, trimming rows from the top"""
+        self.more_after = len(rows) == self.pager.page_size
+        
+        for row in rows:
+            self.tree.insert("", tk.END, values=row)
+        self.rows.extend(rows)
+        
+        excess = len(self.rows) - self.max_rows
+        if excess > 0:
+            self.tree.delete(*self.tree.get_children()[:excess])
+            del self.rows[:excess]
+            self.more_before = True
+            # Keep the same rows on screen after the ones above went away
+            self.tree.yview_scroll(-excess, "units")
+    
+    def prepend_page(self, rows):
+        """Prepend the page before the first row, trimming rows from the bottom"""
+        self.more_before = len(rows) == self.pager.page_size
+        
+        for index, row in enumerate(rows):
+            self.tree.insert("", index, values=row)
+        self.rows[0:0] = rows
+        self.tree.yview_scroll(len(rows), "units")
+        
+        excess = len(self.rows) - self.max_rows
+        if excess > 0:
+            self.tree.delete(*self.tree.get_children()[-excess:])
+            del self.rows[-excess:]
+            self.more_after = True
+
+
+class CustomerPicker:
+    """Typeahead customer selection on a ttk.Combobox
+    
+    Each keystroke (after a short pause) runs a prefix search on the
+    database worker and offers the best matches in the dropdown. The
+    chosen customer's id is kept with the selection, so it never has to
+    be parsed back out of the displayed text. Editing the text after a
+    choice clears it.
+    """
+    
+    def __init__(self, combobox, db, on_error=None, delay=150):
+        self.combobox = combobox
+        self.db = db
+        self.on_error = on_error
+        self.delay = delay
+        self.matches = []
+        self.selected = None  # (id, name) of the chosen customer
+        self.searched = ""
+        self.pending = None
+        
+        combobox.bind("<KeyRelease>", self.on_key)
+        combobox.bind("<<ComboboxSelected>>", self.on_select)
+    
+    @staticmethod
+    def label(customer):
+        """Return the dropdown text of an (id, name, phone) row"""
+        customer_id, name, phone = customer
+        return f"{name} ({phone})" if phone else name
+    
+    def on_key(self, event):
+        """Search again once typing pauses, if the text changed"""
+        text = self.combobox.get().strip()
+        if text == self.searched:
+            return
+        self.searched = text
+        self.selected = None
+        
+        self.cancel_search()
+        self.pending = self.combobox.after(self.delay, self.search, text)
+    
+    def search(self, text):
+        """Fetch the customers matching text; the newest search wins"""
+        self.pending = None
+        if not text:
+            self.show_matches([])
+            return
+        
+        def deliver(matches):
+            if self.combobox.winfo_exists():
+                self.show_matches(matches)
+        
+        self.db.call(
+            lambda shop: shop.customers.prefix_search(text), 
+            key=self, 
+            on_done=deliver, 
+            on_error=self.on_error
+        )
+    
+    def show_matches(self, matches):
+        """Offer the matches in the dropdown"""
+        self.matches = matches
+        self.combobox["values"] = [self.label(customer) for customer in matches]
+    
+    def on_select(self, event):
+        """Remember the customer chosen from the dropdown"""
+        index = self.combobox.current()
+        if 0 <= index < len(self.matches):
+            customer_id, name, _ = self.matches[index]
+            self.selected = (customer_id, name)
+            self.searched = self.combobox.get().strip()
+    
+    def cancel_search(self):
+        """Drop a search that is waiting for typing to pause"""
+        if self.pending:
+            self.combobox.after_cancel(self.pending)
+            self.pending = None
+    
+    def select(self, customer_id, name, phone=None):
+        """Choose a customer directly, e.g. one that was just added"""
+        self.cancel_search()
+        self.show_matches([(customer_id, name, phone)])
+        self.combobox.current(0)
+        self.on_select(None)
+    
+    def clear(self):
+        """Forget the text, the matches and the choice"""
+        self.cancel_search()
+        self.combobox.set("")
+        self.show_matches([])
+        self.selected = None
+        self.searched = ""
+
 
 class CoffeeShopManagementSystem:
-    def __init__(self, root):
+    def __init__(self, root, database=None, order_server=None, cache_views=True, on_navigate=None, 
+                 startup=None, on_started=None):
         self.root = root
         self.root.title("Coffee Shop Management System")
         self.root.geometry("1200x700")
         self.root.resizable(False, False)
         
-        # Database setup
-        self.conn = sqlite3.connect('coffee_shop.db')
-        self.cursor = self.conn.cursor()
+        # Startup draws the window first while the worker opens and checks
+        # the database, then builds the dashboard, whose data arrives
+        # later. on_started, if given, gets the StartupProfile once the
+        # dashboard has been drawn with its data.
+        self.startup = startup or StartupProfile()
+        self.startup_pending = set(STARTUP_CALLS)
+        self.on_started = on_started
+        self.first_view_shown = False
+        
+        # Database setup. All queries run on the worker thread; results
+        # come back through poll_database on the Tk main loop. The product
+        # catalogue is shared with the worker, which keeps it current.
+        database = database or connection.ConnectionFactory()
+        self.catalogue = CatalogueCache()
+        self.database = database
+        self.db = DatabaseWorker(self.startup.timed(
+            "database connect", lambda: CoffeeShop(database.connect(), self.catalogue)
+        ))
+        # Report exports get a worker and read-only connection of their own,
+        # started on first use, so a long export never holds up the screens
+        self.export_db = None
+        self.export_written = None
+        self.export_progress_var = tk.StringVar(master=self.root)
+        # In client mode orders go to the order service, which writes them
+        # for every till; the rest still reads and writes the database
+        self.order_client = OrderClient(order_server) if order_server else None
+        self.screen = object()
+        # Screens built so far, by name. on_navigate, if given, is called
+        # with the screen name, whether it was built and the milliseconds
+        # the switch took; cache_views off rebuilds a screen on every visit.
+        self.views = {}
+        self.cache_views = cache_views
+        self.on_navigate = on_navigate
         self.create_tables()
+        self.root.after(DB_POLL_INTERVAL, self.poll_database)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Style configuration
-        self.style = ttk.Style()
-        self.style.theme_use('clam')
-        self.style.configure('TButton', font=('Helvetica', 10), padding=5)
-        self.style.configure('TLabel', font=('Helvetica', 10))
-        self.style.configure('TEntry', font=('Helvetica', 10))
+        with self.startup.phase("styles"):
+            self.style = ttk.Style()
+            self.style.theme_use('clam')
+            self.style.configure('TButton', font=('Helvetica', 10), padding=5)
+            self.style.configure('TLabel', font=('Helvetica', 10))
+            self.style.configure('TEntry', font=('Helvetica', 10))
         
         # Colors
         self.bg_color = "#F5F5DC"  # Beige background
@@ -51,97 +399,142 @@ class CoffeeShopManagementSystem:
         
         self.create_nav_buttons()
         
-        # Content area
+        # Content area; the screens are stacked in its one grid cell
         self.content_frame = tk.Frame(self.main_frame, bg=self.bg_color)
         self.content_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.content_frame.grid_rowconfigure(0, weight=1)
+        self.content_frame.grid_columnconfigure(0, weight=1)
+        self.startup.mark("window")
         
-        # Show dashboard by default
-        self.show_dashboard()
+        # Show dashboard by default, once the window is on screen
+        self.root.bind("<Map>", self.on_window_mapped)
     
     def create_tables(self):
-        """Create database tables if they don't exist"""
-        # Products table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                category TEXT NOT NULL,
-                price REAL NOT NULL,
-                cost REAL NOT NULL,
-                stock INTEGER NOT NULL
-            )
-        ''')
-        
-        # Customers table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT,
-                email TEXT,
-                points INTEGER DEFAULT 0
-            )
-        ''')
-        
-        # Orders table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER,
-                order_date TEXT NOT NULL,
-                total_amount REAL NOT NULL,
-                status TEXT DEFAULT 'Pending',
-                FOREIGN KEY (customer_id) REFERENCES customers(id)
-            )
-        ''')
-        
-        # Order items table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL,
-                price REAL NOT NULL,
-                FOREIGN KEY (order_id) REFERENCES orders(id),
-                FOREIGN KEY (product_id) REFERENCES products(id)
-            )
-        ''')
-        
-        self.conn.commit()
+        """Create or upgrade database tables to the current schema version"""
+        # Queued first, so it runs before any query the screens submit.
+        # A database already at the current version is not touched.
+        self.run_db(self.startup.timed("schema check", CoffeeShop.migrate), screen_bound=False)
+    
+    def on_window_mapped(self, event):
+        """Build the first screen once the main window has been mapped"""
+        if event.widget is self.root and not self.first_view_shown:
+            self.first_view_shown = True
+            self.root.after_idle(self.show_first_view)
+    
+    def show_first_view(self):
+        """Draw the window, then build and show the dashboard"""
+        self.root.update_idletasks()
+        self.startup.mark("window shown")
+        with self.startup.phase("dashboard built"):
+            self.show_view("dashboard")
+    
+    def on_startup_call(self, key):
+        """Note the result of one of the first dashboard's calls; report startup after the last"""
+        if key not in self.startup_pending:
+            return
+        self.startup_pending.discard(key)
+        self.startup.mark(f"show {key}")
+        if not self.startup_pending:
+            self.root.update_idletasks()
+            self.startup.mark("dashboard drawn")
+            if self.on_started:
+                self.on_started(self.startup)
+    
+    def run_db(self, fn, *args, on_done=None, on_error=None, key=None, screen_bound=True):
+        """Run fn(shop, *args) on the database worker, shop being a CoffeeShop
+        
+        on_done gets the result on the Tk main thread, and on_error (by
+        default show_db_error) the exception if fn raises. Calls made with the
+        same key supersede each other. Results of screen-bound calls are
+        dropped if the user has moved to another screen in the meantime.
+        """
+        screen = self.screen
+        startup = key in self.startup_pending
+        if startup:
+            fn = self.startup.timed(f"query {key}", fn)
+        
+        def deliver(result):
+            if not screen_bound or screen is self.screen:
+                if on_done:
+                    on_done(result)
+            if startup:
+                self.on_startup_call(key)
+        
+        return self.db.call(
+            fn, *args, key=key, on_done=deliver, on_error=on_error or self.show_db_error
+        )
+    
+    def poll_database(self):
+        """Deliver finished database calls, then check again shortly"""
+        self.db.dispatch()
+        if self.export_db is not None:
+            self.export_db.dispatch()
+            if self.export_written is not None:
+                self.export_progress_var.set(f"Exporting... {self.export_written} rows")
+        self.root.after(DB_POLL_INTERVAL, self.poll_database)
+    
+    def show_db_error(self, error):
+        """Report a failed database call"""
+        messagebox.showerror("Database Error", str(error))
+    
+    def on_close(self):
+        """Let queued database work finish before the window closes"""
+        self.db.close(timeout=5)
+        if self.export_db is not None:
+            self.export_db.close(timeout=5)
+        if self.order_client:
+            self.order_client.close()
+        self.root.destroy()
     
     def create_nav_buttons(self):
         """Create navigation buttons"""
-        buttons = [
-            ("Dashboard", self.show_dashboard),
-            ("Products", self.show_products),
-            ("Customers", self.show_customers),
-            ("Orders", self.show_orders),
-            ("New Order", self.show_new_order),
-            ("Reports", self.show_reports)
-        ]
-        
-        for text, command in buttons:
+        for name, text, _ in SCREENS:
             btn = ttk.Button(
                 self.nav_frame, 
                 text=text, 
-                command=command,
+                command=lambda name=name: self.show_view(name),
                 style='TButton'
             )
             btn.pack(side=tk.LEFT, padx=5)
     
-    def clear_content_frame(self):
-        """Clear the content frame"""
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+    def show_view(self, name):
+        """Show a screen, building it on first use, and reload its data
+        
+        A screen built before is only raised, with its widgets and what was
+        typed into them as they were left.
+        """
+        started = time.perf_counter()
+        
+        # Results still in flight for the old screen are no longer wanted
+        self.screen = object()
+        
+        if not self.cache_views:
+            for view in self.views.values():
+                view.destroy()
+            self.views.clear()
+        
+        view = self.views.get(name)
+        built = view is None
+        if built:
+            view = tk.Frame(self.content_frame, bg=self.bg_color)
+            view.grid(row=0, column=0, sticky="nsew")
+            getattr(self, f"build_{name}")(view)
+            self.views[name] = view
+        view.tkraise()
+        
+        refresh = next(method for screen, _, method in SCREENS if screen == name)
+        getattr(self, refresh)()
+        
+        if self.on_navigate:
+            # Time the layout and drawing of the screen too
+            self.root.update_idletasks()
+            self.on_navigate(name, built, (time.perf_counter() - started) * 1000)
     
-    def show_dashboard(self):
-        """Show dashboard content"""
-        self.clear_content_frame()
-        
+    def build_dashboard(self, frame):
+        """Build the dashboard screen into frame"""
         # Dashboard title
         title_label = tk.Label(
-            self.content_frame, 
+            frame, 
             text="Dashboard", 
             font=('Helvetica', 16, 'bold'), 
             bg=self.bg_color
@@ -149,34 +542,32 @@ class CoffeeShopManagementSystem:
         title_label.pack(pady=10)
         
         # Stats frame
-        stats_frame = tk.Frame(self.content_frame, bg=self.bg_color)
+        stats_frame = tk.Frame(frame, bg=self.bg_color)
         stats_frame.pack(fill=tk.X, pady=10)
         
-        # Get stats from database
-        total_products = self.cursor.execute("SELECT COUNT(*) FROM products").fetchone()[0]
-        total_customers = self.cursor.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
-        total_orders = self.cursor.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
-        revenue = self.cursor.execute("SELECT SUM(total_amount) FROM orders WHERE status='Completed'").fetchone()[0] or 0
-        
         stats = [
-            ("Total Products", total_products, "#4E3524"),
-            ("Total Customers", total_customers, "#6F4E37"),
-            ("Total Orders", total_orders, "#8B6B4D"),
-            ("Total Revenue", f"${revenue:.2f}", "#A38B6D")
+            ("Total Products", "#4E3524"),
+            ("Total Customers", "#6F4E37"),
+            ("Total Orders", "#8B6B4D"),
+            ("Total Revenue", "#A38B6D")
         ]
         
-        for i, (text, value, color) in enumerate(stats):
+        # Values are filled in when the stats query returns
+        self.stat_labels = []
+        
+        for i, (text, color) in enumerate(stats):
             stat_frame = tk.Frame(stats_frame, bg=color, bd=1, relief=tk.RAISED)
             stat_frame.grid(row=0, column=i, padx=10, ipadx=20, ipady=20)
             
             value_label = tk.Label(
                 stat_frame, 
-                text=value, 
+                text="...", 
                 font=('Helvetica', 18, 'bold'), 
                 bg=color, 
                 fg='white'
             )
             value_label.pack()
+            self.stat_labels.append(value_label)
             
             text_label = tk.Label(
                 stat_frame, 
@@ -188,7 +579,7 @@ class CoffeeShopManagementSystem:
             text_label.pack()
         
         # Recent orders frame
-        recent_orders_frame = tk.Frame(self.content_frame, bg=self.bg_color)
+        recent_orders_frame = tk.Frame(frame, bg=self.bg_color)
         recent_orders_frame.pack(fill=tk.BOTH, expand=True, pady=20)
         
         recent_label = tk.Label(
@@ -213,34 +604,47 @@ class CoffeeShopManagementSystem:
             self.recent_orders_tree.column(col, width=120, anchor=tk.CENTER)
         
         self.recent_orders_tree.pack(fill=tk.BOTH, expand=True)
+    
+    def refresh_dashboard(self):
+        """Reload the dashboard stats and recent orders"""
+        # Get stats from the trigger-maintained summary row
+        self.run_db(
+            lambda shop: shop.reports.dashboard_stats(), 
+            on_done=self.show_dashboard_stats, 
+            key="dashboard_stats"
+        )
         
         # Populate recent orders
         self.populate_recent_orders()
     
+    def show_dashboard_stats(self, stats):
+        """Fill in the dashboard stat values"""
+        total_products, total_customers, total_orders, revenue = stats
+        values = [total_products, total_customers, total_orders, f"${revenue:.2f}"]
+        
+        for label, value in zip(self.stat_labels, values):
+            label.config(text=value)
+    
     def populate_recent_orders(self):
         """Populate recent orders in the dashboard"""
+        self.run_db(
+            lambda shop: shop.orders.recent(), 
+            on_done=self.show_recent_orders, 
+            key="recent_orders"
+        )
+    
+    def show_recent_orders(self, orders):
+        """Show recent orders in the dashboard treeview"""
         self.recent_orders_tree.delete(*self.recent_orders_tree.get_children())
         
-        query = '''
-            SELECT o.id, c.name, o.order_date, o.total_amount, o.status 
-            FROM orders o
-            LEFT JOIN customers c ON o.customer_id = c.id
-            ORDER BY o.order_date DESC
-            LIMIT 10
-        '''
-        
-        orders = self.cursor.execute(query).fetchall()
-        
         for order in orders:
             self.recent_orders_tree.insert("", tk.END, values=order)
     
-    def show_products(self):
-        """Show products management content"""
-        self.clear_content_frame()
-        
+    def build_products(self, frame):
+        """Build the products screen into frame"""
         # Products title
         title_label = tk.Label(
-            self.content_frame, 
+            frame, 
             text="Product Management", 
             font=('Helvetica', 16, 'bold'), 
             bg=self.bg_color
@@ -248,7 +652,7 @@ class CoffeeShopManagementSystem:
         title_label.pack(pady=10)
         
         # Product management frame
-        mgmt_frame = tk.Frame(self.content_frame, bg=self.bg_color)
+        mgmt_frame = tk.Frame(frame, bg=self.bg_color)
         mgmt_frame.pack(fill=tk.X, pady=10)
         
         # Add product form
@@ -275,13 +679,13 @@ class CoffeeShopManagementSystem:
         self.product_entries = {}
         
         for text, field in fields:
-            frame = tk.Frame(form_frame, bg=self.bg_color)
-            frame.pack(fill=tk.X, pady=5)
+            field_frame = tk.Frame(form_frame, bg=self.bg_color)
+            field_frame.pack(fill=tk.X, pady=5)
             
-            label = tk.Label(frame, text=text, width=10, anchor=tk.W, bg=self.bg_color)
+            label = tk.Label(field_frame, text=text, width=10, anchor=tk.W, bg=self.bg_color)
             label.pack(side=tk.LEFT)
             
-            entry = ttk.Entry(frame)
+            entry = ttk.Entry(field_frame)
             entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
             
             self.product_entries[field] = entry
@@ -327,20 +731,26 @@ class CoffeeShopManagementSystem:
         search_frame = tk.Frame(list_frame, bg=self.bg_color)
         search_frame.pack(fill=tk.X, pady=5)
         
-        search_entry = ttk.Entry(search_frame)
-        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.products_search_entry = ttk.Entry(search_frame)
+        self.products_search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         
         search_button = ttk.Button(
             search_frame, 
             text="Search", 
-            command=lambda: self.search_products(search_entry.get())
+            command=lambda: self.search_products(self.products_search_entry.get())
         )
         search_button.pack(side=tk.LEFT, padx=5)
         
         # Treeview for products
+        tree_frame = tk.Frame(list_frame, bg=self.bg_color)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
         columns = ("ID", "Name", "Category", "Price", "Cost", "Stock")
         self.products_tree = ttk.Treeview(
-            list_frame, 
+            tree_frame, 
             columns=columns, 
             show="headings", 
             height=15
@@ -350,33 +760,26 @@ class CoffeeShopManagementSystem:
             self.products_tree.heading(col, text=col)
             self.products_tree.column(col, width=100, anchor=tk.CENTER)
         
-        self.products_tree.pack(fill=tk.BOTH, expand=True)
+        self.products_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.products_view = PagedTreeview(
+            self.products_tree, self.db, scrollbar, on_error=self.show_db_error
+        )
         
         # Bind selection event
         self.products_tree.bind("<<TreeviewSelect>>", self.on_product_select)
-        
-        # Populate products
-        self.populate_products()
+    
+    def refresh_products(self):
+        """Reload the product list, keeping the search"""
+        self.populate_products(self.products_search_entry.get())
     
     def populate_products(self, search_term=None):
         """Populate products in the treeview"""
-        self.products_tree.delete(*self.products_tree.get_children())
-        
-        if search_term:
-            query = '''
-                SELECT * FROM products 
-                WHERE name LIKE ? OR category LIKE ?
-                ORDER BY name
-            '''
-            params = (f"%{search_term}%", f"%{search_term}%")
-        else:
-            query = "SELECT * FROM products ORDER BY name"
-            params = ()
-        
-        products = self.cursor.execute(query, params).fetchall()
+        if not search_term:
+            self.products_view.load(ProductRepository.pager())
+            return
         
-        for product in products:
-            self.products_tree.insert("", tk.END, values=product)
+        # Search results are a single ranked page
+        self.products_view.load_rows(lambda shop: shop.products.search(search_term))
     
     def search_products(self, search_term):
         """Search products by name or category"""
@@ -417,16 +820,10 @@ class CoffeeShopManagementSystem:
                 messagebox.showerror("Error", "Name and category are required!")
                 return
             
-            query = '''
-                INSERT INTO products (name, category, price, cost, stock)
-                VALUES (?, ?, ?, ?, ?)
-            '''
-            self.cursor.execute(query, (name, category, price, cost, stock))
-            self.conn.commit()
-            
-            messagebox.showinfo("Success", "Product added successfully!")
-            self.clear_product_form()
-            self.populate_products()
+            self.run_db(
+                lambda shop: shop.catalogue.add_product(name, category, price, cost, stock), 
+                on_done=self.on_product_added
+            )
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numeric values for price, cost and stock!")
     
@@ -437,7 +834,7 @@ class CoffeeShopManagementSystem:
             messagebox.showerror("Error", "Please select a product to update!")
             return
         
-        product_id = self.products_tree.item(selected, "values")[0]
+        product_id = int(self.products_tree.item(selected, "values")[0])
         
         try:
             name = self.product_entries["product_name"].get().strip()
@@ -450,26 +847,31 @@ class CoffeeShopManagementSystem:
                 messagebox.showerror("Error", "Name and category are required!")
                 return
             
-            query = '''
-                UPDATE products 
-                SET name=?, category=?, price=?, cost=?, stock=?
-                WHERE id=?
-            '''
-            self.cursor.execute(query, (name, category, price, cost, stock, product_id))
-            self.conn.commit()
-            
-            messagebox.showinfo("Success", "Product updated successfully!")
-            self.populate_products()
+            self.run_db(
+                lambda shop: shop.catalogue.update_product(
+                    product_id, name, category, price, cost, stock
+                ), 
+                on_done=self.on_product_updated
+            )
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numeric values for price, cost and stock!")
     
-    def show_customers(self):
-        """Show customers management content"""
-        self.clear_content_frame()
-        
+    def on_product_added(self, product_id):
+        """Refresh the product list after a product was added"""
+        messagebox.showinfo("Success", "Product added successfully!")
+        self.clear_product_form()
+        self.populate_products()
+    
+    def on_product_updated(self, _):
+        """Refresh the product list after a product was updated"""
+        messagebox.showinfo("Success", "Product updated successfully!")
+        self.populate_products()
+    
+    def build_customers(self, frame):
+        """Build the customers screen into frame"""
         # Customers title
         title_label = tk.Label(
-            self.content_frame, 
+            frame, 
             text="Customer Management", 
             font=('Helvetica', 16, 'bold'), 
             bg=self.bg_color
@@ -477,7 +879,7 @@ class CoffeeShopManagementSystem:
         title_label.pack(pady=10)
         
         # Customer management frame
-        mgmt_frame = tk.Frame(self.content_frame, bg=self.bg_color)
+        mgmt_frame = tk.Frame(frame, bg=self.bg_color)
         mgmt_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
         # Add customer form
@@ -503,13 +905,13 @@ class CoffeeShopManagementSystem:
         self.customer_entries = {}
         
         for text, field in fields:
-            frame = tk.Frame(form_frame, bg=self.bg_color)
-            frame.pack(fill=tk.X, pady=5)
+            field_frame = tk.Frame(form_frame, bg=self.bg_color)
+            field_frame.pack(fill=tk.X, pady=5)
             
-            label = tk.Label(frame, text=text, width=10, anchor=tk.W, bg=self.bg_color)
+            label = tk.Label(field_frame, text=text, width=10, anchor=tk.W, bg=self.bg_color)
             label.pack(side=tk.LEFT)
             
-            entry = ttk.Entry(frame)
+            entry = ttk.Entry(field_frame)
             entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
             
             self.customer_entries[field] = entry
@@ -555,20 +957,26 @@ class CoffeeShopManagementSystem:
         search_frame = tk.Frame(list_frame, bg=self.bg_color)
         search_frame.pack(fill=tk.X, pady=5)
         
-        search_entry = ttk.Entry(search_frame)
-        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.customers_search_entry = ttk.Entry(search_frame)
+        self.customers_search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         
         search_button = ttk.Button(
             search_frame, 
             text="Search", 
-            command=lambda: self.search_customers(search_entry.get())
+            command=lambda: self.search_customers(self.customers_search_entry.get())
         )
         search_button.pack(side=tk.LEFT, padx=5)
         
         # Treeview for customers
+        tree_frame = tk.Frame(list_frame, bg=self.bg_color)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
         columns = ("ID", "Name", "Phone", "Email", "Points")
         self.customers_tree = ttk.Treeview(
-            list_frame, 
+            tree_frame, 
             columns=columns, 
             show="headings", 
             height=15
@@ -578,33 +986,26 @@ class CoffeeShopManagementSystem:
             self.customers_tree.heading(col, text=col)
             self.customers_tree.column(col, width=120, anchor=tk.CENTER)
         
-        self.customers_tree.pack(fill=tk.BOTH, expand=True)
+        self.customers_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.customers_view = PagedTreeview(
+            self.customers_tree, self.db, scrollbar, on_error=self.show_db_error
+        )
         
         # Bind selection event
         self.customers_tree.bind("<<TreeviewSelect>>", self.on_customer_select)
-        
-        # Populate customers
-        self.populate_customers()
+    
+    def refresh_customers(self):
+        """Reload the customer list, keeping the search"""
+        self.populate_customers(self.customers_search_entry.get())
     
     def populate_customers(self, search_term=None):
         """Populate customers in the treeview"""
-        self.customers_tree.delete(*self.customers_tree.get_children())
-        
-        if search_term:
-            query = '''
-                SELECT * FROM customers 
-                WHERE name LIKE ? OR phone LIKE ? OR email LIKE ?
-                ORDER BY name
-            '''
-            params = (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%")
-        else:
-            query = "SELECT * FROM customers ORDER BY name"
-            params = ()
-        
-        customers = self.cursor.execute(query, params).fetchall()
+        if not search_term:
+            self.customers_view.load(CustomerRepository.pager())
+            return
         
-        for customer in customers:
-            self.customers_tree.insert("", tk.END, values=customer)
+        # Search results are a single ranked page
+        self.customers_view.load_rows(lambda shop: shop.customers.search(search_term))
     
     def search_customers(self, search_term):
         """Search customers by name, phone or email"""
@@ -643,16 +1044,10 @@ class CoffeeShopManagementSystem:
                 messagebox.showerror("Error", "Name is required!")
                 return
             
-            query = '''
-                INSERT INTO customers (name, phone, email, points)
-                VALUES (?, ?, ?, ?)
-            '''
-            self.cursor.execute(query, (name, phone, email, points))
-            self.conn.commit()
-            
-            messagebox.showinfo("Success", "Customer added successfully!")
-            self.clear_customer_form()
-            self.populate_customers()
+            self.run_db(
+                lambda shop: shop.catalogue.add_customer(name, phone, email, points), 
+                on_done=self.on_customer_added
+            )
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numeric value for points!")
     
@@ -675,26 +1070,31 @@ class CoffeeShopManagementSystem:
                 messagebox.showerror("Error", "Name is required!")
                 return
             
-            query = '''
-                UPDATE customers 
-                SET name=?, phone=?, email=?, points=?
-                WHERE id=?
-            '''
-            self.cursor.execute(query, (name, phone, email, points, customer_id))
-            self.conn.commit()
-            
-            messagebox.showinfo("Success", "Customer updated successfully!")
-            self.populate_customers()
+            self.run_db(
+                lambda shop: shop.catalogue.update_customer(
+                    customer_id, name, phone, email, points
+                ), 
+                on_done=self.on_customer_updated
+            )
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numeric value for points!")
     
-    def show_orders(self):
-        """Show orders management content"""
-        self.clear_content_frame()
-        
+    def on_customer_added(self, customer_id):
+        """Refresh the customer list after a customer was added"""
+        messagebox.showinfo("Success", "Customer added successfully!")
+        self.clear_customer_form()
+        self.populate_customers()
+    
+    def on_customer_updated(self, _):
+        """Refresh the customer list after a customer was updated"""
+        messagebox.showinfo("Success", "Customer updated successfully!")
+        self.populate_customers()
+    
+    def build_orders(self, frame):
+        """Build the orders screen into frame"""
         # Orders title
         title_label = tk.Label(
-            self.content_frame, 
+            frame, 
             text="Order Management", 
             font=('Helvetica', 16, 'bold'), 
             bg=self.bg_color
@@ -702,20 +1102,20 @@ class CoffeeShopManagementSystem:
         title_label.pack(pady=10)
         
         # Orders frame
-        orders_frame = tk.Frame(self.content_frame, bg=self.bg_color)
+        orders_frame = tk.Frame(frame, bg=self.bg_color)
         orders_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
         # Search frame
         search_frame = tk.Frame(orders_frame, bg=self.bg_color)
         search_frame.pack(fill=tk.X, pady=5)
         
-        search_entry = ttk.Entry(search_frame)
-        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.orders_search_entry = ttk.Entry(search_frame)
+        self.orders_search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         
         search_button = ttk.Button(
             search_frame, 
             text="Search", 
-            command=lambda: self.search_orders(search_entry.get())
+            command=lambda: self.search_orders(self.orders_search_entry.get())
         )
         search_button.pack(side=tk.LEFT, padx=5)
         
@@ -740,9 +1140,15 @@ class CoffeeShopManagementSystem:
             rb.pack(side=tk.LEFT, padx=5)
         
         # Treeview for orders
+        tree_frame = tk.Frame(orders_frame, bg=self.bg_color)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
         columns = ("ID", "Customer", "Date", "Amount", "Status")
         self.orders_tree = ttk.Treeview(
-            orders_frame, 
+            tree_frame, 
             columns=columns, 
             show="headings", 
             height=15
@@ -752,7 +1158,10 @@ class CoffeeShopManagementSystem:
             self.orders_tree.heading(col, text=col)
             self.orders_tree.column(col, width=120, anchor=tk.CENTER)
         
-        self.orders_tree.pack(fill=tk.BOTH, expand=True)
+        self.orders_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.orders_view = PagedTreeview(
+            self.orders_tree, self.db, scrollbar, on_error=self.show_db_error
+        )
         
         # Buttons frame
         buttons_frame = tk.Frame(orders_frame, bg=self.bg_color)
@@ -778,59 +1187,32 @@ class CoffeeShopManagementSystem:
             command=lambda: self.update_order_status("Cancelled")
         )
         cancel_button.pack(side=tk.LEFT, padx=5)
-        
-        # Populate orders
-        self.filter_orders()
+    
+    def refresh_orders(self):
+        """Reload the order list, keeping the search or status filter"""
+        self.search_orders(self.orders_search_entry.get())
     
     def filter_orders(self):
         """Filter orders by status"""
         status = self.status_var.get()
         
-        if status == "All":
-            query = '''
-                SELECT o.id, c.name, o.order_date, o.total_amount, o.status 
-                FROM orders o
-                LEFT JOIN customers c ON o.customer_id = c.id
-                ORDER BY o.order_date DESC
-            '''
-            params = ()
-        else:
-            query = '''
-                SELECT o.id, c.name, o.order_date, o.total_amount, o.status 
-                FROM orders o
-                LEFT JOIN customers c ON o.customer_id = c.id
-                WHERE o.status = ?
-                ORDER BY o.order_date DESC
-            '''
-            params = (status,)
+        # Status the listed orders are filtered on, None for all statuses
+        self.orders_status_filter = None if status == "All" else status
         
-        self.populate_orders(query, params)
+        self.populate_orders(OrderRepository.pager(status=self.orders_status_filter))
     
     def search_orders(self, search_term):
-        """Search orders by customer name or order ID"""
+        """Search orders by customer name, phone, email or order ID"""
         if not search_term:
             self.filter_orders()
             return
         
-        query = '''
-            SELECT o.id, c.name, o.order_date, o.total_amount, o.status 
-            FROM orders o
-            LEFT JOIN customers c ON o.customer_id = c.id
-            WHERE c.name LIKE ? OR o.id = ?
-            ORDER BY o.order_date DESC
-        '''
-        params = (f"%{search_term}%", search_term)
-        
-        self.populate_orders(query, params)
+        self.orders_status_filter = None
+        self.populate_orders(OrderRepository.pager(search_term=search_term))
     
-    def populate_orders(self, query, params):
-        """Populate orders in the treeview"""
-        self.orders_tree.delete(*self.orders_tree.get_children())
-        
-        orders = self.cursor.execute(query, params).fetchall()
-        
-        for order in orders:
-            self.orders_tree.insert("", tk.END, values=order)
+    def populate_orders(self, pager):
+        """Populate orders in the treeview, a page at a time"""
+        self.orders_view.load(pager)
     
     def view_order_details(self):
         """View details of selected order"""
@@ -841,23 +1223,21 @@ class CoffeeShopManagementSystem:
         
         order_id = self.orders_tree.item(selected, "values")[0]
         
-        # Get order details
-        order_query = '''
-            SELECT o.id, c.name, o.order_date, o.total_amount, o.status 
-            FROM orders o
-            LEFT JOIN customers c ON o.customer_id = c.id
-            WHERE o.id = ?
-        '''
-        order = self.cursor.execute(order_query, (order_id,)).fetchone()
-        
-        # Get order items
-        items_query = '''
-            SELECT p.name, oi.quantity, oi.price, (oi.quantity * oi.price) as total
-            FROM order_items oi
-            JOIN products p ON oi.product_id = p.id
-            WHERE oi.order_id = ?
-        '''
-        items = self.cursor.execute(items_query, (order_id,)).fetchall()
+        self.run_db(
+            lambda shop: shop.order_service.details(order_id), 
+            on_done=self.show_order_details, 
+            key="order_details", 
+            screen_bound=False
+        )
+    
+    def show_order_details(self, details):
+        """Show an order and its items in a new window"""
+        order, items = details
+        if order is None:
+            # Deleted or archived since the list was loaded
+            messagebox.showerror("Error", "That order no longer exists!")
+            return
+        order_id = order[0]
         
         # Create details window
         details_window = tk.Toplevel(self.root)
@@ -931,20 +1311,28 @@ class CoffeeShopManagementSystem:
         
         order_id = self.orders_tree.item(selected, "values")[0]
         
-        query = "UPDATE orders SET status = ? WHERE id = ?"
-        self.cursor.execute(query, (status, order_id))
-        self.conn.commit()
+        self.run_db(
+            lambda shop: shop.order_service.set_status(order_id, status), 
+            on_done=lambda _: self.on_order_status_updated(selected, status)
+        )
+    
+    def on_order_status_updated(self, selected, status):
+        """Show the new status in the order list"""
+        # Update the row in place so the list keeps its scroll position
+        if self.orders_tree.exists(selected):
+            if self.orders_status_filter in (None, status):
+                order = self.orders_view.row(selected)
+                self.orders_view.replace_row(selected, order[:4] + (status,) + order[5:])
+            else:
+                self.orders_view.remove_row(selected)
         
         messagebox.showinfo("Success", f"Order status updated to {status}!")
-        self.filter_orders()
     
-    def show_new_order(self):
-        """Show new order form"""
-        self.clear_content_frame()
-        
+    def build_new_order(self, frame):
+        """Build the new order screen into frame"""
         # New order title
         title_label = tk.Label(
-            self.content_frame, 
+            frame, 
             text="New Order", 
             font=('Helvetica', 16, 'bold'), 
             bg=self.bg_color
@@ -952,7 +1340,7 @@ class CoffeeShopManagementSystem:
         title_label.pack(pady=10)
         
         # Main order frame
-        order_frame = tk.Frame(self.content_frame, bg=self.bg_color)
+        order_frame = tk.Frame(frame, bg=self.bg_color)
         order_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
         # Customer selection frame
@@ -966,18 +1354,12 @@ class CoffeeShopManagementSystem:
             bg=self.bg_color
         ).pack(side=tk.LEFT, padx=5)
         
-        # Customer combobox
-        self.customer_var = tk.StringVar()
-        customers = self.cursor.execute("SELECT id, name FROM customers ORDER BY name").fetchall()
-        customer_options = [f"{id} - {name}" for id, name in customers]
-        
-        self.customer_combobox = ttk.Combobox(
-            customer_frame, 
-            textvariable=self.customer_var, 
-            values=customer_options,
-            state="readonly"
-        )
+        # Customer picker: type a name or phone number, pick a match
+        self.customer_combobox = ttk.Combobox(customer_frame)
         self.customer_combobox.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.customer_picker = CustomerPicker(
+            self.customer_combobox, self.db, on_error=self.show_db_error
+        )
         
         # New customer button
         new_customer_button = ttk.Button(
@@ -1003,21 +1385,18 @@ class CoffeeShopManagementSystem:
         ).pack(pady=5)
         
         # Category filter
-        categories = self.cursor.execute("SELECT DISTINCT category FROM products ORDER BY category").fetchall()
-        categories = [cat[0] for cat in categories]
-        
         self.category_var = tk.StringVar(value="All")
         category_label = tk.Label(left_frame, text="Filter by Category:", bg=self.bg_color)
         category_label.pack(anchor=tk.W)
         
-        category_menu = ttk.OptionMenu(
+        self.category_menu = ttk.OptionMenu(
             left_frame, 
             self.category_var, 
             "All", 
-            *["All"] + categories,
+            "All",
             command=self.filter_products_for_order
         )
-        category_menu.pack(fill=tk.X, pady=5)
+        self.category_menu.pack(fill=tk.X, pady=5)
         
         # Products listbox
         self.products_listbox = tk.Listbox(
@@ -1118,28 +1497,42 @@ class CoffeeShopManagementSystem:
         
         # Initialize order items list
         self.order_items = []
-        
-        # Populate products list
+    
+    def refresh_new_order(self):
+        """Reload the categories and products; an order being entered is kept"""
+        # From the catalogue cache once it is loaded
+        if self.catalogue.fresh:
+            self.show_order_catalogue()
+        else:
+            self.run_db(
+                lambda shop: shop.catalogue.product_catalogue(), 
+                on_done=lambda _: self.show_order_catalogue()
+            )
+    
+    def show_order_catalogue(self):
+        """Fill the category filter and product list from the catalogue cache"""
+        self.show_order_categories(self.catalogue.categories())
         self.filter_products_for_order()
     
+    def show_order_categories(self, categories):
+        """Fill the category filter of the new order screen"""
+        self.category_menu.set_menu(self.category_var.get(), "All", *categories)
+    
     def filter_products_for_order(self, *args):
         """Filter products by category for order"""
         category = self.category_var.get()
-        
         if category == "All":
-            query = "SELECT id, name, price FROM products WHERE stock > 0 ORDER BY name"
-            params = ()
-        else:
-            query = "SELECT id, name, price FROM products WHERE category = ? AND stock > 0 ORDER BY name"
-            params = (category,)
-        
-        products = self.cursor.execute(query, params).fetchall()
+            category = None
         
+        self.show_order_products(self.catalogue.in_stock(category))
+    
+    def show_order_products(self, products):
+        """Show the products that can be added to the order"""
         self.products_listbox.delete(0, tk.END)
         
         for product in products:
             self.products_listbox.insert(tk.END, f"{product[1]} - ${product[2]:.2f}")
-            self.products_listbox.items = products  # Store product data with listbox
+        self.products_listbox.items = products  # Store product data with listbox
     
     def add_product_to_order(self, event=None):
         """Add selected product to order"""
@@ -1255,21 +1648,16 @@ class CoffeeShopManagementSystem:
             messagebox.showerror("Error", "Name is required!")
             return
         
-        query = '''
-            INSERT INTO customers (name, phone, email)
-            VALUES (?, ?, ?)
-        '''
-        self.cursor.execute(query, (name, phone, email))
-        self.conn.commit()
-        
-        # Get the new customer ID
-        customer_id = self.cursor.lastrowid
-        
-        # Update the combobox
-        current_values = list(self.customer_combobox["values"])
-        current_values.append(f"{customer_id} - {name}")
-        self.customer_combobox["values"] = current_values
-        self.customer_combobox.set(f"{customer_id} - {name}")
+        self.run_db(
+            lambda shop: shop.catalogue.add_customer(name, phone, email), 
+            on_done=lambda customer_id: self.on_new_customer_saved(dialog, customer_id, name, phone), 
+            screen_bound=False
+        )
+    
+    def on_new_customer_saved(self, dialog, customer_id, name, phone):
+        """Select the customer that was just added"""
+        if self.customer_combobox.winfo_exists():
+            self.customer_picker.select(customer_id, name, phone)
         
         dialog.destroy()
         messagebox.showinfo("Success", "Customer added successfully!")
@@ -1280,188 +1668,89 @@ class CoffeeShopManagementSystem:
             messagebox.showerror("Error", "Please add items to the order!")
             return
         
-        customer = self.customer_var.get()
-        if not customer:
+        if self.customer_picker.selected:
+            customer_id, customer_name = self.customer_picker.selected
+        elif self.customer_combobox.get().strip():
+            messagebox.showerror("Error", "Please pick the customer from the list!")
+            return
+        else:
             if not messagebox.askyesno("No Customer", "No customer selected. Continue as walk-in customer?"):
                 return
             customer_id = None
-        else:
-            customer_id = int(customer.split(" - ")[0])
-        
-        # Calculate total
-        total = sum(item["price"] * item["quantity"] for item in self.order_items)
-        
-        # Create order
-        order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        query = '''
-            INSERT INTO orders (customer_id, order_date, total_amount, status)
-            VALUES (?, ?, ?, ?)
-        '''
-        self.cursor.execute(query, (customer_id, order_date, total, "Pending"))
-        order_id = self.cursor.lastrowid
-        
-        # Add order items
-        for item in self.order_items:
-            query = '''
-                INSERT INTO order_items (order_id, product_id, quantity, price)
-                VALUES (?, ?, ?, ?)
-            '''
-            self.cursor.execute(query, (order_id, item["id"], item["quantity"], item["price"]))
-            
-            # Update product stock
-            query = "UPDATE products SET stock = stock - ? WHERE id = ?"
-            self.cursor.execute(query, (item["quantity"], item["id"]))
-        
-        # Update customer points if applicable
-        if customer_id:
-            points = int(total)  # 1 point per dollar
-            query = "UPDATE customers SET points = points + ? WHERE id = ?"
-            self.cursor.execute(query, (points, customer_id))
+            customer_name = None
         
-        self.conn.commit()
+        # Create order; the service works out the total and points
+        items = [dict(item) for item in self.order_items]
+        if self.order_client:
+            submit = lambda shop: self.submit_to_order_server(shop, customer_id, items)
+        else:
+            submit = lambda shop: shop.order_service.submit_order(customer_id, items)
+        self.run_db(
+            submit, 
+            on_done=lambda order: self.on_order_submitted(order, items, customer_name), 
+            on_error=self.on_order_refused, 
+            screen_bound=False
+        )
+    
+    def submit_to_order_server(self, shop, customer_id, items):
+        """Submit an order through the order service (runs on the worker)"""
+        order = self.order_client.submit_order(customer_id, items)
+        # The service keeps its own catalogue; ours learns of the sale here
+        shop.catalogue_cache.take_stock((item["id"], item["quantity"]) for item in items)
+        return order
+    
+    def on_order_submitted(self, order, items, customer_name):
+        """Show the receipt and clear the order form"""
+        order_id = order.order_id
         
-        # Generate receipt
-        self.generate_receipt(order_id, customer_id, order_date, total)
+        # The receipt is built from what was just submitted, not read back
+        self.show_receipt(receipts.receipt_for_order(order, items, customer_name))
         
         # Reset order form
         self.order_items = []
         self.update_order_items_tree()
-        self.customer_var.set("")
+        self.customer_picker.clear()
+        self.filter_products_for_order()  # stock went down
         
         messagebox.showinfo("Success", f"Order #{order_id} submitted successfully!")
     
-    def generate_receipt(self, order_id, customer_id, order_date, total):
-        """Generate a receipt for the order"""
+    def on_order_refused(self, error):
+        """Say which lines the stock cannot cover; the order stays on the form"""
+        if not isinstance(error, OutOfStockError):
+            self.show_db_error(error)
+            return
+        
+        lines = [
+            f"{shortfall.name or f'Product #{shortfall.product_id}'}: "
+            f"{shortfall.requested} ordered, {shortfall.available} in stock"
+            for shortfall in error.shortfalls
+        ]
+        messagebox.showerror("Not Enough Stock", "The order was not submitted.\n\n" + "\n".join(lines))
+        
+        # Another till sold them first, so the catalogue was stale
+        self.catalogue.invalidate()
+        self.run_db(
+            lambda shop: shop.catalogue.product_catalogue(), 
+            on_done=lambda _: self.show_order_catalogue()
+        )
+    
+    def show_receipt(self, receipt):
+        """Show a receipt in a new window"""
         receipt_window = tk.Toplevel(self.root)
-        receipt_window.title(f"Receipt - Order #{order_id}")
+        receipt_window.title(f"Receipt - Order #{receipt.order_id}")
         receipt_window.geometry("400x600")
         
-        # Receipt content
+        # Receipt content, rendered as text in one label
         receipt_frame = tk.Frame(receipt_window)
         receipt_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
-        # Header
-        tk.Label(
-            receipt_frame, 
-            text="COFFEE SHOP", 
-            font=('Helvetica', 18, 'bold')
-        ).pack(pady=5)
-        
-        tk.Label(
-            receipt_frame, 
-            text="123 Coffee Street, Java City", 
-            font=('Helvetica', 10)
-        ).pack(pady=2)
-        
-        tk.Label(
-            receipt_frame, 
-            text="Tel: (123) 456-7890", 
-            font=('Helvetica', 10)
-        ).pack(pady=2)
-        
-        # Order info
         tk.Label(
             receipt_frame, 
-            text="-" * 40, 
-            font=('Helvetica', 10)
+            text=receipts.render_text(receipt), 
+            font=('Courier', 10), 
+            justify=tk.LEFT
         ).pack(pady=5)
         
-        tk.Label(
-            receipt_frame, 
-            text=f"Order #: {order_id}", 
-            font=('Helvetica', 10)
-        ).pack(anchor=tk.W, pady=2)
-        
-        tk.Label(
-            receipt_frame, 
-            text=f"Date: {order_date}", 
-            font=('Helvetica', 10)
-        ).pack(anchor=tk.W, pady=2)
-        
-        if customer_id:
-            customer = self.cursor.execute(
-                "SELECT name FROM customers WHERE id = ?", 
-                (customer_id,)
-            ).fetchone()
-            
-            if customer:
-                tk.Label(
-                    receipt_frame, 
-                    text=f"Customer: {customer[0]}", 
-                    font=('Helvetica', 10)
-                ).pack(anchor=tk.W, pady=2)
-        
-        tk.Label(
-            receipt_frame, 
-            text="-" * 40, 
-            font=('Helvetica', 10)
-        ).pack(pady=5)
-        
-        # Order items
-        items = self.cursor.execute('''
-            SELECT p.name, oi.quantity, oi.price 
-            FROM order_items oi
-            JOIN products p ON oi.product_id = p.id
-            WHERE oi.order_id = ?
-        ''', (order_id,)).fetchall()
-        
-        for item in items:
-            item_frame = tk.Frame(receipt_frame)
-            item_frame.pack(fill=tk.X, pady=2)
-            
-            name_label = tk.Label(
-                item_frame, 
-                text=f"{item[0]} x{item[1]}", 
-                font=('Helvetica', 10),
-                anchor=tk.W
-            )
-            name_label.pack(side=tk.LEFT)
-            
-            price_label = tk.Label(
-                item_frame, 
-                text=f"${item[2] * item[1]:.2f}", 
-                font=('Helvetica', 10),
-                anchor=tk.E
-            )
-            price_label.pack(side=tk.RIGHT)
-        
-        tk.Label(
-            receipt_frame, 
-            text="-" * 40, 
-            font=('Helvetica', 10)
-        ).pack(pady=5)
-        
-        # Total
-        total_frame = tk.Frame(receipt_frame)
-        total_frame.pack(fill=tk.X, pady=5)
-        
-        tk.Label(
-            total_frame, 
-            text="TOTAL:", 
-            font=('Helvetica', 12, 'bold'),
-            anchor=tk.W
-        ).pack(side=tk.LEFT)
-        
-        tk.Label(
-            total_frame, 
-            text=f"${total:.2f}", 
-            font=('Helvetica', 12, 'bold'),
-            anchor=tk.E
-        ).pack(side=tk.RIGHT)
-        
-        # Footer
-        tk.Label(
-            receipt_frame, 
-            text="-" * 40, 
-            font=('Helvetica', 10)
-        ).pack(pady=5)
-        
-        tk.Label(
-            receipt_frame, 
-            text="Thank you for your order!", 
-            font=('Helvetica', 10, 'italic')
-        ).pack(pady=10)
-        
         # Print button
         print_button = ttk.Button(
             receipt_frame, 
@@ -1475,13 +1764,11 @@ class CoffeeShopManagementSystem:
         messagebox.showinfo("Print", "Receipt sent to printer!")
         window.destroy()
     
-    def show_reports(self):
-        """Show reports section"""
-        self.clear_content_frame()
-        
+    def build_reports(self, frame):
+        """Build the reports screen into frame"""
         # Reports title
         title_label = tk.Label(
-            self.content_frame, 
+            frame, 
             text="Reports", 
             font=('Helvetica', 16, 'bold'), 
             bg=self.bg_color
@@ -1489,7 +1776,7 @@ class CoffeeShopManagementSystem:
         title_label.pack(pady=10)
         
         # Reports frame
-        reports_frame = tk.Frame(self.content_frame, bg=self.bg_color)
+        reports_frame = tk.Frame(frame, bg=self.bg_color)
         reports_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         
         # Sales report
@@ -1525,13 +1812,55 @@ class CoffeeShopManagementSystem:
         self.to_date_entry = ttk.Entry(date_frame)
         self.to_date_entry.pack(side=tk.LEFT, padx=5)
         
+        self.sales_grouping_var = tk.StringVar(value="Day")
+        
+        for option in ("Day", "Hour"):
+            rb = ttk.Radiobutton(
+                date_frame, 
+                text=f"By {option}", 
+                variable=self.sales_grouping_var, 
+                value=option
+            )
+            rb.pack(side=tk.LEFT, padx=5)
+        
         generate_button = ttk.Button(
             date_frame, 
             text="Generate", 
-            command=self.generate_sales_report
+            command=self.generate_reports
         )
         generate_button.pack(side=tk.LEFT, padx=10)
         
+        # Export of a whole report over the date range, to a file
+        export_frame = tk.Frame(sales_frame, bg=self.bg_color)
+        export_frame.pack(fill=tk.X, pady=5)
+        
+        tk.Label(
+            export_frame, 
+            text="Export:", 
+            bg=self.bg_color
+        ).pack(side=tk.LEFT, padx=5)
+        
+        self.export_report_var = tk.StringVar(value=next(iter(report_export.REPORTS)))
+        ttk.Combobox(
+            export_frame, 
+            textvariable=self.export_report_var, 
+            values=list(report_export.REPORTS), 
+            state="readonly", 
+            width=15
+        ).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(
+            export_frame, 
+            text="Export...", 
+            command=self.export_report
+        ).pack(side=tk.LEFT, padx=5)
+        
+        tk.Label(
+            export_frame, 
+            textvariable=self.export_progress_var, 
+            bg=self.bg_color
+        ).pack(side=tk.LEFT, padx=5)
+        
         # Sales report treeview
         columns = ("Date", "Total Orders", "Total Sales")
         self.sales_report_tree = ttk.Treeview(
@@ -1585,8 +1914,9 @@ class CoffeeShopManagementSystem:
             self.popular_products_tree.column(col, width=100, anchor=tk.CENTER)
         
         self.popular_products_tree.pack(fill=tk.BOTH, expand=True, pady=10)
-        
-        # Generate initial reports
+    
+    def generate_reports(self):
+        """Generate both reports for the selected date range"""
         self.generate_sales_report()
         self.generate_popular_products_report()
     
@@ -1594,74 +1924,237 @@ class CoffeeShopManagementSystem:
         """Generate sales report based on date range"""
         from_date = self.from_date_entry.get()
         to_date = self.to_date_entry.get()
+        hourly = self.sales_grouping_var.get() == "Hour"
         
-        if from_date and to_date:
-            query = '''
-                SELECT 
-                    date(order_date) as day,
-                    COUNT(*) as total_orders,
-                    SUM(total_amount) as total_sales
-                FROM orders
-                WHERE date(order_date) BETWEEN ? AND ?
-                GROUP BY day
-                ORDER BY day
-            '''
-            params = (from_date, to_date)
-        else:
-            query = '''
-                SELECT 
-                    date(order_date) as day,
-                    COUNT(*) as total_orders,
-                    SUM(total_amount) as total_sales
-                FROM orders
-                GROUP BY day
-                ORDER BY day DESC
-                LIMIT 30
-            '''
-            params = ()
-        
-        sales_data = self.cursor.execute(query, params).fetchall()
-        
+        self.run_db(
+            lambda shop: shop.report_service.sales_report(from_date, to_date, hourly), 
+            on_done=self.show_sales_report, 
+            key="sales_report"
+        )
+    
+    def show_sales_report(self, report):
+        """Fill the sales report and its summary"""
         self.sales_report_tree.delete(*self.sales_report_tree.get_children())
         
-        total_sales = 0
-        days = 0
+        for row in report.rows:
+            self.sales_report_tree.insert("", tk.END, values=row)
         
-        for day in sales_data:
-            self.sales_report_tree.insert("", tk.END, values=day)
-            total_sales += day[2]
-            days += 1
-        
-        avg_sales = total_sales / days if days > 0 else 0
+        period = "Hourly" if report.hourly else "Daily"
+        self.sales_report_tree.heading("Date", text="Hour" if report.hourly else "Date")
         self.summary_var.set(
-            f"Total Sales: ${total_sales:.2f} | Average Daily Sales: ${avg_sales:.2f}"
+            f"Total Sales: ${report.total_sales:.2f} | "
+            f"Average {period} Sales: ${report.average_sales:.2f}"
         )
     
     def generate_popular_products_report(self):
-        """Generate popular products report"""
-        query = '''
-            SELECT 
-                p.name,
-                p.category,
-                SUM(oi.quantity) as total_sold,
-                SUM(oi.quantity * oi.price) as total_revenue
-            FROM order_items oi
-            JOIN products p ON oi.product_id = p.id
-            JOIN orders o ON oi.order_id = o.id
-            WHERE o.status = 'Completed'
-            GROUP BY p.id
-            ORDER BY total_sold DESC
-            LIMIT 10
-        '''
-        
-        products = self.cursor.execute(query).fetchall()
+        """Generate popular products report, for the date range if one is set"""
+        from_date = self.from_date_entry.get()
+        to_date = self.to_date_entry.get()
         
+        self.run_db(
+            lambda shop: shop.report_service.popular_products(from_date, to_date), 
+            on_done=self.show_popular_products, 
+            key="popular_products"
+        )
+    
+    def show_popular_products(self, products):
+        """Fill the popular products report"""
         self.popular_products_tree.delete(*self.popular_products_tree.get_children())
         
         for product in products:
             self.popular_products_tree.insert("", tk.END, values=product)
+    
+    def export_report(self):
+        """Write the chosen report over the date range to a CSV or JSON Lines file
+        
+        Without dates the whole history is exported, archived orders included.
+        """
+        if self.export_written is not None:
+            messagebox.showinfo("Export", "An export is already running")
+            return
+        
+        report = self.export_report_var.get()
+        from_date = self.from_date_entry.get() or None
+        to_date = self.to_date_entry.get() or None
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv", 
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl")], 
+            initialfile=f"{report}.csv"
+        )
+        if not path:
+            return
+        
+        if self.export_db is None:
+            self.export_db = DatabaseWorker(
+                lambda: CoffeeShop(self.database.connect("reporting")), name="export-worker"
+            )
+        
+        def progress(written):
+            # Runs on the export worker; poll_database shows it
+            self.export_written = written
+        
+        self.export_written = 0
+        self.export_db.call(
+            lambda shop: report_export.export_report(
+                shop, report, path, from_date, to_date, progress=progress
+            ), 
+            on_done=lambda written: self.on_report_exported(report, path, written), 
+            on_error=self.on_report_export_failed
+        )
+    
+    def on_report_exported(self, report, path, written):
+        """Report a finished export"""
+        self.export_written = None
+        self.export_progress_var.set(f"Exported {written} rows")
+        messagebox.showinfo("Export", f"Exported {written} rows of {report} to {path}")
+    
+    def on_report_export_failed(self, error):
+        """Report a failed export"""
+        self.export_written = None
+        self.export_progress_var.set("")
+        messagebox.showerror("Export Failed", str(error))
+    
+    def build_admin(self, frame):
+        """Build the admin screen into frame"""
+        title_label = tk.Label(
+            frame, 
+            text="Query Statistics", 
+            font=('Helvetica', 16, 'bold'), 
+            bg=self.bg_color
+        )
+        title_label.pack(pady=10)
+        
+        # Buttons
+        button_frame = tk.Frame(frame, bg=self.bg_color)
+        button_frame.pack(fill=tk.X, padx=10)
+        
+        ttk.Button(button_frame, text="Refresh", command=self.refresh_query_stats).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Reset", command=self.reset_query_stats).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Export JSON", command=self.export_query_stats).pack(side=tk.LEFT, padx=5)
+        
+        self.slow_ms_var = tk.StringVar()
+        tk.Label(
+            button_frame, 
+            textvariable=self.slow_ms_var, 
+            bg=self.bg_color
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        # Per-statement stats
+        stats_frame = tk.Frame(frame, bg=self.bg_color, bd=2, relief=tk.GROOVE)
+        stats_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        columns = ("Statement", "Calls", "Rows", "p50 ms", "p95 ms", "p99 ms", "Total ms", "Slow")
+        self.query_stats_tree = ttk.Treeview(
+            stats_frame, 
+            columns=columns, 
+            show="headings", 
+            height=12
+        )
+        
+        for col in columns:
+            self.query_stats_tree.heading(col, text=col)
+            self.query_stats_tree.column(col, width=80, anchor=tk.CENTER)
+        self.query_stats_tree.column("Statement", width=360, anchor=tk.W)
+        
+        scrollbar = ttk.Scrollbar(stats_frame, orient=tk.VERTICAL, command=self.query_stats_tree.yview)
+        self.query_stats_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.query_stats_tree.pack(fill=tk.BOTH, expand=True)
+        
+        # Slow query log, with the plan of each statement
+        slow_frame = tk.Frame(frame, bg=self.bg_color, bd=2, relief=tk.GROOVE)
+        slow_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        tk.Label(
+            slow_frame, 
+            text="Slow Queries", 
+            font=('Helvetica', 12, 'bold'), 
+            bg=self.bg_color
+        ).pack(pady=5)
+        
+        self.slow_queries_text = tk.Text(slow_frame, height=10, wrap=tk.WORD)
+        self.slow_queries_text.pack(fill=tk.BOTH, expand=True)
+    
+    def refresh_query_stats(self):
+        """Fill the admin screen from the collected query stats"""
+        self.slow_ms_var.set(f"Slow query threshold: {STATS.slow_ms:g} ms")
+        self.query_stats_tree.delete(*self.query_stats_tree.get_children())
+        
+        for entry in STATS.snapshot():
+            self.query_stats_tree.insert("", tk.END, values=(
+                entry["name"] or entry["sql"], 
+                entry["count"], 
+                entry["rows"], 
+                f"{entry['p50_ms']:.2f}", 
+                f"{entry['p95_ms']:.2f}", 
+                f"{entry['p99_ms']:.2f}", 
+                f"{entry['total_ms']:.1f}", 
+                entry["slow"]
+            ))
+        
+        self.slow_queries_text.delete("1.0", tk.END)
+        for query in reversed(STATS.slow_queries()):
+            plan = "\n".join(f"    {line}" for line in query["plan"])
+            self.slow_queries_text.insert(
+                tk.END, 
+                f"{query['at']}  {query['ms']:.1f} ms, {query['rows']} rows: "
+                f"{query['name'] or query['sql']}\n{plan}\n\n"
+            )
+    
+    def reset_query_stats(self):
+        """Clear the collected query stats"""
+        STATS.reset()
+        self.refresh_query_stats()
+    
+    def export_query_stats(self):
+        """Save the query stats to a JSON file"""
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json", 
+            filetypes=[("JSON files", "*.json")], 
+            initialfile="query_stats.json"
+        )
+        if path:
+            STATS.dump(path)
+
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = CoffeeShopManagementSystem(root)
+    parser = argparse.ArgumentParser(description="Coffee Shop Management System")
+    parser.add_argument("--db", help="database file (default: from the config file, else coffee_shop.db)")
+    parser.add_argument(
+        "--order-server", metavar="ADDRESS", 
+        help="submit orders through the order service at host:port or unix:PATH (see manage.py serve-orders)"
+    )
+    parser.add_argument(
+        "--time-navigation", action="store_true", 
+        help="print how long each switch between screens takes"
+    )
+    parser.add_argument(
+        "--rebuild-views", action="store_true", 
+        help="rebuild a screen on every visit instead of keeping it, to compare timings"
+    )
+    parser.add_argument(
+        "--profile-startup", action="store_true", 
+        help="print how long each phase of startup takes, until the dashboard shows its data"
+    )
+    connection.add_arguments(parser)
+    args = parser.parse_args()
+    
+    def print_navigation(name, built, ms):
+        print(f"{name}: {ms:.1f} ms ({'built' if built else 'cached'})", flush=True)
+    
+    def print_startup(profile):
+        print(profile.report(), flush=True)
+    
+    startup = StartupProfile()
+    with startup.phase("config"):
+        database = connection.load_config(args.config, args.db, args.profile)
+    with startup.phase("tk root"):
+        root = tk.Tk()
+    app = CoffeeShopManagementSystem(
+        root, database, args.order_server, 
+        cache_views=not args.rebuild_views, 
+        on_navigate=print_navigation if args.time_navigation else None, 
+        startup=startup, 
+        on_started=print_startup if args.profile_startup else None
+    )
     root.mainloop()
\ No newline at end of file
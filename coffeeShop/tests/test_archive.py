@@ -0,0 +1,75 @@
+"""Archived orders leave the hot database but are still counted everywhere"""
+import sqlite3
+
+import pytest
+
+from coffeeshop.core import open_shop
+
+
+@pytest.fixture
+def shop(tmp_path):
+    """Overrides the in-memory shop: archive files sit next to a database file"""
+    shop = open_shop(str(tmp_path / "shop.db"))
+    shop.migrate()
+    yield shop
+    shop.close()
+
+
+def snapshot(shop):
+    first, last = "2023-01-01", "2024-12-31"
+    return {
+        "stats": shop.conn.execute(
+            "SELECT total_products, total_customers, total_orders, round(revenue, 2) FROM stats"
+        ).fetchone(),
+        "sales": shop.reports.sales(first, last),
+        "hourly": shop.reports.sales(first, last, hourly=True),
+        "popular": shop.reports.popular_products(first, last),
+        "receipts": list(shop.order_service.receipts(first, last)),
+        "order_rows": list(shop.archive_service.order_rows(first, last)),
+    }
+
+
+def archive_ids(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT id FROM orders")}
+
+
+def test_archived_orders_are_moved_and_still_counted(busy_shop):
+    shop = busy_shop
+    old = shop.order_service.submit_order(
+        None, [{"id": 1, "quantity": 3, "price": 3.5}], "2023-12-31 16:00:00"
+    ).order_id
+    shop.order_service.set_status(old, "Completed")
+    completed = {
+        row[0] for row in shop.conn.execute(
+            "SELECT id FROM orders WHERE status = 'Completed' AND order_date < '2024-03-03'"
+        )
+    }
+    before = snapshot(shop)
+
+    result = shop.archive_service.archive_orders("2024-03-03", batch_orders=2)
+
+    assert result.orders == len(completed) == 4
+    hot = {row[0] for row in shop.conn.execute("SELECT id FROM orders")}
+    assert not hot & completed
+    files = shop.archive_service.files
+    assert archive_ids(files.path(2023)) == {old}
+    assert archive_ids(files.path(2024)) == completed - {old}
+    assert snapshot(shop) == before
+
+    # As the manage.py commands do, the archived rows are read before the
+    # transaction: an archive file cannot be detached inside one
+    archive = shop.archive_service
+    totals = archive.order_totals()
+    daily = archive.daily_sales("2023-01-01", "2024-12-31")
+    products = archive.product_sales()
+    with shop.conn:
+        shop.reports.rebuild_stats(totals)
+        shop.reports.backfill_daily_sales("2023-01-01", "2024-12-31", daily)
+        shop.reports.rebuild_product_sales(products)
+    assert snapshot(shop) == before
+
+
+def test_invalid_cutoff_is_rejected(shop):
+    with pytest.raises(ValueError):
+        shop.archive_service.archive_orders("2024-13-40")
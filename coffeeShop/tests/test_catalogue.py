@@ -0,0 +1,14 @@
+"""The catalogue cache stays in step with product edits"""
+
+
+def test_edit_replaces_cached_product(shop):
+    product_id = shop.catalogue.add_product("Latte", "Coffee", 3.5, 1.0, 10)
+    mocha_id = shop.catalogue.add_product("Mocha", "Coffee", 4.0, 1.2, 5)
+    cache = shop.catalogue.product_catalogue()
+
+    # The GUI reads the id back from a Treeview, as text
+    shop.catalogue.update_product(str(product_id), "Latte", "Coffee", 3.9, 1.0, 8)
+
+    assert cache.in_stock("Coffee") == [(product_id, "Latte", 3.9), (mocha_id, "Mocha", 4.0)]
+    assert cache.get(product_id).stock == 8
+    assert len(cache.in_stock()) == 2
@@ -0,0 +1,48 @@
+"""Customer picker prefix searches"""
+import pytest
+
+from coffeeshop.core import queries
+
+NAMES = ["Zara Quinn", "zoe adams", "Liz Taylor", "Lizzie Bell", "Lisa Ray", "[Bracket] Co", "Zz Top"]
+
+
+@pytest.fixture
+def customers(shop):
+    with shop.conn:
+        for number, name in enumerate(NAMES):
+            shop.customers.add(name, f"555-01{number:02d}", "")
+    return shop.customers
+
+
+def names(customers, prefix):
+    return sorted(name for _, name, _ in customers.prefix_search(prefix))
+
+
+@pytest.mark.parametrize("prefix", ["Z", "z"])
+def test_single_letter_z_ignores_case(customers, prefix):
+    assert names(customers, prefix) == ["Zara Quinn", "Zz Top", "zoe adams"]
+
+
+@pytest.mark.parametrize("prefix", ["LIZ", "Liz", "liz", "lIz"])
+def test_prefix_ending_in_z_ignores_case(customers, prefix):
+    assert names(customers, prefix) == ["Liz Taylor", "Lizzie Bell"]
+
+
+@pytest.mark.parametrize("prefix", ["ZZ", "Zz", "zz"])
+def test_prefix_of_z_only(customers, prefix):
+    assert names(customers, prefix) == ["Zz Top"]
+
+
+def test_punctuation_after_letters(customers):
+    assert names(customers, "[") == ["[Bracket] Co"]
+
+
+def test_phone_prefix(customers):
+    assert len(customers.prefix_search("555-01")) == len(NAMES)
+
+
+@pytest.mark.parametrize("prefix, bound", [
+    ("Liz", "li{"), ("LIZ", "li{"), ("z", "{"), ("Z", "{"), ("a@", "a["), ("É", "Ê"),
+])
+def test_nocase_upper_bound(prefix, bound):
+    assert queries.prefix_upper_bound(prefix, True) == bound
@@ -0,0 +1,31 @@
+"""DatabaseWorker when its connection cannot be opened"""
+import sqlite3
+import threading
+
+import pytest
+
+from db_worker import DatabaseWorker
+
+
+def test_failed_connect_fails_every_call():
+    release = threading.Event()
+
+    def connect():
+        release.wait()
+        raise sqlite3.OperationalError("unable to open database file")
+
+    worker = DatabaseWorker(connect)
+    queued = worker.submit(lambda conn: 1)
+    errors = []
+    worker.call(lambda conn: 2, on_done=errors.append, on_error=errors.append)
+    release.set()
+
+    with pytest.raises(sqlite3.OperationalError):
+        queued.result(timeout=5)
+    with pytest.raises(sqlite3.OperationalError):
+        worker.submit(lambda conn: 3).result(timeout=5)
+
+    worker.close(timeout=5)
+    worker.dispatch()
+    assert [type(error) for error in errors] == [sqlite3.OperationalError]
+    assert not worker._thread.is_alive()
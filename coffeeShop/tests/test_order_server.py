@@ -0,0 +1,40 @@
+"""Order service: a timed-out order is never written"""
+import asyncio
+import time
+
+import pytest
+
+from coffeeshop.core import open_shop
+from coffeeshop.server.server import OrderServer
+
+
+def test_timed_out_order_is_withdrawn(tmp_path):
+    path = str(tmp_path / "shop.db")
+    shop = open_shop(path)
+    shop.migrate()
+    with shop.conn:
+        product_id = shop.products.add("Latte", "Coffee", 3.5, 1.0, 10)
+    items = [{"id": product_id, "quantity": 1, "price": 3.5}]
+
+    async def run():
+        server = OrderServer(lambda: open_shop(path))
+        await server.start()
+        try:
+            # Hold up the database thread, so the first order's batch is
+            # being written while the second is still queued
+            asyncio.get_running_loop().run_in_executor(server._executor, time.sleep, 0.2)
+            first = asyncio.create_task(server.submit_order(None, items, timeout=0.05))
+            await asyncio.sleep(0.01)
+            with pytest.raises(asyncio.TimeoutError):
+                await server.submit_order(None, items, timeout=0.05)
+            order = await first
+        finally:
+            await server.close()
+        return server.stats, order
+
+    stats, order = asyncio.run(run())
+    assert stats["withdrawn"] == 1
+    assert stats["orders"] == 1
+    assert shop.conn.execute("SELECT id FROM orders").fetchall() == [(order.order_id,)]
+    assert shop.conn.execute("SELECT stock FROM products").fetchone() == (9,)
+    shop.close()
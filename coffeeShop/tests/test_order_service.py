@@ -0,0 +1,30 @@
+"""OrderService checks every line before anything is written"""
+import pytest
+
+
+@pytest.fixture
+def product_id(shop):
+    with shop.conn:
+        return shop.products.add("Latte", "Coffee", 3.5, 1.0, 10)
+
+
+def stock(shop, product_id):
+    return shop.conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+
+
+@pytest.mark.parametrize("quantity, price", [(0, 3.5), (-5, 3.5), (1, -1.0), (1, float("nan"))])
+def test_bad_line_is_refused(shop, product_id, quantity, price):
+    with pytest.raises(ValueError):
+        shop.order_service.submit_order(None, [{"id": product_id, "quantity": quantity, "price": price}])
+    assert stock(shop, product_id) == 10
+    assert shop.conn.execute("SELECT COUNT(*) FROM orders").fetchone() == (0,)
+
+
+def test_bad_order_in_batch_is_refused_alone(shop, product_id):
+    results = shop.order_service.submit_orders([
+        (None, [{"id": product_id, "quantity": -3, "price": 3.5}]),
+        (None, [{"id": product_id, "quantity": 2, "price": 3.5}]),
+    ])
+    assert isinstance(results[0], ValueError)
+    assert results[1].total == 7.0
+    assert stock(shop, product_id) == 8
@@ -0,0 +1,60 @@
+"""Migration 9 backfills order_ts from the text order_date"""
+import sqlite3
+import time
+
+import pytest
+
+from coffeeshop.core import migrations, queries
+
+ORDER_DATES = [
+    "2024-03-01 08:15:02",
+    "2024-02-29 23:59:59",
+    "2024-03-10 02:30:00",  # no such local time where clocks go forward that night
+    "2024-11-03 01:30:00",  # and one that happens twice where they go back
+    "2024-05-01",
+    "1969-12-31 23:00:00",
+    "not a date",
+]
+
+
+@pytest.fixture
+def local_time_zone(monkeypatch):
+    """Run with a local time zone that has daylight saving time"""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_backfill_matches_timestamp(local_time_zone):
+    conn = sqlite3.connect(":memory:")
+    migrations.migrate(conn, target=8)
+    with conn:
+        conn.executemany(
+            "INSERT INTO orders (customer_id, order_date, total_amount, status) "
+            "VALUES (NULL, ?, 1.0, 'Completed')",
+            [(order_date,) for order_date in ORDER_DATES],
+        )
+
+    assert migrations.migrate(conn) == migrations.SCHEMA_VERSION
+    rows = conn.execute("SELECT order_date, order_ts FROM orders ORDER BY id").fetchall()
+    assert rows == [(order_date, queries.timestamp(order_date)) for order_date in ORDER_DATES]
+
+    # Wall-clock seconds, whatever the local time zone
+    assert queries.timestamp("1970-01-02 00:00:00") == 86400
+    assert dict(rows)["2024-03-10 02:30:00"] == 1710037800
+    assert dict(rows)["not a date"] is None
+
+    # The triggers keep it for writers that leave it out
+    with conn:
+        conn.execute(
+            "INSERT INTO orders (order_date, total_amount) VALUES ('2024-06-01 12:00:00', 2.0)"
+        )
+        conn.execute("UPDATE orders SET order_date = '2024-06-02 00:00:00' WHERE id = 1")
+    stamps = conn.execute("SELECT order_ts FROM orders WHERE id IN (1, 8) ORDER BY id").fetchall()
+    assert stamps == [
+        (queries.timestamp("2024-06-02 00:00:00"),),
+        (queries.timestamp("2024-06-01 12:00:00"),),
+    ]
+    conn.close()
@@ -0,0 +1,93 @@
+"""Loyalty points ledger: a balance is the snapshot plus the entries after it"""
+import pytest
+
+from coffeeshop.core import open_shop, transfer
+
+
+@pytest.fixture
+def customers(shop):
+    with shop.conn:
+        latte = shop.products.add("Latte", "Coffee", 3.5, 1.0, 100)
+    alice = shop.catalogue.add_customer("Alice", "555-0100", "", 10)
+    bob = shop.catalogue.add_customer("Bob", "555-0101", "")
+    # 12.5 earns 12 points
+    shop.order_service.submit_order(alice, [{"id": latte, "quantity": 5, "price": 2.5}])
+    shop.order_service.submit_order(bob, [{"id": latte, "quantity": 1, "price": 3.5}])
+    return alice, bob
+
+
+def ledger_size(shop):
+    return shop.conn.execute("SELECT COUNT(*) FROM points_ledger").fetchone()[0]
+
+
+def test_earn_redeem_adjust(shop, customers):
+    alice, bob = customers
+    points = shop.points_service
+    assert (points.balance(alice), points.balance(bob)) == (22, 3)
+
+    assert points.redeem(alice, 5) == 17
+    entries = ledger_size(shop)
+    with pytest.raises(ValueError):
+        points.redeem(bob, 4)
+    assert ledger_size(shop) == entries
+    assert points.balance(bob) == 3
+
+    shop.catalogue.update_customer(bob, "Bob", "555-0101", "", 20)
+    assert points.balance(bob) == 20
+    assert shop.conn.execute(
+        "SELECT kind, points FROM points_ledger WHERE customer_id = ? ORDER BY id DESC", (bob,)
+    ).fetchone() == ("adjust", 17)
+
+
+def test_compact_keeps_balances(shop, customers):
+    alice, bob = customers
+    points = shop.points_service
+    points.redeem(alice, 5)
+    before = shop.points.balances()
+
+    compaction = points.compact()
+    assert compaction.customers == 2
+    assert compaction.through == shop.points.last_entry()
+    assert shop.points.balances() == before
+    assert points.compact().entries == 0
+
+    # Entries after the snapshot are added on top of it
+    points.redeem(alice, 7)
+    assert points.balance(alice) == before[alice] - 7
+    assert points.replay(check=True).changed == []
+
+    replay = points.replay()
+    assert replay.changed == []
+    assert shop.points.balances() == {alice: 10, bob: 3}
+
+
+def test_replay_check_finds_drift(shop, customers):
+    alice, _ = customers
+    shop.points_service.compact()
+    with shop.conn:
+        shop.conn.execute(
+            "UPDATE points_snapshots SET balance = balance + 100 WHERE customer_id = ?", (alice,)
+        )
+
+    assert shop.points_service.replay(check=True).changed == [(alice, 122, 22)]
+    assert shop.points_service.balance(alice) == 122
+    assert shop.points_service.replay().changed == [(alice, 122, 22)]
+    assert shop.points_service.balance(alice) == 22
+
+
+def test_import_writes_opening_entries(shop, customers, tmp_path):
+    alice, bob = customers
+    shop.points_service.redeem(alice, 2)
+    path = str(tmp_path / "customers.csv")
+    transfer.export_file(shop, "customers", path)
+
+    copy = open_shop(":memory:")
+    copy.migrate()
+    result = transfer.import_file(copy, "customers", path)
+    assert result.imported == 2
+    assert copy.points.balances() == {alice: 20, bob: 3}
+    assert copy.conn.execute(
+        "SELECT DISTINCT kind FROM points_ledger"
+    ).fetchall() == [("opening",)]
+    assert copy.points_service.replay(check=True).changed == []
+    copy.close()
@@ -0,0 +1,32 @@
+"""The trigger-maintained product sales aggregates agree with a rebuild"""
+
+
+def aggregates(shop):
+    daily = shop.conn.execute('''
+        SELECT day, product_id, units, round(revenue, 2) FROM product_sales_daily
+        WHERE units != 0 OR round(revenue, 2) != 0
+        ORDER BY day, product_id
+    ''').fetchall()
+    totals = shop.conn.execute('''
+        SELECT product_id, units, round(revenue, 2) FROM product_sales
+        WHERE units != 0 OR round(revenue, 2) != 0
+        ORDER BY product_id
+    ''').fetchall()
+    return daily, totals
+
+
+def test_triggers_match_rebuild(busy_shop):
+    maintained = aggregates(busy_shop)
+    with busy_shop.conn:
+        busy_shop.reports.rebuild_product_sales()
+    assert maintained == aggregates(busy_shop)
+
+    latte, muffin, scone = 1, 2, 3
+    assert maintained == (
+        [
+            ("2024-03-01", latte, 2, 6.0),
+            ("2024-03-02", muffin, 5, 11.25),
+            ("2024-03-02", scone, 3, 6.0),
+        ],
+        [(latte, 2, 6.0), (muffin, 5, 11.25), (scone, 3, 6.0)],
+    )
@@ -0,0 +1,7 @@
+"""Every query uses the indexes it is expected to (see manage.py check-plans)"""
+from coffeeshop.core import archive, queries
+
+
+def test_query_plans(shop):
+    archive.attach_empty(shop.conn)
+    assert queries.check_query_plans(shop.conn) == []
@@ -0,0 +1,15 @@
+"""The trigger-maintained dashboard stats agree with a full recompute"""
+
+
+def stats(shop):
+    return shop.conn.execute(
+        "SELECT total_products, total_customers, total_orders, round(revenue, 2) FROM stats"
+    ).fetchone()
+
+
+def test_triggers_match_rebuild(busy_shop):
+    maintained = stats(busy_shop)
+    with busy_shop.conn:
+        busy_shop.reports.rebuild_stats()
+    assert maintained == stats(busy_shop)
+    assert maintained == (3, 2, 4, 26.75)
@@ -0,0 +1,9 @@
+"""Concurrent tills never sell more stock than there is"""
+from coffeeshop.bench.stock import bench_stock_contention
+
+
+def test_no_oversell_under_contention():
+    [result] = bench_stock_contention(threads=(4,), products=3, stock=50)
+    assert result["orders"] > 0
+    assert result["negative_stock"] == 0
+    assert result["mismatched"] == 0
@@ -0,0 +1,99 @@
+"""Bulk export and import, with bad rows set aside"""
+import csv
+import json
+
+import pytest
+
+from coffeeshop.core import open_shop, transfer
+
+TABLES = ("products", "customers", "orders", "order_items")
+
+
+def rows(shop, table):
+    # An empty value reads back as missing, so "" comes back as NULL
+    return [
+        tuple(None if value == "" else value for value in row)
+        for row in transfer.TABLES[table].dump(shop)
+    ]
+
+
+def append_records(path, fmt, records):
+    """Append records, dicts of column name to raw value, to an export"""
+    with open(path, "a", newline="", encoding="utf-8") as output:
+        for record in records:
+            if fmt == "csv":
+                csv.writer(output).writerow(record.values())
+            else:
+                output.write(json.dumps(record) + "\n")
+
+
+def read_rejects(path, fmt):
+    with open(path, newline="", encoding="utf-8") as rejects:
+        if fmt == "csv":
+            return [(int(row["line"]), row["error"]) for row in csv.DictReader(rejects)]
+        return [(entry["line"], entry["error"]) for entry in map(json.loads, rejects)]
+
+
+@pytest.fixture
+def copy():
+    shop = open_shop(":memory:")
+    shop.migrate()
+    yield shop
+    shop.close()
+
+
+@pytest.mark.parametrize("fmt", transfer.FORMATS)
+def test_round_trip(busy_shop, copy, tmp_path, fmt):
+    for table in TABLES:
+        path = str(tmp_path / f"{table}.{fmt}")
+        written = transfer.export_file(busy_shop, table, path)
+        result = transfer.import_file(copy, table, path)
+        assert result == (written, written, 0)
+        assert rows(copy, table) == rows(busy_shop, table)
+
+
+@pytest.mark.parametrize("fmt", transfer.FORMATS)
+def test_bad_rows_are_rejected_with_reasons(busy_shop, copy, tmp_path, fmt):
+    path = str(tmp_path / f"products.{fmt}")
+    rejects_path = str(tmp_path / f"rejects.{fmt}")
+    written = transfer.export_file(busy_shop, "products", path)
+    last_id = max(row[0] for row in rows(busy_shop, "products"))
+
+    def product(product_id, name, price):
+        return {
+            "id": product_id, "name": name, "category": "Coffee",
+            "price": price, "cost": "1", "stock": "5",
+        }
+
+    append_records(path, fmt, [
+        product("", "Flat white", "3.2"),
+        product("", "Cortado", "lots"),
+        product("", "", "3"),
+        product(str(last_id), "Twin", "3"),  # the database refuses a second id
+    ])
+
+    result = transfer.import_file(copy, "products", path, rejects_path=rejects_path, chunk_rows=2)
+    assert result == (written + 4, written + 1, 3)
+
+    # The good rows are all in, and the one without an id got the next free one
+    imported = rows(copy, "products")
+    assert imported[:-1] == rows(busy_shop, "products")
+    assert imported[-1] == (last_id + 1, "Flat white", "Coffee", 3.2, 1.0, 5)
+
+    first_line = written + (2 if fmt == "csv" else 1)
+    rejected = read_rejects(rejects_path, fmt)
+    assert [line for line, _ in rejected] == [first_line + 1, first_line + 2, first_line + 3]
+    assert all(error for _, error in rejected)
+    assert "UNIQUE" in rejected[-1][1]
+
+
+def test_orders_of_unknown_customers_are_rejected(busy_shop, copy, tmp_path):
+    path = str(tmp_path / "orders.csv")
+    rejects_path = str(tmp_path / "rejects.csv")
+    written = transfer.export_file(busy_shop, "orders", path)
+
+    # Customers were never imported, so every order with one is refused
+    result = transfer.import_file(copy, "orders", path, rejects_path=rejects_path)
+    walk_ins = sum(1 for row in rows(busy_shop, "orders") if row[1] is None)
+    assert result == (written, walk_ins, written - walk_ins)
+    assert all("FOREIGN KEY" in error for _, error in read_rejects(rejects_path, "csv"))